@@ -0,0 +1,257 @@
+"""
+This file handles loading the images used by the pygame simulation.
+
+Every image is cropped and scaled to the size it is drawn at and converted to the pixel
+format of the display once, so drawing it every frame is a plain copy. The prepared pixels
+are saved as raw files in a .cache folder next to the images, so later runs skip decoding
+and scaling the original image files.
+
+The images are loaded by scene: entering a scene loads only the images it draws, the first
+time it is entered. At most a given number of images are kept in memory; when there are
+more, the least recently used images of the other scenes are dropped, to be loaded again
+from the cache if their scene is entered again.
+
+This file is Copyright (c) 2020 Yousuf Hassan, Aaditya Mandal, Faraz Hossein, and Dinkar Verma.
+"""
+
+import hashlib
+import json
+import os
+import struct
+from collections import OrderedDict
+from typing import Dict, Optional, Sequence, Tuple
+import pygame
+
+CACHE_FOLDER = '.cache'
+
+# The folder the prepared images are saved to by default.
+IMAGE_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Images', CACHE_FOLDER)
+
+# The version of the prepared image format. Changing how images are prepared or saved must
+# change it, so that images prepared the old way are not used.
+ASSET_VERSION = 1
+
+# The header of a prepared image file: a magic number, the width and height of the image,
+# and whether it has an alpha channel.
+HEADER = struct.Struct('<4sIIB')
+MAGIC = b'SLRA'
+
+# The number of images kept in memory by default.
+MAX_SURFACES = 8
+
+
+class AssetSpec:
+    """How an image is prepared before it is drawn.
+
+    Instance Attributes:
+        - path: the path of the original image file
+        - area: the part of the original image to keep, as (x, y, width, height), or None to
+          keep all of it
+        - size: the (width, height) the image is scaled to, or None to keep its size
+
+    Representation Invariants:
+        - self.area is None or (self.area[2] > 0 and self.area[3] > 0)
+        - self.size is None or (self.size[0] > 0 and self.size[1] > 0)
+    """
+    path: str
+    area: Optional[Tuple[int, int, int, int]]
+    size: Optional[Tuple[int, int]]
+
+    def __init__(self, path: str, size: Optional[Tuple[int, int]] = None,
+                 area: Optional[Tuple[int, int, int, int]] = None) -> None:
+        """Initialize a new asset specification."""
+        self.path = path
+        self.size = size
+        self.area = area
+
+    def key(self) -> str:
+        """Return a string identifying the original image file and how it is prepared."""
+        description = [ASSET_VERSION, os.path.abspath(self.path), self.area, self.size]
+        return hashlib.sha256(json.dumps(description).encode()).hexdigest()[:16]
+
+    def version(self) -> str:
+        """Return a string identifying the contents of the original image file, as it is
+        now.
+        """
+        stat = os.stat(self.path)
+        description = [stat.st_size, stat.st_mtime_ns]
+        return hashlib.sha256(json.dumps(description).encode()).hexdigest()[:16]
+
+
+class AssetManager:
+    """The images of a program, loaded when their scene is first entered.
+
+    Instance Attributes:
+        - specs: a dictionary mapping the name of each image to how it is prepared
+        - scenes: a dictionary mapping the name of each scene to the names of its images
+        - max_surfaces: the number of images kept in memory, unless the current scene needs
+          more
+        - cache_folder: the folder the prepared images are saved to, or None to not save them
+        - current_scene: the name of the scene last entered, or None
+
+    Representation Invariants:
+        - self.max_surfaces > 0
+        - all(name in self.specs for names in self.scenes.values() for name in names)
+    """
+    specs: Dict[str, AssetSpec]
+    scenes: Dict[str, Sequence[str]]
+    max_surfaces: int
+    cache_folder: Optional[str]
+    current_scene: Optional[str]
+
+    # Private Instance Attributes:
+    #   - _surfaces: the images in memory, from the least to the most recently used
+    _surfaces: OrderedDict
+
+    def __init__(self, specs: Dict[str, AssetSpec], scenes: Dict[str, Sequence[str]],
+                 max_surfaces: int = MAX_SURFACES,
+                 cache_folder: Optional[str] = IMAGE_CACHE) -> None:
+        """Initialize a new asset manager. No images are loaded until they are used.
+
+        Preconditions:
+            - pygame.display.get_surface() is not None
+        """
+        self.specs = specs
+        self.scenes = scenes
+        self.max_surfaces = max_surfaces
+        self.cache_folder = cache_folder
+        self.current_scene = None
+        self._surfaces = OrderedDict()
+
+    def enter_scene(self, scene: str) -> Dict[str, pygame.Surface]:
+        """Load the images of the given scene that are not in memory, and return a dictionary
+        mapping the name of each of its images to the image.
+        """
+        self.current_scene = scene
+        surfaces = {name: self.get(name) for name in self.scenes[scene]}
+        self._evict()
+        return surfaces
+
+    def get(self, name: str) -> pygame.Surface:
+        """Return the image with the given name, loading it if it is not in memory."""
+        if name in self._surfaces:
+            self._surfaces.move_to_end(name)
+        else:
+            self._surfaces[name] = self._load(self.specs[name])
+            self._evict()
+        return self._surfaces[name]
+
+    def loaded(self) -> Tuple[str, ...]:
+        """Return the names of the images in memory, from the least to the most recently
+        used.
+        """
+        return tuple(self._surfaces)
+
+    def _evict(self) -> None:
+        """Drop the least recently used images until at most max_surfaces are in memory,
+        never dropping an image of the current scene.
+        """
+        pinned = set(self.scenes.get(self.current_scene, ()))
+        for name in list(self._surfaces):
+            if len(self._surfaces) <= self.max_surfaces:
+                return
+            if name not in pinned:
+                del self._surfaces[name]
+
+    def _load(self, spec: AssetSpec) -> pygame.Surface:
+        """Return the image described by spec, prepared and in the pixel format of the
+        display, from the cache if it has been prepared before.
+        """
+        cached = None
+        if self.cache_folder is not None:
+            name = os.path.splitext(os.path.basename(spec.path))[0]
+            cached = os.path.join(self.cache_folder, '{}-{}-{}.raw'.format(
+                name, spec.key(), spec.version()))
+            surface = read_prepared(cached)
+            if surface is not None:
+                return _convert(surface)
+
+        surface = prepare(spec)
+        if cached is not None:
+            write_prepared(cached, surface)
+            _remove_stale_files(self.cache_folder, name, spec.key(), cached)
+        return _convert(surface)
+
+
+def prepare(spec: AssetSpec) -> pygame.Surface:
+    """Return the image described by spec, cropped and scaled."""
+    surface = pygame.image.load(spec.path)
+    if spec.area is not None:
+        surface = surface.subsurface(pygame.Rect(spec.area)).copy()
+    if spec.size is not None and surface.get_size() != tuple(spec.size):
+        surface = pygame.transform.scale(surface, spec.size)
+    return surface
+
+
+def read_prepared(path: str) -> Optional[pygame.Surface]:
+    """Return the prepared image saved at path, or None if it does not exist or cannot be
+    read.
+    """
+    try:
+        with open(path, 'rb') as file:
+            magic, width, height, alpha = HEADER.unpack(file.read(HEADER.size))
+            pixels = file.read()
+    except (OSError, struct.error):
+        return None
+
+    pixel_format = 'RGBA' if alpha else 'RGB'
+    if magic != MAGIC or len(pixels) != width * height * len(pixel_format):
+        return None
+    return pygame.image.frombytes(pixels, (width, height), pixel_format)
+
+
+def write_prepared(path: str, surface: pygame.Surface) -> None:
+    """Save the prepared image surface to path, replacing it all at once."""
+    alpha = bool(surface.get_flags() & pygame.SRCALPHA)
+    pixels = pygame.image.tobytes(surface, 'RGBA' if alpha else 'RGB')
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = path + '.tmp{}'.format(os.getpid())
+    with open(temporary, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, surface.get_width(), surface.get_height(), alpha))
+        file.write(pixels)
+    os.replace(temporary, path)
+
+
+def _convert(surface: pygame.Surface) -> pygame.Surface:
+    """Return surface in the pixel format of the display, keeping its alpha channel if it
+    has one.
+    """
+    if surface.get_flags() & pygame.SRCALPHA:
+        return surface.convert_alpha()
+    else:
+        return surface.convert()
+
+
+def _remove_stale_files(folder: str, name: str, key: str, current: str) -> None:
+    """Remove the prepared images of the spec with the given key (see AssetSpec.key) other
+    than current, i.e. those prepared from earlier versions of its original image file, and
+    the images of the original image file with the given name in the old format.
+
+    The images of other specs are kept, even those of the same original image file. Files in
+    the old format, named <name>-<hash>.raw, were prepared before the spec key and the version
+    were separate; they are never read again.
+    """
+    for entry in os.listdir(folder):
+        if not entry.endswith('.raw'):
+            continue
+        path = os.path.join(folder, entry)
+        parts = entry[:-len('.raw')].rsplit('-', 2)
+        prefix, _, legacy_hash = entry[:-len('.raw')].rpartition('-')
+        stale = len(parts) == 3 and parts[1] == key and path != current
+        legacy = prefix == name and len(legacy_hash) == len(key) and all(
+            char in '0123456789abcdef' for char in legacy_hash)
+        if stale or legacy:
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['hashlib', 'json', 'os', 'struct', 'collections', 'pygame', 'Dict',
+                          'Optional', 'Sequence', 'Tuple'],
+        'allowed-io': ['read_prepared', 'write_prepared'],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })
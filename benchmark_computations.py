@@ -0,0 +1,440 @@
+"""
+This file measures how fast the computations of computations.py are on datasets of growing
+size, and checks that they give the same results as the original version of the program.
+
+The benchmark writes synthetic altimetry datasets, in the same format as the bundled one,
+from 10^3 rows up to the given sizes (10^8 rows is a file of about 3 GB). For each size, it
+times read_csv, mean_sea_level_change, both predictions, combine_data and
+factor_contribution. It reports their throughput and peak memory (allocations tracked by
+tracemalloc, which includes numpy arrays), and how their time scales with the number of rows
+(the exponent k of time ~ rows^k).
+
+The results are checked in two ways, and the run fails if either check fails:
+    1. Differential: on every synthetic dataset up to --max-reference-rows rows, each function
+       is given the same input as the reference functions below, copies of the original
+       dictionary version of the program, and must return the same output.
+    2. Golden: the whole pipeline is run on the bundled dataset and must give the outputs
+       stored in GOLDEN_FILE, which were calculated by the reference functions.
+
+An output must have the same keys as the reference, except that read_csv reads the two 1992
+samples the original version skipped with its header, so the outputs from read_csv on may
+have extra keys before 1993. Each value must be within TOLERANCES of the reference.
+
+Usage:
+    python benchmark_computations.py
+    python benchmark_computations.py --sizes 1000 100000 100000000 --output results.json
+
+This file is Copyright (c) 2020 Yousuf Hassan, Aaditya Mandal, Faraz Hossein, and Dinkar Verma.
+"""
+
+import argparse
+import csv
+import json
+import math
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import computations
+from series import SeaLevelSeries
+
+DATASET = 'Datasets/global_mean_sea_level.csv'
+
+# The outputs of the reference functions on DATASET.
+GOLDEN_FILE = 'Datasets/golden_outputs.json'
+
+# The largest difference allowed between a value and the reference value of each function.
+# Values the reference rounds to 2 decimal places may be off by one in the last place, since
+# numpy sums in a different order; the samples and the combined series must be exact.
+TOLERANCES = {'read_csv': 0.0, 'mean_sea_level_change': 0.01, 'predict_2021_2080': 0.01,
+              'predict_2081_2100': 0.01, 'combine_data': 0.0, 'factor_contribution': 0.01}
+
+# The default sizes of the synthetic datasets, in rows.
+SIZES = (10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6, 10 ** 7)
+
+# The largest synthetic dataset the reference functions are run on.
+MAX_REFERENCE_ROWS = 10 ** 5
+
+# The least number of seconds each function is timed for; fast functions are run repeatedly
+# and the fastest run is reported.
+MIN_SECONDS = 0.2
+
+# The header of the synthetic datasets: the same number of lines as DATASET, since the
+# reference read_csv skips a fixed number of lines.
+HEADER = ('#title = synthetic mean sea level anomaly global ocean\n'
+          '#institution = benchmark_computations.py\n'
+          '#references = none\n'
+          '#comment = Generated for benchmarking only\n'
+          '#trend = 3.00 mm/year\n'
+          'year,TOPEX/Poseidon,Jason-1,Jason-2,Jason-3\n')
+
+# The number of rows of a synthetic dataset generated at once.
+CHUNK_ROWS = 10 ** 6
+
+
+# The reference functions: copies of the original dictionary version of computations.py
+def reference_read_csv(filename: str) -> Dict[str, float]:
+    """ Read the csv file and return a dictionary mapping the years to the global mean
+    sea levels.
+    """
+    average_data = {}
+    with open(filename) as file:
+        reader = csv.reader(file)
+
+        for _ in range(0, 8):  # skip over the first 8 rows
+            next(reader)
+
+        for row in reader:
+            if row[4] != '':
+                average_data[row[0]] = float(row[4])
+            elif row[3] != '':
+                average_data[row[0]] = float(row[3])
+            elif row[2] != '':
+                average_data[row[0]] = float(row[2])
+            else:
+                average_data[row[0]] = float(row[1])
+
+        return average_data
+
+
+def reference_mean_sea_level_change(csv_data: Dict[str, float]) -> Dict[str, float]:
+    """ Calculate the average global mean sea level for each year and return a dictionary
+    mapping the years to the average global mean sea levels for that year.
+    """
+    average_data = {}
+
+    for year in csv_data:
+        whole_year = year[0:4]
+        if whole_year not in average_data:
+            average_data[whole_year] = [csv_data[year]]
+        else:
+            average_data[whole_year].append(csv_data[year])
+
+    for year in average_data:
+        average_data[year] = round(sum(average_data[year]) / len(average_data[year]), 2)
+
+    return average_data
+
+
+def reference_predict_2021_2080(sea_level_2020: float) -> Dict[str, float]:
+    """ Predict the global mean sea level for each year from 2021 to 2080 and return a
+    dictionary mapping the years to the global mean sea level for that year.
+    """
+    data_2021 = {'2020': sea_level_2020}
+
+    for year in range(2021, 2081):
+        data_2021[str(year)] = round(data_2021[str(year - 1)] + 3.3, 2)
+
+    return data_2021
+
+
+def reference_predict_2081_2100(sea_level_2080: float) -> Dict[str, float]:
+    """ Predict the global mean sea level for each year from 2081 to 2100 and return a
+    dictionary mapping the years to the global mean sea level for that year.
+    """
+    data_2081 = {'2080': sea_level_2080}
+
+    for year in range(2081, 2101):
+        data_2081[str(year)] = round(data_2081[str(year - 1)] + 12.0, 2)
+
+    return data_2081
+
+
+def reference_combine_data(data_1993: Dict[str, float], data_2021: Dict[str, float],
+                           data_2081: Dict[str, float]) -> Dict[str, float]:
+    """ Return a combination of all three dictionaries.
+    """
+    data_1993.update(data_2021)
+    data_1993.update(data_2081)
+
+    return data_1993
+
+
+def reference_factor_contribution(total_data: Dict[str, float]) -> Dict[str, List[float]]:
+    """Return a dictionary mapping the years to a list containing global mean sea level
+    change by each factor.
+    """
+    factor_data = {}
+
+    for year in total_data:
+        heat_capacity_contribution = round(0.41 * total_data[year], 2)
+        glaciers_contribution = round(0.35 * total_data[year], 2)
+        ice_sheets_contribution = round(0.24 * total_data[year], 2)
+        factor_data[year] = [heat_capacity_contribution, glaciers_contribution,
+                             ice_sheets_contribution]
+
+    return factor_data
+
+
+def reference_pipeline(filename: str) -> Dict[str, Dict]:
+    """Return the output of every reference function on the dataset with the given filename,
+    run in order like the original main.py.
+    """
+    samples = reference_read_csv(filename)
+    annual = reference_mean_sea_level_change(samples)
+    data_2021_2080 = reference_predict_2021_2080(annual['2020'])
+    data_2081_2100 = reference_predict_2081_2100(data_2021_2080['2080'])
+    combined = reference_combine_data(dict(annual), data_2021_2080, data_2081_2100)
+    return {'read_csv': samples, 'mean_sea_level_change': annual,
+            'predict_2021_2080': data_2021_2080, 'predict_2081_2100': data_2081_2100,
+            'combine_data': combined,
+            'factor_contribution': reference_factor_contribution(combined)}
+
+
+def current_pipeline(filename: str) -> Dict[str, SeaLevelSeries]:
+    """Return the output of every function of computations.py on the dataset with the given
+    filename, run in order like main.py.
+    """
+    samples = computations.read_csv(filename)
+    annual = computations.mean_sea_level_change(samples)
+    data_2021_2080 = computations.predict_2021_2080(annual[2020])
+    data_2081_2100 = computations.predict_2081_2100(data_2021_2080[2080])
+    combined = computations.combine_data(annual, data_2021_2080, data_2081_2100)
+    return {'read_csv': samples, 'mean_sea_level_change': annual,
+            'predict_2021_2080': data_2021_2080, 'predict_2081_2100': data_2081_2100,
+            'combine_data': combined,
+            'factor_contribution': computations.factor_contribution(combined)}
+
+
+def compare(name: str, expected: Dict, actual: Dict, allow_before_1993: bool = False) -> List[str]:
+    """Return a description of every difference between the output of the function with the
+    given name and the output of its reference, beyond TOLERANCES[name].
+
+    If allow_before_1993 is True, actual may have extra keys before 1993.
+    """
+    problems = []
+    extra = [key for key in actual if key not in expected
+             and not (allow_before_1993 and float(key) < 1993)]
+    missing = [key for key in expected if key not in actual]
+    if extra:
+        problems.append('{}: {} unexpected keys, e.g. {}'.format(name, len(extra), extra[0]))
+    if missing:
+        problems.append('{}: {} missing keys, e.g. {}'.format(name, len(missing), missing[0]))
+
+    keys = [key for key in expected if key in actual]
+    if keys:
+        errors = np.abs(np.array([expected[key] for key in keys], dtype=np.float64)
+                        - np.array([actual[key] for key in keys], dtype=np.float64))
+        errors = errors.reshape(len(keys), -1).max(axis=1)
+        worst = int(np.argmax(errors))
+        if errors[worst] > TOLERANCES[name] + 1e-9:
+            problems.append('{}: {} values differ by more than {}, the most at {} ({} != {})'
+                            .format(name, np.count_nonzero(errors > TOLERANCES[name] + 1e-9),
+                                    TOLERANCES[name], keys[worst], actual[keys[worst]],
+                                    expected[keys[worst]]))
+    return problems
+
+
+def check_golden(filename: str = DATASET, golden_file: str = GOLDEN_FILE) -> List[str]:
+    """Return every difference between the outputs of the current pipeline on the dataset with
+    the given filename and the golden outputs.
+    """
+    with open(golden_file) as file:
+        golden = json.load(file)
+    problems = []
+    for name, series in current_pipeline(filename).items():
+        problems.extend(compare(name, golden[name], series.to_dict(), allow_before_1993=True))
+    return ['golden ' + problem for problem in problems]
+
+
+def check_differential(filename: str) -> List[str]:
+    """Return every difference between the outputs of each current function and its reference
+    on the dataset with the given filename, when both are given the same input.
+    """
+    problems = []
+    reference_samples = reference_read_csv(filename)
+
+    # The reference skips the first two rows along with the header.
+    samples = computations.read_csv(filename)
+    samples = SeaLevelSeries.from_samples(samples.times[2:], samples.values[2:])
+    problems.extend(compare('read_csv', reference_samples, samples.to_dict()))
+
+    expected = reference_mean_sea_level_change(reference_samples)
+    annual = SeaLevelSeries.from_dict(expected)
+    problems.extend(compare('mean_sea_level_change', expected,
+                            computations.mean_sea_level_change(samples).to_dict()))
+
+    expected_2021 = reference_predict_2021_2080(expected['2020'])
+    problems.extend(compare('predict_2021_2080', expected_2021,
+                            computations.predict_2021_2080(expected['2020']).to_dict()))
+    expected_2081 = reference_predict_2081_2100(expected_2021['2080'])
+    problems.extend(compare('predict_2081_2100', expected_2081,
+                            computations.predict_2081_2100(expected_2021['2080']).to_dict()))
+
+    combined = computations.combine_data(annual, SeaLevelSeries.from_dict(expected_2021),
+                                         SeaLevelSeries.from_dict(expected_2081))
+    expected = reference_combine_data(dict(expected), expected_2021, expected_2081)
+    problems.extend(compare('combine_data', expected, combined.to_dict()))
+
+    problems.extend(compare('factor_contribution', reference_factor_contribution(expected),
+                            computations.factor_contribution(combined).to_dict()))
+    return ['{} rows: {}'.format(len(reference_samples) + 2, problem) for problem in problems]
+
+
+def write_dataset(filename: str, rows: int, seed: int = 0) -> None:
+    """Write a synthetic altimetry dataset with the given number of rows.
+
+    The samples are evenly spaced from 1993, at least 0.0001 years apart so their times are
+    unique, and span at least 28 years. Each mission measures a quarter of the samples, in
+    order, and the first 5% of each quarter is also measured by the mission before it.
+    """
+    step = max(1, round(280000 / rows))
+    generator = np.random.default_rng(seed)
+    with open(filename, 'w') as file:
+        file.write(HEADER)
+        for start in range(0, rows, CHUNK_ROWS):
+            index = np.arange(start, min(start + CHUNK_ROWS, rows))
+            units = 19930000 + index * step
+            times = units / 10000
+            values = (3 * (times - 2000) + 10 * np.sin(2 * math.pi * times)
+                      + generator.normal(0, 3, len(index)))
+            missions = np.minimum(index * 4 // rows, 3)
+            overlap = (missions > 0) & (index * 4 % rows < rows // 20)
+
+            lines = []
+            for unit, value, mission, shared in zip(units.tolist(), values.tolist(),
+                                                    missions.tolist(), overlap.tolist()):
+                fields = ['', '', '', '']
+                fields[mission] = '{:.5f}'.format(value)
+                if shared:
+                    fields[mission - 1] = '{:.5f}'.format(value + 0.5)
+                lines.append('{}.{:04d},{}\n'.format(unit // 10000, unit % 10000,
+                                                     ','.join(fields)))
+            file.write(''.join(lines))
+
+
+def measure(function: Callable, *args) -> Tuple[object, float, int]:
+    """Return the result of calling function with args, the number of seconds the fastest
+    call took and the peak memory in bytes allocated during a call.
+
+    The function is called repeatedly for at least MIN_SECONDS, then once more with memory
+    tracking on, which slows it down.
+    """
+    best = math.inf
+    total = 0.0
+    while total < MIN_SECONDS:
+        start = time.perf_counter()
+        result = function(*args)
+        elapsed = time.perf_counter() - start
+        best = min(best, elapsed)
+        total += elapsed
+
+    tracemalloc.start()
+    function(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, best, peak
+
+
+def benchmark_dataset(filename: str, rows: int) -> Dict[str, Dict[str, float]]:
+    """Time every function of the pipeline on the dataset with the given filename and number
+    of rows, and return the seconds and peak megabytes of each. The rows per second of the
+    functions given every row, and the megabytes read per second by read_csv, are included.
+    """
+    results = {}
+    file_mb = os.path.getsize(filename) / 2 ** 20
+
+    def record(name: str, function: Callable, *args) -> object:
+        result, seconds, peak = measure(function, *args)
+        results[name] = {'seconds': seconds, 'peak_mb': peak / 2 ** 20}
+        if name in ('read_csv', 'mean_sea_level_change'):
+            results[name]['rows_per_second'] = rows / seconds
+        if name == 'read_csv':
+            results[name]['mb_per_second'] = file_mb / seconds
+        return result
+
+    samples = record('read_csv', computations.read_csv, filename)
+    annual = record('mean_sea_level_change', computations.mean_sea_level_change, samples)
+    data_2021_2080 = record('predict_2021_2080', computations.predict_2021_2080, annual[2020])
+    data_2081_2100 = record('predict_2081_2100', computations.predict_2081_2100,
+                            data_2021_2080[2080])
+    combined = record('combine_data', computations.combine_data, annual, data_2021_2080,
+                      data_2081_2100)
+    record('factor_contribution', computations.factor_contribution, combined)
+    return results
+
+
+def scaling_exponents(results: Dict[int, Dict[str, Dict[str, float]]]) -> Dict[str, float]:
+    """Return the exponent k of the best fit of seconds ~ rows^k of each function, over the
+    sizes of at least 10^4 rows (or every size if there are fewer than two of those).
+    """
+    sizes = [rows for rows in sorted(results) if rows >= 10 ** 4]
+    sizes = sizes if len(sizes) >= 2 else sorted(results)
+    if len(sizes) < 2:
+        return {}
+    exponents = {}
+    for name in results[sizes[0]]:
+        seconds = [results[rows][name]['seconds'] for rows in sizes]
+        exponents[name] = float(np.polyfit(np.log(sizes), np.log(seconds), 1)[0])
+    return exponents
+
+
+def main(arguments: Optional[Sequence[str]] = None) -> int:
+    """Run the benchmark described by the command line arguments and return the exit status:
+    0 if every check passed, and 1 otherwise.
+    """
+    parser = argparse.ArgumentParser(description='Measure and check the computations.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(SIZES),
+                        help='the numbers of rows of the synthetic datasets')
+    parser.add_argument('--max-reference-rows', type=int, default=MAX_REFERENCE_ROWS,
+                        help='the largest dataset checked against the reference functions')
+    parser.add_argument('--data-dir', help='keep the synthetic datasets in this folder')
+    parser.add_argument('--output', help='write the results to this json file')
+    parser.add_argument('--write-golden', action='store_true',
+                        help='calculate ' + GOLDEN_FILE + ' again with the reference functions')
+    options = parser.parse_args(arguments)
+
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    if options.write_golden:
+        with open(GOLDEN_FILE, 'w') as file:
+            json.dump(reference_pipeline(DATASET), file)
+        print('Wrote ' + GOLDEN_FILE)
+
+    problems = check_golden()
+    results = {}
+    with tempfile.TemporaryDirectory() as temporary:
+        folder = temporary if options.data_dir is None else options.data_dir
+        os.makedirs(folder, exist_ok=True)
+        print('{:>11}  {:<22}{:>11}{:>14}{:>10}{:>10}'.format(
+            'rows', 'function', 'ms', 'rows/s', 'MB/s', 'peak MB'))
+        for rows in sorted(options.sizes):
+            filename = os.path.join(folder, 'synthetic_{}.csv'.format(rows))
+            if not os.path.exists(filename):
+                write_dataset(filename, rows)
+            if rows <= options.max_reference_rows:
+                problems.extend(check_differential(filename))
+
+            results[rows] = benchmark_dataset(filename, rows)
+            for name, result in results[rows].items():
+                print('{:>11}  {:<22}{:>11.3f}{:>14}{:>10}{:>10.1f}'.format(
+                    rows, name, result['seconds'] * 1000,
+                    '{:.3g}'.format(result['rows_per_second'])
+                    if 'rows_per_second' in result else '',
+                    '{:.1f}'.format(result['mb_per_second'])
+                    if 'mb_per_second' in result else '', result['peak_mb']))
+
+    exponents = scaling_exponents(results)
+    print('Scaling (seconds ~ rows^k): ' + ', '.join(
+        '{} k={:.2f}'.format(name, exponent) for name, exponent in exponents.items()))
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print('Peak resident memory: {:.1f} MB'.format(
+        peak_rss / 2 ** 20 if sys.platform == 'darwin' else peak_rss / 2 ** 10))
+
+    if options.output is not None:
+        with open(options.output, 'w') as file:
+            json.dump({'results': results, 'scaling': exponents, 'problems': problems}, file,
+                      indent=2)
+
+    for problem in problems:
+        print('FAIL: ' + problem)
+    if not problems:
+        print('Every output matches the reference within the tolerances')
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
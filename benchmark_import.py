@@ -0,0 +1,125 @@
+"""
+This file measures how long a new Python process takes to import a module of the program,
+e.g. the computations used by every headless batch job and worker process.
+
+Each run imports the module in a fresh interpreter, so nothing is already loaded or cached
+in memory. The median and worst import times are reported, along with the modules that take
+the longest to import (from python -X importtime), and the run fails if the median is above
+the given threshold or a module that only the simulation or the linter needs was loaded.
+
+Usage:
+    python benchmark_import.py
+    python benchmark_import.py --module sweep --runs 50 --max-ms 250
+
+This file is Copyright (c) 2020 Yousuf Hassan, Aaditya Mandal, Faraz Hossein, and Dinkar Verma.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# The modules the compute path should never load.
+FORBIDDEN_MODULES = ('pygame', 'python_ta')
+
+# The program run in each fresh interpreter. It prints the import time in seconds, followed by
+# the forbidden modules that were loaded.
+TIMER = """
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(elapsed)
+print(' '.join(name for name in {forbidden!r} if name in sys.modules))
+"""
+
+
+def time_import(module: str) -> Tuple[float, List[str]]:
+    """Return the number of seconds a fresh interpreter takes to import module, and the
+    forbidden modules it loaded.
+    """
+    program = TIMER.format(module=module, forbidden=FORBIDDEN_MODULES)
+    output = subprocess.run([sys.executable, '-c', program], check=True, capture_output=True,
+                            text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+    lines = output.splitlines()
+    return float(lines[0]), lines[1].split() if len(lines) > 1 else []
+
+
+def slowest_imports(module: str, count: int) -> List[Tuple[str, float]]:
+    """Return the count modules with the largest cumulative import time (in seconds) when a
+    fresh interpreter imports module, slowest first.
+    """
+    errors = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+                            check=True, capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__))).stderr
+
+    times = {}
+    for line in errors.splitlines():
+        fields = line.split('|')
+        if not line.startswith('import time:') or not fields[1].strip().isdigit():
+            continue
+        times[fields[2].strip()] = int(fields[1]) / 1e6
+    return sorted(times.items(), key=lambda item: item[1], reverse=True)[:count]
+
+
+def percentile(values: Sequence[float], percent: float) -> float:
+    """Return the given percentile of values, interpolating linearly between them."""
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * percent / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def run_benchmark(module: str, runs: int) -> Dict[str, object]:
+    """Import module in runs fresh interpreters and return a summary of the import times
+    (in milliseconds) and the forbidden modules loaded.
+    """
+    times = []
+    loaded = set()
+    for _ in range(runs):
+        elapsed, forbidden = time_import(module)
+        times.append(elapsed * 1000)
+        loaded.update(forbidden)
+
+    return {'module': module, 'runs': runs, 'median_ms': percentile(times, 50),
+            'p90_ms': percentile(times, 90), 'max_ms': max(times),
+            'forbidden_loaded': sorted(loaded)}
+
+
+def main(arguments: Optional[Sequence[str]] = None) -> int:
+    """Run the benchmark described by the command line arguments and return the exit status:
+    0 if it passed, and 1 otherwise.
+    """
+    parser = argparse.ArgumentParser(description='Measure the cold-start import time of a '
+                                                 'module of the program.')
+    parser.add_argument('--module', default='computations')
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--top', type=int, default=10,
+                        help='the number of slowest imported modules to list')
+    parser.add_argument('--max-ms', type=float,
+                        help='fail if the median import time is above this many milliseconds')
+    options = parser.parse_args(arguments)
+
+    summary = run_benchmark(options.module, options.runs)
+    print('import {}: median {:.1f}ms, p90 {:.1f}ms, max {:.1f}ms over {} runs'.format(
+        options.module, summary['median_ms'], summary['p90_ms'], summary['max_ms'],
+        options.runs))
+    print('Slowest imports (cumulative):')
+    for name, seconds in slowest_imports(options.module, options.top):
+        print('    {:>8.1f}ms  {}'.format(seconds * 1000, name))
+
+    status = 0
+    if summary['forbidden_loaded']:
+        print('FAIL: importing {} loaded {}'.format(options.module,
+                                                    ', '.join(summary['forbidden_loaded'])))
+        status = 1
+    if options.max_ms is not None and summary['median_ms'] > options.max_ms:
+        print('FAIL: the median import time is above {:.1f}ms'.format(options.max_ms))
+        status = 1
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
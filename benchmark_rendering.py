@@ -0,0 +1,334 @@
+"""
+This file measures how fast the pygame simulation draws each of its scenes, by running the
+simulation offscreen with scripted input and comparing the results to a stored baseline.
+
+Each scene is benchmarked in a fresh process, with SDL's dummy video driver. The script
+hovers the mouse over every button of the home screen, clicks the button of the scene, holds
+RIGHT until the year has gone from 1993 to 2100, goes back to the home screen and closes the
+window. The simulation's clock is replaced by one that never waits and reports 1/60 of a
+second per frame, so every run draws exactly the frames a 60 frames per second run would,
+as fast as it can. For each scene, the benchmark reports:
+    - the frames per second and the distribution of the frame times while the scene is shown
+    - the 95th percentile of the slowest phase of the frames (see profiling.py)
+    - the time from starting the process to drawing the first frame
+    - the peak resident memory of the process
+
+Usage:
+    python benchmark_rendering.py --save baseline.json
+    python benchmark_rendering.py --baseline baseline.json --threshold 0.2
+
+With --baseline, the run fails if a measure of a scene is worse than in the baseline by more
+than the threshold (a fraction of the baseline).
+
+This file is Copyright (c) 2020 Yousuf Hassan, Aaditya Mandal, Faraz Hossein, and Dinkar Verma.
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+# The number of frames per second the simulation is told it runs at.
+FRAME_RATE = 60
+
+# The number of frames RIGHT is held: long enough for the year to go from 1993 to 2100 with
+# the default controls.YearController, which takes about 3.1 seconds.
+HOLD_FRAMES = 4 * FRAME_RATE
+
+# The number of frames the mouse stays over each button.
+HOVER_FRAMES = 6
+
+# The centre of the back button of the scenes.
+BACK_BUTTON = (50, 25)
+
+# The size of the window.
+WINDOW_SIZE = (600, 600)
+
+# The measures compared to the baseline, and whether a higher value is better.
+MEASURES = {'fps': True, 'frame_p50_ms': False, 'frame_p95_ms': False, 'frame_p99_ms': False,
+            'startup_s': False, 'peak_rss_mb': False}
+
+
+class ScriptedInput:
+    """The input of a benchmark run: the events, mouse position and keys pressed in each
+    frame, given to the simulation in place of pygame's.
+
+    The script is a list of steps. Each step's events happen in the first frame of the step,
+    and the step lasts for its number of frames.
+
+    Instance Attributes:
+        - steps: the number of frames, the keys held and the events of each step, in order
+        - position: the position of the mouse
+
+    Representation Invariants:
+        - all(step[0] >= 1 for step in self.steps)
+    """
+    steps: List[Tuple[int, Tuple[int, ...], List]]
+    position: Tuple[int, int]
+
+    # Private Instance Attributes:
+    #   - _index: the index of the current step, or -1 before the first frame
+    #   - _frames_left: the number of frames left in the current step
+    #   - _pygame: the pygame module
+    _index: int
+    _frames_left: int
+    _pygame: object
+
+    def __init__(self, pygame_module: object, buttons: List[Tuple[int, int]],
+                 target: Tuple[int, int], hold_frames: int) -> None:
+        """Initialize the script of a run hovering the buttons at the given positions, then
+        clicking the button at target and holding RIGHT for hold_frames frames.
+        """
+        self._pygame = pygame_module
+        self.position = (0, 0)
+        self.steps = [(HOVER_FRAMES, (), [self._motion(button)]) for button in buttons]
+        self.steps.extend([
+            (1, (), [self._motion(target), self._click(target)]),
+            (hold_frames, (pygame_module.K_RIGHT,), []),
+            (HOVER_FRAMES, (), [self._motion(BACK_BUTTON)]),
+            (1, (), [self._click(BACK_BUTTON)]),
+            (HOVER_FRAMES, (), []),
+            (1, (), [pygame_module.event.Event(pygame_module.QUIT)])])
+        self._index = -1
+        self._frames_left = 0
+
+    def _motion(self, position: Tuple[int, int]):
+        """Return an event moving the mouse to position."""
+        return self._pygame.event.Event(self._pygame.MOUSEMOTION, pos=position, rel=(0, 0),
+                                        buttons=(0, 0, 0))
+
+    def _click(self, position: Tuple[int, int]):
+        """Return an event clicking the mouse at position."""
+        return self._pygame.event.Event(self._pygame.MOUSEBUTTONDOWN, pos=position, button=1)
+
+    def get_events(self, *_args, **_kwargs) -> List:
+        """Return the events of this frame, moving to the next step if the current one is
+        over. Replaces pygame.event.get.
+        """
+        self._pygame.event.pump()
+        if self._frames_left > 0:
+            self._frames_left -= 1
+            return []
+
+        self._index = min(self._index + 1, len(self.steps) - 1)
+        self._frames_left = self.steps[self._index][0] - 1
+        events = self.steps[self._index][2]
+        for event in events:
+            if hasattr(event, 'pos'):
+                self.position = event.pos
+        return events
+
+    def get_pos(self) -> Tuple[int, int]:
+        """Return the position of the mouse. Replaces pygame.mouse.get_pos."""
+        return self.position
+
+    def get_pressed(self) -> '_Keys':
+        """Return the keys held in the current step. Replaces pygame.key.get_pressed."""
+        held = self.steps[self._index][1] if self._index >= 0 else ()
+        return _Keys(held)
+
+
+class _Keys:
+    """The state of the keyboard, indexed by key like the result of pygame.key.get_pressed.
+
+    Instance Attributes:
+        - held: the keys pressed
+    """
+    held: Tuple[int, ...]
+
+    def __init__(self, held: Tuple[int, ...]) -> None:
+        """Initialize the state of the keyboard with only the given keys pressed."""
+        self.held = held
+
+    def __getitem__(self, key: int) -> bool:
+        """Return whether the given key is pressed."""
+        return key in self.held
+
+
+class _FixedClock:
+    """A replacement for pygame.time.Clock that never waits and reports that every frame took
+    1 / FRAME_RATE of a second.
+    """
+
+    def tick(self, _framerate: int = 0) -> float:
+        """Return the number of milliseconds the frame is reported to have taken."""
+        return 1000 / FRAME_RATE
+
+
+def run_scene(scene: str, scene_file: Optional[str], hold_frames: int,
+              trace_file: str) -> Dict[str, float]:
+    """Run the simulation in this process with the script benchmarking the given scene, and
+    return its measures (see summarize), writing the times of its frames to trace_file.
+    """
+    start = time.perf_counter()
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    import pygame
+    import simulation
+    from scenes import button_layout, load_scenes
+
+    scenes = load_scenes(scene_file)
+    buttons = [(x, y) for x, y, _, _ in button_layout(scenes, WINDOW_SIZE)]
+    target = buttons[[each.name for each in scenes].index(scene)]
+    script = ScriptedInput(pygame, buttons, target, hold_frames)
+    pygame.event.get = script.get_events
+    pygame.mouse.get_pos = script.get_pos
+    pygame.key.get_pressed = script.get_pressed
+    pygame.time.Clock = _FixedClock
+
+    # The time of the first frame sent to the display
+    first_frame = []
+    for name in ('flip', 'update'):
+        send = getattr(pygame.display, name)
+
+        def timed_send(*args, send=send) -> None:
+            if not first_frame:
+                first_frame.append(time.perf_counter())
+            send(*args)
+        setattr(pygame.display, name, timed_send)
+
+    try:
+        simulation.run_simulation(scene_file, trace_file=trace_file)
+    except SystemExit:
+        pass
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_rss_mb = peak_rss / 2 ** 20 if sys.platform == 'darwin' else peak_rss / 2 ** 10
+    with open(trace_file) as file:
+        trace = json.load(file)
+    return {**summarize(trace, scene), 'startup_s': first_frame[0] - start,
+            'peak_rss_mb': peak_rss_mb}
+
+
+def summarize(trace: Dict, scene: str) -> Dict[str, float]:
+    """Return the number of frames of the given scene in the trace written by a
+    profiling.FrameProfiler, the frames per second, the percentiles of the time between frames
+    in milliseconds, and the phase of the frames with the highest 95th percentile.
+    """
+    starts = np.array([event['ts'] for event in trace['traceEvents'] if event['name'] == scene])
+    intervals = np.diff(starts) / 1000
+    phases = {phase: stats['p95'] for phase, stats in trace['summary'][scene].items()
+              if phase != 'total'}
+    slowest = max(phases, key=phases.get)
+    return {'frames': len(starts), 'fps': 1000 / intervals.mean(),
+            'frame_p50_ms': float(np.percentile(intervals, 50)),
+            'frame_p95_ms': float(np.percentile(intervals, 95)),
+            'frame_p99_ms': float(np.percentile(intervals, 99)),
+            'frame_max_ms': float(intervals.max()),
+            'slowest_phase': slowest, 'slowest_phase_p95_ms': phases[slowest]}
+
+
+def benchmark_scene(scene: str, scene_file: Optional[str], hold_frames: int,
+                    runs: int) -> Dict[str, float]:
+    """Benchmark the given scene in runs fresh processes and return the median of each
+    measure.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        for run in range(runs):
+            result_file = os.path.join(folder, '{}.json'.format(run))
+            arguments = ['--child', scene, '--result', result_file,
+                         '--hold-frames', str(hold_frames)]
+            if scene_file is not None:
+                arguments.extend(['--scene-file', os.path.abspath(scene_file)])
+            program = 'import benchmark_rendering; benchmark_rendering.main({!r})'.format(
+                arguments)
+            subprocess.run([sys.executable, '-c', program], check=True,
+                           stdout=subprocess.DEVNULL,
+                           cwd=os.path.dirname(os.path.abspath(__file__)))
+            with open(result_file) as file:
+                results.append(json.load(file))
+
+    # The slowest phase is the one of the run with the median frames per second.
+    median_run = results[int(np.argsort([result['fps'] for result in results])[runs // 2])]
+    summary = {key: float(np.median([result[key] for result in results]))
+               for key in results[0] if key != 'slowest_phase'}
+    summary['slowest_phase'] = median_run['slowest_phase']
+    return summary
+
+
+def regressions(results: Dict[str, Dict], baseline: Dict[str, Dict],
+                threshold: float) -> List[str]:
+    """Return a description of every measure of a scene worse than in the baseline by more
+    than threshold, a fraction of the baseline.
+    """
+    found = []
+    for scene, measures in results.items():
+        if scene not in baseline:
+            continue
+        for measure, higher_is_better in MEASURES.items():
+            old, new = baseline[scene][measure], measures[measure]
+            change = (old - new if higher_is_better else new - old) / old
+            if change > threshold:
+                found.append('{} {}: {:.2f} -> {:.2f} ({:+.0%})'.format(
+                    scene, measure, old, new, (new - old) / old))
+    return found
+
+
+def main(arguments: Optional[Sequence[str]] = None) -> int:
+    """Run the benchmark described by the command line arguments and return the exit status:
+    0 if it passed, and 1 otherwise.
+    """
+    parser = argparse.ArgumentParser(description='Measure how fast the simulation draws its '
+                                                 'scenes.')
+    parser.add_argument('--scenes', nargs='+', help='the names of the scenes to benchmark')
+    parser.add_argument('--scene-file', help='a json file describing more scenes')
+    parser.add_argument('--runs', type=int, default=1,
+                        help='the number of runs of each scene; the median is reported')
+    parser.add_argument('--hold-frames', type=int, default=HOLD_FRAMES,
+                        help='the number of frames RIGHT is held')
+    parser.add_argument('--save', help='write the results to this json file')
+    parser.add_argument('--baseline', help='compare the results to this json file')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='the largest worsening of a measure allowed, as a fraction')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--result', help=argparse.SUPPRESS)
+    options = parser.parse_args(arguments)
+
+    if options.child is not None:
+        result = run_scene(options.child, options.scene_file, options.hold_frames,
+                           options.result + '.trace')
+        with open(options.result, 'w') as file:
+            json.dump(result, file)
+        return 0
+
+    from scenes import load_scenes
+    names = options.scenes or [scene.name for scene in load_scenes(options.scene_file)]
+    results = {}
+    print('{:<12}{:>8}{:>8}{:>9}{:>9}{:>9}{:>10}{:>10}  slowest phase (p95)'.format(
+        'scene', 'frames', 'fps', 'p50 ms', 'p95 ms', 'p99 ms', 'start s', 'rss MB'))
+    for name in names:
+        result = benchmark_scene(name, options.scene_file, options.hold_frames, options.runs)
+        results[name] = result
+        print('{:<12}{:>8.0f}{:>8.1f}{:>9.3f}{:>9.3f}{:>9.3f}{:>10.3f}{:>10.1f}  {} {:.3f} ms'
+              .format(name, result['frames'], result['fps'], result['frame_p50_ms'],
+                      result['frame_p95_ms'], result['frame_p99_ms'], result['startup_s'],
+                      result['peak_rss_mb'], result['slowest_phase'],
+                      result['slowest_phase_p95_ms']))
+
+    if options.save is not None:
+        with open(options.save, 'w') as file:
+            json.dump({'python': platform.python_version(), 'machine': platform.machine(),
+                       'scenes': results}, file, indent=2)
+
+    if options.baseline is None:
+        return 0
+    with open(options.baseline) as file:
+        baseline = json.load(file)['scenes']
+    found = regressions(results, baseline, options.threshold)
+    for regression in found:
+        print('FAIL: ' + regression)
+    if not found:
+        print('No measure is more than {:.0%} worse than the baseline'.format(
+            options.threshold))
+    return 1 if found else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,200 @@
+"""
+This file handles the on-disk cache of the parsed and aggregated datasets.
+
+Reading a dataset and calculating its annual means is only done the first time the dataset
+is used, or after it changes. The parsed samples and the annual means are then saved as .npy
+files in a .cache folder next to the dataset, and every later load memory maps them instead
+of parsing the dataset again.
+
+Each cache entry is named after a hash of the dataset's contents and the version of the
+parser (see ingest.py), so an entry is never used for a dataset it was not built from.
+A small index file remembers the size and modification time of the dataset, so an
+unchanged dataset does not even have to be hashed.
+
+This file is Copyright (c) 2020 Yousuf Hassan, Aaditya Mandal, Faraz Hossein, and Dinkar Verma.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from typing import Dict, Tuple
+import numpy as np
+from computations import mean_sea_level_change
+from ingest import PARSER_VERSION, AltimetrySamples, read_altimetry
+from series import SeaLevelSeries
+
+CACHE_FOLDER = '.cache'
+
+# The datasets already loaded by this process, mapping the path of each dataset to its
+# (size, modification time) when it was loaded and the loaded data.
+_loaded = {}
+
+
+class CachedDataset:
+    """The parsed samples and the annual means of a dataset.
+
+    The arrays of both are read-only, since they are memory mapped from the cache.
+
+    Instance Attributes:
+        - samples: the samples of the dataset
+        - annual: the average global mean sea level of each year of the dataset
+    """
+    samples: AltimetrySamples
+    annual: SeaLevelSeries
+
+    def __init__(self, samples: AltimetrySamples, annual: SeaLevelSeries) -> None:
+        """Initialize a new cached dataset."""
+        self.samples = samples
+        self.annual = annual
+
+    def sample_series(self) -> SeaLevelSeries:
+        """Return the samples of the dataset as a series, i.e. what read_csv returns."""
+        return SeaLevelSeries.from_samples(self.samples.times, self.samples.values)
+
+
+def load_dataset(filename: str) -> CachedDataset:
+    """Return the samples and annual means of the dataset with the given filename.
+
+    They are loaded from the cache if it has an entry for the current contents of the
+    dataset, and are otherwise calculated and saved to the cache.
+    """
+    path = os.path.abspath(filename)
+    stat = _stat_key(path)
+    if path in _loaded and _loaded[path][0] == stat:
+        return _loaded[path][1]
+
+    folder = os.path.join(os.path.dirname(path), CACHE_FOLDER)
+    index_file = os.path.join(folder, os.path.basename(path) + '.json')
+    index = _read_json(index_file)
+
+    if index.get('stat') == list(stat) and index.get('parser_version') == PARSER_VERSION:
+        key = index['key']
+    else:
+        key = '{}-{}'.format(_hash_file(path), PARSER_VERSION)
+    entry = os.path.join(folder, os.path.basename(path) + '-' + key)
+
+    if not os.path.isdir(entry):
+        _build_entry(path, entry)
+        _remove_stale_entries(folder, os.path.basename(path), entry)
+    if index.get('key') != key or index.get('stat') != list(stat):
+        _write_json(index_file, {'stat': list(stat), 'parser_version': PARSER_VERSION,
+                                 'key': key})
+
+    dataset = _load_entry(entry)
+    _loaded[path] = (stat, dataset)
+    return dataset
+
+
+def load_annual_means(filename: str) -> SeaLevelSeries:
+    """Return the average global mean sea level of each year of the dataset with the given
+    filename, i.e. mean_sea_level_change(read_csv(filename)), using the cache.
+    """
+    return load_dataset(filename).annual
+
+
+def clear_cache(filename: str) -> None:
+    """Remove every cache entry of the dataset with the given filename."""
+    path = os.path.abspath(filename)
+    _loaded.pop(path, None)
+    folder = os.path.join(os.path.dirname(path), CACHE_FOLDER)
+    _remove_stale_entries(folder, os.path.basename(path), '')
+    if os.path.exists(os.path.join(folder, os.path.basename(path) + '.json')):
+        os.remove(os.path.join(folder, os.path.basename(path) + '.json'))
+
+
+def _build_entry(path: str, entry: str) -> None:
+    """Parse the dataset at path and save its samples and annual means to the folder entry.
+
+    The files are written to a temporary folder that is renamed to entry once complete, so
+    other processes never see a partially written entry.
+    """
+    import tempfile
+
+    samples = read_altimetry(path)
+    annual = mean_sea_level_change(SeaLevelSeries.from_samples(samples.times, samples.values))
+
+    os.makedirs(os.path.dirname(entry), exist_ok=True)
+    building = tempfile.mkdtemp(dir=os.path.dirname(entry))
+    np.save(os.path.join(building, 'times.npy'), samples.times)
+    np.save(os.path.join(building, 'values.npy'), samples.values)
+    np.save(os.path.join(building, 'missions.npy'), samples.missions)
+    np.save(os.path.join(building, 'annual_years.npy'), annual.years)
+    np.save(os.path.join(building, 'annual_values.npy'), annual.values)
+    _write_json(os.path.join(building, 'header.json'),
+                {'mission_names': list(samples.mission_names), 'header': samples.header})
+
+    try:
+        os.rename(building, entry)
+    except OSError:
+        # Another process finished building the same entry first.
+        shutil.rmtree(building, ignore_errors=True)
+
+
+def _load_entry(entry: str) -> CachedDataset:
+    """Return the dataset saved in the cache folder entry, with its arrays memory mapped."""
+    def load(name: str) -> np.ndarray:
+        """Return the memory mapped array with the given name."""
+        return np.load(os.path.join(entry, name + '.npy'), mmap_mode='r')
+
+    metadata = _read_json(os.path.join(entry, 'header.json'))
+    samples = AltimetrySamples(load('times'), load('values'), load('missions'),
+                               tuple(metadata['mission_names']), metadata['header'])
+
+    return CachedDataset(samples, SeaLevelSeries(load('annual_years'), load('annual_values')))
+
+
+def _remove_stale_entries(folder: str, name: str, current: str) -> None:
+    """Remove the cache entries of the dataset with the given name, other than current."""
+    if not os.path.isdir(folder):
+        return
+    for entry in os.listdir(folder):
+        path = os.path.join(folder, entry)
+        if entry.startswith(name + '-') and os.path.isdir(path) and path != current:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def _stat_key(path: str) -> Tuple[int, int]:
+    """Return the size and modification time of the file at path."""
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _hash_file(path: str) -> str:
+    """Return the SHA-256 hash of the contents of the file at path."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _read_json(path: str) -> Dict:
+    """Return the contents of the json file at path, or an empty dictionary if it cannot
+    be read.
+    """
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_json(path: str, contents: Dict) -> None:
+    """Write contents to the json file at path, replacing it all at once."""
+    temporary = path + '.tmp{}'.format(os.getpid())
+    with open(temporary, 'w') as file:
+        json.dump(contents, file)
+    os.replace(temporary, path)
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['hashlib', 'json', 'os', 'shutil', 'tempfile', 'numpy', 'Dict',
+                          'Tuple', 'computations', 'ingest', 'series'],
+        'allowed-io': ['_hash_file', '_read_json', '_write_json'],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })
@@ -4,137 +4,148 @@ This file handles all the computations of the program.
 All the corresponding global mean sea level values are in mm.
 The details of each computation is in its function docstring.
 
+Every computation takes and returns a SeaLevelSeries (see series.py), so the whole series is
+processed at once with numpy instead of one dictionary entry at a time. Use the to_dict
+method of a series to get the dictionary mapping the years to the values.
+
 This file is Copyright (c) 2020 Yousuf Hassan, Aaditya Mandal, Faraz Hossein, and Dinkar Verma.
 """
 
-import csv
-import pprint
-from typing import Dict, List
-import python_ta
+from typing import Optional
+import numpy as np
+from decomposition import ShareSchedule, decompose_schedule
+from fitting import DEGREES, fitted_schedule
+from ingest import read_altimetry
+from projection import RateSchedule, project_series
+from series import SeaLevelSeries
 
+# The contribution of each factor to the global mean sea level rise (Church et al. 1151).
+FACTOR_SHARES = np.array([0.41, 0.35, 0.24])
 
-def read_csv(filename: str) -> Dict[str, float]:
-    """ Read the csv file and return a dictionary mapping the years to the global mean
-    sea levels.
-    """
-    average_data = {}
-    with open(filename) as file:
-        reader = csv.reader(file)
 
-        for _ in range(0, 8):  # skip over the first 8 rows
-            next(reader)
+def read_csv(filename: str) -> SeaLevelSeries:
+    """ Read the csv file and return a series of the global mean sea level samples.
 
-        for row in reader:
-            if row[4] != '':
-                average_data[row[0]] = float(row[4])
-            elif row[3] != '':
-                average_data[row[0]] = float(row[3])
-            elif row[2] != '':
-                average_data[row[0]] = float(row[2])
-            else:
-                average_data[row[0]] = float(row[1])
+    Each sample takes its value from the most recent mission that measured it, i.e. Jason-3,
+    then Jason-2, then Jason-1, then TOPEX/Poseidon. Use ingest.read_altimetry to also get
+    the mission each sample came from.
+    """
+    samples = read_altimetry(filename)
 
-        return average_data
+    return SeaLevelSeries.from_samples(samples.times, samples.values)
 
 
-def mean_sea_level_change(csv_data: Dict[str, float]) -> Dict[str, float]:
-    """ Calculate the average global mean sea level for each year and return a dictionary
-    mapping the years to the average global mean sea levels for that year.
+def mean_sea_level_change(csv_data: SeaLevelSeries) -> SeaLevelSeries:
+    """ Calculate the average global mean sea level for each year and return an annual
+    series of the average global mean sea levels for that year.
 
     This function calculates the average global mean sea level by adding all the values
     for a specific year and then dividing it by the total amount of values.
 
 
     """
-    average_data = {}
+    years, index = np.unique(csv_data.years, return_inverse=True)
+    totals = np.bincount(index, weights=csv_data.values, minlength=len(years))
+    counts = np.bincount(index, minlength=len(years))
 
-    for year in csv_data:
-        whole_year = year[0:4]
-        if whole_year not in average_data:
-            average_data[whole_year] = [csv_data[year]]
-        else:
-            average_data[whole_year].append(csv_data[year])
+    return SeaLevelSeries(years, np.round(totals / counts, 2))
 
-    for year in average_data:
-        average_data[year] = round(sum(average_data[year]) / len(average_data[year]), 2)
 
-    return average_data
+def predict_2021_2080(sea_level_2020: float,
+                      schedule: Optional[RateSchedule] = None) -> SeaLevelSeries:
+    """ Predict the global mean sea level for each year from 2021 to 2080 and return an
+    annual series of the global mean sea level for that year, starting with 2020.
 
-
-def predict_2021_2080(sea_level_2020: float) -> Dict[str, float]:
-    """ Predict the global mean sea level for each year from 2021 to 2080 and return a
-    dictionary mapping the years to the global mean sea level for that year.
-
-    According to NASA, the rate of change is 3.3mm per year.
+    According to NASA, the rate of change is 3.3mm per year. Other rates, e.g. the rates
+    fitted to the samples (see fitted_rates), can be given as a schedule instead.
     """
-    data_2021 = {'2020': sea_level_2020}
+    if schedule is None:
+        schedule = RateSchedule([2020], [3.3])
+    return project_series(schedule, sea_level_2020, 2020, 2080)
+
 
-    for year in range(2021, 2081):
-        data_2021[str(year)] = round(data_2021[str(year - 1)] + 3.3, 2)
+def predict_2081_2100(sea_level_2080: float,
+                      schedule: Optional[RateSchedule] = None) -> SeaLevelSeries:
+    """ Predict the global mean sea level for each year from 2081 to 2100 and return an
+    annual series of the global mean sea level for that year, starting with 2080.
 
-    return data_2021
+    The rate of change is on average 12mm per year from 2080-2100 (Church et al). Other
+    rates can be given as a schedule instead, like for predict_2021_2080.
+    """
+    if schedule is None:
+        schedule = RateSchedule([2080], [12.0])
+    return project_series(schedule, sea_level_2080, 2080, 2100)
 
 
-def predict_2081_2100(sea_level_2080: float) -> Dict[str, float]:
-    """ Predict the global mean sea level for each year from 2081 to 2100 and return a
-    dictionary mapping the years to the global mean sea level for that year.
+def fitted_rates(csv_data: SeaLevelSeries, fit: str = 'quadratic') -> RateSchedule:
+    """Return the rate schedule continuing the least squares fit of the given kind ('linear'
+    or 'quadratic') to the samples, to give to both predictions instead of the published
+    rates (see fitting.py). The value of an annual series is the average over its year, so it
+    is fitted at the middle of the year.
 
-    The rate of change is on average 12mm per year from 2080-2100 (Church et al).
+    Preconditions:
+        - fit in DEGREES
     """
-    data_2081 = {'2080': sea_level_2080}
-
-    for year in range(2081, 2101):
-        data_2081[str(year)] = round(data_2081[str(year - 1)] + 12.0, 2)
+    times = csv_data.years + 0.5 if csv_data.times is None else csv_data.times
+    return fitted_schedule(times, csv_data.values, DEGREES[fit])
 
-    return data_2081
 
+def combine_data(data_1993: SeaLevelSeries, data_2021: SeaLevelSeries,
+                 data_2081: SeaLevelSeries) -> SeaLevelSeries:
+    """ Return a combination of all three series.
 
-def combine_data(data_1993: Dict[str, float], data_2021: Dict[str, float],
-                 data_2081: Dict[str, float]) -> Dict[str, float]:
-    """ Return a combination of all three dictionaries.
+    If a year appears in more than one series, the value from the later series is kept.
+    To project past 2100 or with other rates, see projection.extend_series.
     """
-    data_1993.update(data_2021)
-    data_1993.update(data_2081)
+    years = np.concatenate([data_1993.years, data_2021.years, data_2081.years])
+    values = np.concatenate([data_1993.values, data_2021.values, data_2081.values])
+
+    # np.unique keeps the first occurrence, so search the reversed arrays to keep the last.
+    unique_years, last = np.unique(years[::-1], return_index=True)
 
-    return data_1993
+    return SeaLevelSeries(unique_years, values[::-1][last])
 
 
-def factor_contribution(total_data: Dict[str, float]) -> Dict[str, List[float]]:
-    """Return a dictionary mapping the years to a list containing global mean sea level
-    change by each factor.
+def factor_contribution(total_data: SeaLevelSeries,
+                        shares: Optional[ShareSchedule] = None) -> SeaLevelSeries:
+    """Return an annual series whose value for each year is a row containing global mean
+    sea level change by each factor.
 
-    The 0th index of the list is the global mean sea level rise due to the ocean heat capacity.
-    The 1st index of the list is the global mean sea level rise due to melting glaciers.
-    The 2nd index of the list is the global mean sea level rise due to melting ice sheets.
+    The 0th column of the row is the global mean sea level rise due to the ocean heat capacity.
+    The 1st column of the row is the global mean sea level rise due to melting glaciers.
+    The 2nd column of the row is the global mean sea level rise due to melting ice sheets.
 
     After performing calculations on Table 13.1, we find that on average, roughly 41% of the global
     mean sea level rise is a result of thermal expansion due to ocean heat contents, 35% is a
     result of melting glaciers, and 24% is a result of melting ice sheets (Church et al. 1151).
-    """
-    factor_data = {}
 
-    for year in total_data:
-        heat_capacity_contribution = round(0.41 * total_data[year], 2)
-        glaciers_contribution = round(0.35 * total_data[year], 2)
-        ice_sheets_contribution = round(0.24 * total_data[year], 2)
-        factor_data[year] = [heat_capacity_contribution, glaciers_contribution,
-                             ice_sheets_contribution]
+    Other shares, e.g. shares that change over time or have more factors, can be given as a
+    ShareSchedule (see decomposition.py).
+    """
+    if shares is None:
+        shares = ShareSchedule.constant(FACTOR_SHARES)
+    contributions = decompose_schedule(total_data.values, total_data.years, shares)
 
-    return factor_data
+    return SeaLevelSeries(total_data.years, contributions)
 
 
 if __name__ == '__main__':
+    import pprint
+    import python_ta
+
     data = read_csv('Datasets/global_mean_sea_level.csv')
     data_1993_2020 = mean_sea_level_change(data)
-    data_2021_2080 = predict_2021_2080(data_1993_2020['2020'])
-    data_2081_2100 = predict_2081_2100(data_2021_2080['2080'])
+    data_2021_2080 = predict_2021_2080(data_1993_2020[2020])
+    data_2081_2100 = predict_2081_2100(data_2021_2080[2080])
     combined_data = combine_data(data_1993_2020, data_2021_2080, data_2081_2100)
-    pprint.pprint(combined_data)
-    pprint.pprint(factor_contribution(combined_data))
+    pprint.pprint(combined_data.to_dict())
+    pprint.pprint(factor_contribution(combined_data).to_dict())
 
     python_ta.check_all(config={
-        'extra-imports': ['csv', 'Dict', 'List', 'pprint'],  # the names (strs) of imported modules
-        'allowed-io': ['read_csv'],  # the names (strs) of functions that call print/open/input
+        # the names (strs) of imported modules
+        'extra-imports': ['numpy', 'pprint', 'Optional', 'decomposition', 'fitting',
+                          'ingest', 'projection', 'series'],
+        'allowed-io': [],  # the names (strs) of functions that call print/open/input
         'max-line-length': 100,
         'disable': ['R1705', 'C0200']
     })
@@ -0,0 +1,137 @@
+"""
+This file handles changing the year shown by the pygame simulation.
+
+The year moves by one as soon as an arrow key is pressed. If the key is held, the year keeps
+moving, faster the longer the key is held. In auto-play mode, the year moves forward on its
+own until the last year. The year is moved according to the time since the last frame, so
+the frame loop never has to wait for it, and the year moves at the same speed at any frame
+rate.
+
+Between whole years, the controller also keeps track of the fraction of the year reached, so
+a scene can show the water rising smoothly instead of once per year.
+
+This file is Copyright (c) 2020 Yousuf Hassan, Aaditya Mandal, Faraz Hossein, and Dinkar Verma.
+"""
+
+
+class YearController:
+    """The year shown by a scene, and how fast it moves.
+
+    Instance Attributes:
+        - first_year: the earliest year that can be shown
+        - last_year: the latest year that can be shown
+        - time: the time shown, as a decimal year
+        - year: the year shown, i.e. the whole part of time
+        - repeat_delay: the number of seconds a key must be held before the year keeps moving
+        - repeat_rate: the number of years per second the year moves once a key is held
+        - acceleration: how much faster the year moves for every second a key is held, in
+          years per second per second
+        - max_rate: the fastest the year moves while a key is held, in years per second
+        - autoplay: whether the year moves forward on its own
+        - autoplay_rate: the number of years per second the year moves in auto-play mode
+        - max_step: the most seconds a single frame counts for, so the year does not jump
+          after a slow frame (e.g. while a scene's images load)
+
+    Representation Invariants:
+        - self.first_year <= self.time <= self.last_year
+        - self.year == int(self.time)
+        - 0 < self.repeat_rate <= self.max_rate
+        - self.acceleration >= 0
+        - self.autoplay_rate > 0
+    """
+    first_year: int
+    last_year: int
+    time: float
+    year: int
+    repeat_delay: float
+    repeat_rate: float
+    acceleration: float
+    max_rate: float
+    autoplay: bool
+    autoplay_rate: float
+    max_step: float
+
+    # Private Instance Attributes:
+    #   - _direction: the direction of the key held in the last frame (-1, 0 or 1)
+    #   - _held: the number of seconds that key has been held
+    _direction: int
+    _held: float
+
+    def __init__(self, first_year: int = 1993, last_year: int = 2100,
+                 repeat_delay: float = 0.3, repeat_rate: float = 10.0,
+                 acceleration: float = 20.0, max_rate: float = 60.0,
+                 autoplay_rate: float = 8.0, max_step: float = 0.25) -> None:
+        """Initialize a new controller showing first_year, not in auto-play mode."""
+        self.first_year = first_year
+        self.last_year = last_year
+        self.time = first_year
+        self.year = first_year
+        self.repeat_delay = repeat_delay
+        self.repeat_rate = repeat_rate
+        self.acceleration = acceleration
+        self.max_rate = max_rate
+        self.autoplay = False
+        self.autoplay_rate = autoplay_rate
+        self.max_step = max_step
+        self._direction = 0
+        self._held = 0.0
+
+    def reset(self) -> None:
+        """Show first_year again and stop auto-play mode."""
+        self._move(self.first_year - self.time)
+        self.autoplay = False
+        self._direction = 0
+        self._held = 0.0
+
+    def toggle_autoplay(self) -> None:
+        """Start or stop auto-play mode. Starting it at the last year starts from first_year."""
+        self.autoplay = not self.autoplay
+        if self.autoplay and self.time == self.last_year:
+            self._move(self.first_year - self.time)
+
+    def update(self, seconds: float, back: bool, forward: bool) -> bool:
+        """Move the year according to the number of seconds since the last frame and whether
+        the keys to move back or forward are held, and return whether the year changed.
+
+        Holding a key stops auto-play mode. Holding both keys does nothing.
+        """
+        seconds = min(max(seconds, 0.0), self.max_step)
+        direction = int(forward) - int(back)
+        old_year = self.year
+
+        if direction != 0:
+            self.autoplay = False
+            if direction != self._direction:
+                # A key was just pressed: move one year straight away.
+                self._held = 0.0
+                self._move(direction)
+            else:
+                self._held += seconds
+                repeating = self._held - self.repeat_delay
+                if repeating > 0:
+                    rate = min(self.repeat_rate + self.acceleration * repeating, self.max_rate)
+                    self._move(direction * rate * min(repeating, seconds))
+        elif self.autoplay:
+            self._move(self.autoplay_rate * seconds)
+            if self.time == self.last_year:
+                self.autoplay = False
+
+        self._direction = direction
+        return self.year != old_year
+
+    def _move(self, years: float) -> None:
+        """Move the time by the given (possibly fractional) number of years, staying between
+        first_year and last_year.
+        """
+        self.time = min(max(self.time + years, self.first_year), self.last_year)
+        self.year = int(self.time)
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': [],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })
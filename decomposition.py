@@ -0,0 +1,113 @@
+"""
+This file handles splitting the global mean sea level into the contribution of each factor
+(e.g. ocean heat capacity, glaciers and ice sheets).
+
+The share of each factor can change over time: a ShareSchedule gives the shares of every
+factor from each of a list of years onwards, for any number of factors. decompose then
+multiplies a whole series, or a block with one row per scenario and one column per year, by
+the shares of each year in a single broadcast operation. It can write into an existing array
+instead of allocating a new one, e.g. when it is called for every member of an ensemble.
+
+This file is Copyright (c) 2020 Yousuf Hassan, Aaditya Mandal, Faraz Hossein, and Dinkar Verma.
+"""
+
+from typing import Optional, Sequence
+import numpy as np
+
+
+class ShareSchedule:
+    """The share of the global mean sea level rise caused by each factor, over time.
+
+    Row i of shares applies from start_years[i] up to the year before start_years[i + 1].
+    The first row also applies to every year before its start. If interpolate is True, the
+    shares instead change linearly from one row to the next between their start years.
+
+    Instance Attributes:
+        - start_years: the year each row of shares starts to apply
+        - shares: the share of each factor (column) from each start year (row)
+        - interpolate: whether the shares change linearly between start years
+
+    Representation Invariants:
+        - self.shares.shape[0] == len(self.start_years) > 0
+        - all(self.start_years[i] < self.start_years[i + 1]
+              for i in range(len(self.start_years) - 1))
+    """
+    start_years: np.ndarray
+    shares: np.ndarray
+    interpolate: bool
+
+    def __init__(self, start_years: Sequence[int], shares: Sequence[Sequence[float]],
+                 interpolate: bool = False) -> None:
+        """Initialize a new share schedule.
+
+        Preconditions:
+            - len(start_years) == len(shares) > 0
+            - every row of shares has the same number of factors
+            - start_years is sorted in strictly increasing order
+        """
+        self.start_years = np.asarray(start_years, dtype=np.int64)
+        self.shares = np.asarray(shares, dtype=np.float64).reshape(len(self.start_years), -1)
+        self.interpolate = interpolate
+
+    @classmethod
+    def constant(cls, shares: Sequence[float]) -> 'ShareSchedule':
+        """Return a schedule with the same shares every year."""
+        return cls([0], [shares])
+
+    def num_factors(self) -> int:
+        """Return the number of factors of this schedule."""
+        return self.shares.shape[1]
+
+    def at(self, years: np.ndarray) -> np.ndarray:
+        """Return the shares of the given years, with one row per year and one column per
+        factor.
+        """
+        years = np.asarray(years)
+        rows = np.searchsorted(self.start_years, years, side='right') - 1
+        rows = np.clip(rows, 0, len(self.start_years) - 1)
+        if not self.interpolate or len(self.start_years) == 1:
+            return self.shares[rows]
+
+        # Interpolate between the row each year is in and the next one.
+        rows = np.minimum(rows, len(self.start_years) - 2)
+        spans = self.start_years[rows + 1] - self.start_years[rows]
+        weights = np.clip((years - self.start_years[rows]) / spans, 0.0, 1.0)[:, np.newaxis]
+        return (1 - weights) * self.shares[rows] + weights * self.shares[rows + 1]
+
+
+def decompose(levels: np.ndarray, shares: np.ndarray, out: Optional[np.ndarray] = None,
+              decimals: Optional[int] = 2) -> np.ndarray:
+    """Return the change in global mean sea level caused by each factor, as an array with the
+    shape of levels plus a last axis with one entry per factor.
+
+    levels is a series of levels (one per year) or a block of them (e.g. one row per scenario
+    and one column per year). shares is broadcast against it along the last axis: it can be
+    one share per factor, the shares of each year (see ShareSchedule.at), or one set of
+    shares per scenario, etc.
+
+    The result is written to out if it is given, and rounded to the given number of decimals
+    unless it is None.
+    """
+    out = np.multiply(np.asarray(levels)[..., np.newaxis], shares, out=out)
+    if decimals is not None:
+        np.round(out, decimals, out=out)
+    return out
+
+
+def decompose_schedule(levels: np.ndarray, years: np.ndarray, schedule: ShareSchedule,
+                       out: Optional[np.ndarray] = None,
+                       decimals: Optional[int] = 2) -> np.ndarray:
+    """Return the change in global mean sea level caused by each factor, where the last axis
+    of levels holds the given years and the shares of each year come from schedule.
+    """
+    return decompose(levels, schedule.at(years), out, decimals)
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['numpy', 'Optional', 'Sequence'],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })
@@ -0,0 +1,296 @@
+"""
+This file handles Monte Carlo ensembles of global mean sea level projections.
+
+Instead of one projection with fixed rates and factor shares, every member of an ensemble
+draws its rates from normal distributions and its factor shares (see
+computations.factor_contribution) from a Dirichlet distribution, and the result is the
+percentiles of the members for each year.
+
+The members are generated in batches. Each batch draws its random numbers from its own
+stream, seeded from the ensemble's seed and the batch's number, so the members are the
+same no matter how many worker processes run the batches. Instead of keeping every member,
+each batch only counts how many members fall in each of a fixed set of bins for each year,
+and the percentiles are read off the total counts.
+
+This file is Copyright (c) 2020 Yousuf Hassan, Aaditya Mandal, Faraz Hossein, and Dinkar Verma.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Sequence, Tuple
+import numpy as np
+from computations import FACTOR_SHARES
+from decomposition import decompose
+from projection import DEFAULT_SCHEDULE, RateSchedule, accumulate, piecewise_changes
+
+# The number of members generated at once.
+BATCH_SIZE = 10000
+
+# The number of batches each task sent to a worker process runs. A task only sends back its
+# counts once, so larger tasks mean less data sent between processes.
+BATCHES_PER_TASK = 10
+
+# The number of bins the range of levels of each year is split into.
+NUM_BINS = 2048
+
+# The number of standard deviations either side of the mean level covered by the bins.
+# Members outside of this range are counted in the first or last bin.
+BIN_RANGE = 8.0
+
+
+class EnsembleConfig:
+    """The distributions the members of an ensemble are drawn from.
+
+    Instance Attributes:
+        - schedule: the mean rates and accelerations of each piece (see RateSchedule)
+        - rate_std: the standard deviation of the rate of each piece, in mm per year
+        - acceleration_std: the standard deviation of the acceleration of each piece
+        - shares: the mean share of the sea level rise caused by each factor
+        - share_concentration: the concentration of the Dirichlet distribution of the shares;
+          the larger it is, the closer the shares of each member are to the mean shares.
+          If it is None, every member has the mean shares.
+        - base_level: the global mean sea level of base_year, in mm
+        - base_year: the year the projections start from
+        - end_year: the last year of the projections
+
+    Representation Invariants:
+        - len(self.rate_std) == len(self.acceleration_std) == len(self.schedule.rates)
+        - abs(sum(self.shares) - 1) < 1e-9
+        - self.share_concentration is None or self.share_concentration > 0
+        - self.base_year < self.end_year
+    """
+    schedule: RateSchedule
+    rate_std: np.ndarray
+    acceleration_std: np.ndarray
+    shares: np.ndarray
+    share_concentration: Optional[float]
+    base_level: float
+    base_year: int
+    end_year: int
+
+    def __init__(self, base_level: float, base_year: int = 2020, end_year: int = 2100,
+                 schedule: RateSchedule = DEFAULT_SCHEDULE,
+                 rate_std: Optional[Sequence[float]] = None,
+                 acceleration_std: Optional[Sequence[float]] = None,
+                 shares: Sequence[float] = tuple(FACTOR_SHARES),
+                 share_concentration: Optional[float] = 100.0) -> None:
+        """Initialize a new ensemble configuration.
+
+        By default, the standard deviation of each rate is 20% of the rate, the accelerations
+        are not random, and the shares are those of computations.factor_contribution.
+        """
+        self.schedule = schedule
+        if rate_std is None:
+            rate_std = 0.2 * np.abs(schedule.rates)
+        if acceleration_std is None:
+            acceleration_std = np.zeros(len(schedule.rates))
+        self.rate_std = np.asarray(rate_std, dtype=np.float64)
+        self.acceleration_std = np.asarray(acceleration_std, dtype=np.float64)
+        self.shares = np.asarray(shares, dtype=np.float64)
+        self.share_concentration = share_concentration
+        self.base_level = base_level
+        self.base_year = base_year
+        self.end_year = end_year
+
+    def years(self) -> np.ndarray:
+        """Return the years of the projections, starting with base_year."""
+        return np.arange(self.base_year, self.end_year + 1)
+
+
+class EnsembleResult:
+    """The percentiles of the members of an ensemble for each year.
+
+    Instance Attributes:
+        - years: the years of the projections
+        - percentiles: the percentiles calculated, between 0 and 100
+        - levels: the global mean sea level of each percentile (row) and year (column)
+        - factors: the sea level change caused by each factor (first axis), for each
+          percentile and year
+        - mean_levels: the mean global mean sea level of each year
+        - num_members: the number of members of the ensemble
+
+    Representation Invariants:
+        - self.levels.shape == (len(self.percentiles), len(self.years))
+        - self.factors.shape[1:] == self.levels.shape
+        - self.mean_levels.shape == self.years.shape
+    """
+    years: np.ndarray
+    percentiles: np.ndarray
+    levels: np.ndarray
+    factors: np.ndarray
+    mean_levels: np.ndarray
+    num_members: int
+
+    def __init__(self, years: np.ndarray, percentiles: np.ndarray, levels: np.ndarray,
+                 factors: np.ndarray, mean_levels: np.ndarray, num_members: int) -> None:
+        """Initialize a new ensemble result."""
+        self.years = years
+        self.percentiles = percentiles
+        self.levels = levels
+        self.factors = factors
+        self.mean_levels = mean_levels
+        self.num_members = num_members
+
+    def band(self, percentile: float) -> np.ndarray:
+        """Return the global mean sea level of each year at the given percentile.
+
+        Preconditions:
+            - percentile in self.percentiles
+        """
+        return self.levels[list(self.percentiles).index(percentile)]
+
+
+def run_ensemble(config: EnsembleConfig, num_members: int, seed: int = 0,
+                 percentiles: Sequence[float] = (5, 17, 50, 83, 95),
+                 workers: Optional[int] = None) -> EnsembleResult:
+    """Run an ensemble of num_members members with the given configuration and return the
+    given percentiles of the members for each year.
+
+    The batches of members are spread across the given number of worker processes (by
+    default, one per CPU). The result only depends on the seed, not on the number of workers.
+    """
+    lower, width = _bins(config)
+    num_batches = -(-num_members // BATCH_SIZE)
+    tasks = [(config, seed, first, min(first + BATCHES_PER_TASK, num_batches), num_members,
+              lower, width) for first in range(0, num_batches, BATCHES_PER_TASK)]
+
+    if workers == 1 or len(tasks) == 1:
+        results = map(_run_task, tasks)
+        counts, sums = _combine(results)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            counts, sums = _combine(executor.map(_run_task, tasks))
+
+    quantiles = np.asarray(percentiles, dtype=np.float64) / 100
+    levels = _histogram_quantiles(counts[0], lower[0], width[0], quantiles)
+    factors = np.stack([_histogram_quantiles(counts[i], lower[i], width[i], quantiles)
+                        for i in range(1, len(counts))])
+
+    return EnsembleResult(config.years(), np.asarray(percentiles, dtype=np.float64), levels,
+                          factors, sums / num_members, num_members)
+
+
+def draw_members(config: EnsembleConfig, batch: int, size: int,
+                 seed: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Draw the members of the given batch, and return their global mean sea levels (one row
+    per member and one column per year) and their factor shares (one row per member).
+    """
+    rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(batch,)))
+    schedule = config.schedule
+
+    rates = rng.normal(schedule.rates, config.rate_std, size=(size, len(schedule.rates)))
+    accelerations = rng.normal(schedule.accelerations, config.acceleration_std,
+                               size=(size, len(schedule.rates)))
+    if config.share_concentration is None:
+        shares = np.broadcast_to(config.shares, (size, len(config.shares)))
+    else:
+        shares = rng.dirichlet(config.shares * config.share_concentration, size=size)
+
+    changes = piecewise_changes(schedule.start_years[np.newaxis, :], rates, accelerations,
+                                config.years()[1:])
+    return accumulate(changes, config.base_level, decimals=None), shares
+
+
+def _run_task(task: Tuple) -> Tuple[np.ndarray, np.ndarray]:
+    """Run the batches of a task and return the counts of the levels and factor changes in
+    each bin, and the sum of the levels of each year.
+    """
+    config, seed, first_batch, end_batch, num_members, lower, width = task
+    num_years = len(config.years())
+    counts = np.zeros((len(lower), num_years * NUM_BINS), dtype=np.int64)
+    sums = np.zeros(num_years)
+    year_offsets = np.arange(num_years) * NUM_BINS
+    factors = np.empty((BATCH_SIZE, num_years, len(config.shares)))
+
+    for batch in range(first_batch, end_batch):
+        size = min(BATCH_SIZE, num_members - batch * BATCH_SIZE)
+        levels, shares = draw_members(config, batch, size, seed)
+        sums += levels.sum(axis=0)
+        decompose(levels, shares[:, np.newaxis, :], out=factors[:size], decimals=None)
+
+        values = [levels] + [factors[:size, :, i] for i in range(len(config.shares))]
+        for i, value in enumerate(values):
+            bins = np.clip(((value - lower[i]) / width[i]).astype(np.int64), 0, NUM_BINS - 1)
+            counts[i] += np.bincount((bins + year_offsets).ravel(), minlength=counts.shape[1])
+
+    return counts.reshape(len(lower), num_years, NUM_BINS), sums
+
+
+def _combine(results) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the total counts and sums of the results of the tasks, added in task order."""
+    counts, sums = None, None
+    for task_counts, task_sums in results:
+        if counts is None:
+            counts, sums = task_counts, task_sums
+        else:
+            counts += task_counts
+            sums += task_sums
+    return counts, sums
+
+
+def _bins(config: EnsembleConfig) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the lower end of the bins and the bin width of each year, for the levels (row 0)
+    and the change caused by each factor (the other rows).
+
+    A level is a linear function of the rates and accelerations, so its mean and standard
+    deviation for each year are calculated exactly from theirs.
+    """
+    schedule = config.schedule
+    num_pieces = len(schedule.rates)
+    years = config.years()[1:]
+    start_years = schedule.start_years[np.newaxis, :]
+    unit = np.eye(num_pieces)
+    none = np.zeros((num_pieces, num_pieces))
+
+    # The number of mm each year's level changes by per unit of each rate and acceleration.
+    per_rate = accumulate(piecewise_changes(start_years, unit, none, years), 0.0, None)
+    per_acceleration = accumulate(piecewise_changes(start_years, none, unit, years), 0.0, None)
+
+    mean = (config.base_level + schedule.rates @ per_rate
+            + schedule.accelerations @ per_acceleration)
+    std = np.sqrt((config.rate_std ** 2) @ per_rate ** 2
+                  + (config.acceleration_std ** 2) @ per_acceleration ** 2)
+    spread = np.maximum(BIN_RANGE * std, 1.0)
+    low, high = mean - spread, mean + spread
+
+    # A factor's change is the level times a share between 0 and 1.
+    factor_low, factor_high = np.minimum(low, 0.0), np.maximum(high, 0.0)
+    lower = np.stack([low] + [factor_low] * len(config.shares))
+    upper = np.stack([high] + [factor_high] * len(config.shares))
+
+    return lower, (upper - lower) / NUM_BINS
+
+
+def _histogram_quantiles(counts: np.ndarray, lower: np.ndarray, width: np.ndarray,
+                         quantiles: np.ndarray) -> np.ndarray:
+    """Return the given quantiles of each year (row) of counts, interpolating linearly within
+    the bin each quantile falls in.
+    """
+    cumulative = np.cumsum(counts, axis=1)
+    totals = cumulative[:, -1:]
+    targets = quantiles[np.newaxis, :] * totals
+
+    result = np.empty((len(quantiles), len(counts)))
+    for year in range(len(counts)):
+        bins = np.searchsorted(cumulative[year], targets[year], side='left')
+        bins = np.minimum(bins, NUM_BINS - 1)
+        before = np.where(bins > 0, cumulative[year][bins - 1], 0)
+        inside = np.maximum(counts[year][bins], 1)
+        fraction = np.clip((targets[year] - before) / inside, 0.0, 1.0)
+        result[:, year] = lower[year] + (bins + fraction) * width[year]
+
+    return result
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    result = run_ensemble(EnsembleConfig(63.94), 100000)
+    for percentile, levels in zip(result.percentiles, result.levels):
+        print('{:>4.0f}th percentile in 2100: {:.2f}mm'.format(percentile, levels[-1]))
+
+    python_ta.check_all(config={
+        'extra-imports': ['concurrent.futures', 'numpy', 'Optional', 'Sequence', 'Tuple',
+                          'computations', 'decomposition', 'projection'],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })
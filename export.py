@@ -0,0 +1,201 @@
+"""
+This file exports the frames of the scenes of the pygame simulation as image files or raw
+video, without opening a window.
+
+The frames are drawn exactly like the interactive simulation draws them (see frames.py),
+offscreen with SDL's dummy video driver, so no display is needed. Either one frame is drawn
+per year, or --steps-per-year frames per year with the water rising smoothly between years.
+The frames of each scene are split into chunks drawn by worker processes; each worker loads
+the images, fonts and data once and then draws every chunk it is given.
+
+Each scene is written to the output folder as a folder of numbered image files, or with
+--format raw, as a single file of raw 8-bit RGB frames, e.g. for
+    ffmpeg -f rawvideo -pix_fmt rgb24 -s 600x600 -r 30 -i venice.rgb venice.mp4
+Either way, <scene>.json describes the frames: their size, format and times.
+
+Usage:
+    python export.py -o frames
+    python export.py -o frames --scenes venice new_york --steps-per-year 12 --format raw
+
+This file is Copyright (c) 2020 Yousuf Hassan, Aaditya Mandal, Faraz Hossein, and Dinkar Verma.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Sequence, Tuple
+import numpy as np
+import pygame
+from assets import AssetManager
+from frames import (FIRST_YEAR, LAST_YEAR, SceneFrames, load_fonts, load_levels,
+                    prerender_labels, scene_assets)
+from rendering import TextCache
+from scenes import load_scenes
+
+# The formats frames can be exported in: image files, or raw RGB frames.
+FORMATS = ('png', 'bmp', 'tga', 'jpg', 'raw')
+
+# The size of every frame.
+FRAME_SIZE = (600, 600)
+
+# The number of consecutive frames each task sent to a worker process draws.
+CHUNK_SIZE = 64
+
+# What each worker process loads once and keeps for every task (see _start_worker).
+_worker = {}
+
+
+def frame_times(steps_per_year: int) -> np.ndarray:
+    """Return the time (as a decimal year) of every frame, from FIRST_YEAR to LAST_YEAR, with
+    the given number of frames per year.
+    """
+    return FIRST_YEAR + np.arange((LAST_YEAR - FIRST_YEAR) * steps_per_year + 1) / steps_per_year
+
+
+def export_frames(output: str, scene_names: Optional[Sequence[str]] = None,
+                  steps_per_year: int = 1, image_format: str = 'png',
+                  scene_file: Optional[str] = None, workers: Optional[int] = None,
+                  chunk_size: int = CHUNK_SIZE) -> int:
+    """Export the frames of the scenes with the given names (by default, every scene) to the
+    folder output in the given format, and return the number of frames exported.
+
+    The frames are drawn by the given number of worker processes (by default, one per CPU).
+
+    Preconditions:
+        - image_format in FORMATS
+        - steps_per_year >= 1
+    """
+    scenes = load_scenes(scene_file)
+    names = [scene.name for scene in scenes] if scene_names is None else list(scene_names)
+    unknown = [name for name in names if name not in {scene.name for scene in scenes}]
+    if unknown:
+        raise ValueError('there are no scenes named {}'.format(unknown))
+
+    times = frame_times(steps_per_year)
+    os.makedirs(output, exist_ok=True)
+    for name in names:
+        _prepare_output(output, name, image_format, steps_per_year, len(times))
+
+    tasks = [(name, start, min(start + chunk_size, len(times)), steps_per_year, output,
+              image_format) for name in names for start in range(0, len(times), chunk_size)]
+    if workers == 1 or len(tasks) <= 1:
+        _start_worker(scene_file)
+        for task in tasks:
+            _run_task(task)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_start_worker,
+                                 initargs=(scene_file,)) as executor:
+            for _ in executor.map(_run_task, tasks):
+                pass
+
+    return len(names) * len(times)
+
+
+def _prepare_output(output: str, name: str, image_format: str, steps_per_year: int,
+                    num_frames: int) -> None:
+    """Create the folder or raw file the frames of the scene with the given name are written
+    to, and the json file describing them.
+    """
+    if image_format == 'raw':
+        with open(os.path.join(output, name + '.rgb'), 'wb') as file:
+            file.truncate(num_frames * FRAME_SIZE[0] * FRAME_SIZE[1] * 3)
+        frames = name + '.rgb'
+    else:
+        os.makedirs(os.path.join(output, name), exist_ok=True)
+        frames = os.path.join(name, '{:05d}.' + image_format)
+
+    description = {'scene': name, 'format': image_format, 'frames': frames,
+                   'pixel_format': 'rgb24', 'width': FRAME_SIZE[0], 'height': FRAME_SIZE[1],
+                   'num_frames': num_frames, 'first_time': FIRST_YEAR,
+                   'steps_per_year': steps_per_year}
+    with open(os.path.join(output, name + '.json'), 'w') as file:
+        json.dump(description, file)
+
+
+def _start_worker(scene_file: Optional[str]) -> None:
+    """Open an offscreen window and load what every task needs: the scenes, fonts and the
+    global mean sea level data. The images of each scene are loaded by its first task.
+    """
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    pygame.display.init()
+    pygame.font.init()
+    screen = pygame.display.set_mode(FRAME_SIZE)
+
+    scenes = load_scenes(scene_file)
+    specs, images = scene_assets(scenes)
+    fonts = load_fonts()
+    text_cache = TextCache()
+    prerender_labels(text_cache, fonts['label'])
+    curve_times, curve_levels = load_levels()
+
+    _worker.update({'screen': screen, 'scenes': {scene.name: scene for scene in scenes},
+                    'assets': AssetManager(specs, images, max_surfaces=len(specs)),
+                    'fonts': fonts, 'text_cache': text_cache,
+                    'curve': (curve_times, curve_levels), 'edges': {}, 'frames': {}})
+
+
+def _run_task(task: Tuple) -> None:
+    """Draw the frames of a task and write them to the output."""
+    name, start, end, steps_per_year, output, image_format = task
+    screen = _worker['screen']
+    if name not in _worker['frames']:
+        _worker['frames'][name] = SceneFrames(
+            screen, _worker['scenes'][name], _worker['assets'].enter_scene(name),
+            _worker['text_cache'], _worker['fonts'], _worker['curve'], _worker['edges'])
+    frames = _worker['frames'][name]
+    times = frame_times(steps_per_year)
+
+    # Every frame is drawn whole, since the screen was last drawn by another scene or task.
+    frames.renderer.invalidate()
+    if image_format == 'raw':
+        frame_bytes = FRAME_SIZE[0] * FRAME_SIZE[1] * 3
+        with open(os.path.join(output, name + '.rgb'), 'r+b') as file:
+            file.seek(start * frame_bytes)
+            for index in range(start, end):
+                _draw(frames, times[index])
+                file.write(pygame.image.tobytes(screen, 'RGB'))
+    else:
+        for index in range(start, end):
+            _draw(frames, times[index])
+            pygame.image.save(screen, os.path.join(output, name,
+                                                   '{:05d}.{}'.format(index, image_format)))
+
+
+def _draw(frames: SceneFrames, frame_time: float) -> None:
+    """Draw the frame of the given time to the screen."""
+    frames.show(frame_time)
+    frames.renderer.render()
+
+
+def main(arguments: Optional[Sequence[str]] = None) -> None:
+    """Export the frames described by the command line arguments."""
+    parser = argparse.ArgumentParser(description='Export the frames of the simulation scenes.')
+    parser.add_argument('-o', '--output', required=True,
+                        help='the folder the frames are written to')
+    parser.add_argument('--scenes', nargs='+', help='the names of the scenes to export')
+    parser.add_argument('--scene-file', help='a json file describing more scenes')
+    parser.add_argument('--steps-per-year', type=int, default=1,
+                        help='the number of frames per year')
+    parser.add_argument('--format', choices=FORMATS, default='png')
+    parser.add_argument('--workers', type=int, help='the number of worker processes')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    options = parser.parse_args(arguments)
+    if options.steps_per_year < 1:
+        parser.error('--steps-per-year must be at least 1')
+
+    start = time.perf_counter()
+    try:
+        num_frames = export_frames(options.output, options.scenes, options.steps_per_year,
+                                   options.format, options.scene_file, options.workers,
+                                   options.chunk_size)
+    except ValueError as error:
+        parser.error(str(error))
+    print('Exported {} frames to {} in {:.2f}s'.format(
+        num_frames, options.output, time.perf_counter() - start), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,159 @@
+"""
+This file handles fitting the trend and acceleration of the global mean sea level to the
+observed samples, instead of using fixed rates.
+
+A least squares fit of a line or a parabola only depends on a few sums over the samples:
+the sums of the powers of their times, and of their levels times those powers. A
+TrendStatistics keeps these sums, so samples can be added as they arrive at a constant cost
+per sample, and the fit is recalculated from the sums alone without going through the
+earlier samples again. The times are measured from a reference year close to the samples,
+so that the sums of their powers stay small enough to be exact.
+
+The sums of many series (e.g. one per tide-gauge station) can be kept and fitted at once,
+with one row per series.
+
+A fit is given by the level, the rate (in mm per year) and the acceleration (in mm per year
+per year) at the reference year; the acceleration of a linear fit is 0. It can be turned
+into a RateSchedule (see projection.py) that continues it into the future.
+
+This file is Copyright (c) 2020 Yousuf Hassan, Aaditya Mandal, Faraz Hossein, and Dinkar Verma.
+"""
+
+from typing import Tuple
+import numpy as np
+from projection import RateSchedule
+
+# The year the times of the samples are measured from by default.
+REFERENCE_YEAR = 2000.0
+
+# The degrees of the fits: a line (trend) or a parabola (trend and acceleration).
+DEGREES = {'linear': 1, 'quadratic': 2}
+
+
+class TrendStatistics:
+    """The sums over the samples of one or more series needed to fit their trend and
+    acceleration.
+
+    Instance Attributes:
+        - reference: the year the times of the samples are measured from
+        - moments: the sums of the 0th to 4th powers of the times of the samples, with one row
+          per series
+        - products: the sums of the levels of the samples times the 0th to 2nd powers of
+          their times, with one row per series
+
+    Representation Invariants:
+        - self.moments.shape[-1] == 5
+        - self.products.shape[-1] == 3
+        - self.moments.shape[:-1] == self.products.shape[:-1]
+    """
+    reference: float
+    moments: np.ndarray
+    products: np.ndarray
+
+    def __init__(self, reference: float = REFERENCE_YEAR, shape: Tuple[int, ...] = ()) -> None:
+        """Initialize new statistics without any samples, for series of the given shape (by
+        default, a single series).
+        """
+        self.reference = reference
+        self.moments = np.zeros(shape + (5,))
+        self.products = np.zeros(shape + (3,))
+
+    def add(self, times: np.ndarray, values: np.ndarray) -> None:
+        """Add samples with the given times (as decimal years) and levels.
+
+        values has a last axis with one entry per sample, and for several series, one row per
+        series; times is broadcast against it, e.g. when the series share their times.
+        Samples with a level of nan are left out.
+        """
+        times, values = np.broadcast_arrays(np.asarray(times, dtype=np.float64),
+                                            np.asarray(values, dtype=np.float64))
+        present = ~np.isnan(values)
+        powers = np.where(present[..., np.newaxis],
+                          (times - self.reference)[..., np.newaxis] ** np.arange(5), 0.0)
+        self.moments += powers.sum(axis=-2)
+        self.products += np.einsum('...n,...nk->...k', np.where(present, values, 0.0),
+                                   powers[..., :3])
+
+    def merge(self, other: 'TrendStatistics') -> None:
+        """Add the samples of other to these statistics.
+
+        Preconditions:
+            - other.reference == self.reference
+        """
+        self.moments += other.moments
+        self.products += other.products
+
+    def count(self) -> np.ndarray:
+        """Return the number of samples of each series."""
+        return self.moments[..., 0].astype(np.int64)
+
+    def fit(self, degree: int = 2) -> np.ndarray:
+        """Return the least squares fit of the given degree (1 for a line, 2 for a parabola)
+        to the samples, as the level, rate and acceleration at the reference year, with one
+        row per series.
+
+        Raise a ValueError if a series has fewer than degree + 1 samples at different times.
+
+        Preconditions:
+            - degree in (1, 2)
+        """
+        powers = np.arange(degree + 1)
+        matrices = self.moments[..., powers[:, np.newaxis] + powers[np.newaxis, :]]
+        try:
+            coefficients = np.linalg.solve(matrices, self.products[..., :degree + 1, np.newaxis])
+        except np.linalg.LinAlgError:
+            raise ValueError('a fit of degree {} needs samples at {} different times'.format(
+                degree, degree + 1)) from None
+
+        fit = np.zeros(self.moments.shape[:-1] + (3,))
+        fit[..., :degree + 1] = coefficients[..., 0]
+        fit[..., 2] *= 2
+        return fit
+
+    def rate(self, year: float, degree: int = 2) -> np.ndarray:
+        """Return the fitted rate of change at the given (decimal) year, in mm per year."""
+        fit = self.fit(degree)
+        return fit[..., 1] + fit[..., 2] * (year - self.reference)
+
+    def schedule(self, degree: int = 2) -> RateSchedule:
+        """Return a rate schedule continuing the fit of the given degree of a single series.
+
+        The annual mean of a year is the level in the middle of the year, so the change from
+        one annual mean to the next is the rate of the fit at the start of the later year.
+        """
+        start_year = int(np.floor(self.reference))
+        fit = self.fit(degree)
+        return RateSchedule([start_year], [float(self.rate(start_year + 0.5, degree))],
+                            [float(fit[..., 2])])
+
+
+def fit_trend(times: np.ndarray, values: np.ndarray, degree: int = 2,
+              reference: float = REFERENCE_YEAR) -> np.ndarray:
+    """Return the least squares fit of the given degree to the samples with the given times
+    and levels, as the level, rate and acceleration at the reference year (see
+    TrendStatistics.add and TrendStatistics.fit).
+    """
+    statistics = TrendStatistics(reference, np.broadcast_shapes(np.shape(times),
+                                                                np.shape(values))[:-1])
+    statistics.add(times, values)
+    return statistics.fit(degree)
+
+
+def fitted_schedule(times: np.ndarray, values: np.ndarray, degree: int = 2,
+                    reference: float = REFERENCE_YEAR) -> RateSchedule:
+    """Return a rate schedule continuing the least squares fit of the given degree to the
+    samples with the given times and levels.
+    """
+    statistics = TrendStatistics(reference)
+    statistics.add(times, values)
+    return statistics.schedule(degree)
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['numpy', 'Tuple', 'projection'],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })
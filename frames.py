@@ -0,0 +1,234 @@
+"""
+This file handles drawing the frames of the scenes of the pygame simulation: the background
+of a scene, the water at its height at any time (or the cells of the city flooded at the sea
+level of that time), the label of the year and the captions.
+
+The same drawing is used by the interactive simulation (see simulation.py) and to export
+frames without opening a window (see export.py), so both always show the same thing.
+
+This file is Copyright (c) 2020 Yousuf Hassan, Aaditya Mandal, Faraz Hossein, and Dinkar Verma.
+"""
+
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import pygame
+from assets import AssetSpec
+from cache import load_dataset
+from computations import predict_2021_2080, predict_2081_2100, combine_data, fitted_rates
+from inundation import load_flood_index
+from projection import level_curve
+from rendering import DirtyRenderer, FloodOverlay, TextCache, edge_strips
+from scenes import HOME_BACKGROUND, SUBPIXELS, FloodLayer, Scene
+
+# The dataset of the program, wherever the simulation is run from.
+DATASET = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Datasets',
+                       'global_mean_sea_level.csv')
+
+# The years shown by the simulation.
+FIRST_YEAR = 1993
+LAST_YEAR = 2100
+
+# The colours of the text, of the background of the year label and behind the images.
+TEXT_COLOR = (0, 0, 0)
+LABEL_BACKGROUND = (201, 201, 201)
+FILL_COLOR = (255, 255, 255)
+
+# The position of the centre of the year label.
+LABEL_CENTER = (540, 15)
+
+# Where the projected annual levels are placed within their year on the curve. The label of
+# year N is shown from time N (where the arrow keys stop) until N + 1, so each projected year
+# is placed at its start: at time N the water shows the projected level of N, up to the level
+# of LAST_YEAR at LAST_YEAR. The observed samples stay at their own times.
+PROJECTION_ANCHOR = 0.0
+
+
+def load_levels(dataset: str = DATASET,
+                fit: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the times and levels of the curve of the global mean sea level shown by the
+    simulation, through the raw samples of the dataset up to 2020 and the projections after,
+    each at the start of its year (see projection.level_curve).
+
+    The projections use the published rates, or if fit ('linear' or 'quadratic') is given,
+    the rates fitted to the samples (see computations.fitted_rates).
+    """
+    loaded = load_dataset(dataset)
+    schedule = None if fit is None else fitted_rates(loaded.sample_series(), fit)
+    data_1993_2020 = loaded.annual
+    data_2021_2080 = predict_2021_2080(data_1993_2020[2020], schedule)
+    data_2081_2100 = predict_2081_2100(data_2021_2080[2080], schedule)
+    data = combine_data(data_1993_2020, data_2021_2080, data_2081_2100)
+
+    return level_curve(loaded.sample_series(), data, PROJECTION_ANCHOR)
+
+
+def scene_assets(scenes: Sequence[Scene]) -> Tuple[Dict[str, AssetSpec],
+                                                   Dict[str, Tuple[str, ...]]]:
+    """Return the specs of every image of the home screen and the given scenes, and the names
+    of the images of each of them, as given to an assets.AssetManager.
+    """
+    specs = {'home_screen': HOME_BACKGROUND}
+    images = {'home': ('home_screen',)}
+    for scene in scenes:
+        specs.update(scene.images())
+        images[scene.name] = tuple(scene.images())
+    return specs, images
+
+
+def load_fonts() -> Dict[str, pygame.font.Font]:
+    """Return the fonts of the simulation, by the names used by scenes.Caption."""
+    return {'label': pygame.font.SysFont('arial', 30),
+            'title': pygame.font.SysFont('cambria', 50),
+            'caption': pygame.font.SysFont('arial', 15)}
+
+
+def flood_levels(flood: FloodLayer) -> np.ndarray:
+    """Return the flood level (in mm of global mean sea level) of every cell of the raster of
+    a flood layer, sampled to the size of the layer. The flood index of the raster is built
+    the first time it is needed (see inundation.load_flood_index).
+    """
+    index = load_flood_index(flood.raster)
+    levels = index.levels
+    if flood.size is not None and flood.size != (levels.shape[1], levels.shape[0]):
+        rows = np.arange(flood.size[1]) * levels.shape[0] // flood.size[1]
+        columns = np.arange(flood.size[0]) * levels.shape[1] // flood.size[0]
+        levels = levels[np.ix_(rows, columns)]
+    return np.asarray(levels, dtype=np.float64) * index.mm_per_unit
+
+
+def year_label(year: int) -> str:
+    """Return the text of the label of the given year."""
+    return 'Year: ' + str(year)
+
+
+def prerender_labels(text_cache: TextCache, font: pygame.font.Font) -> None:
+    """Render the label of every year shown by the simulation into text_cache."""
+    text_cache.prerender(font, [year_label(year) for year in range(FIRST_YEAR, LAST_YEAR + 1)],
+                         TEXT_COLOR, LABEL_BACKGROUND)
+
+
+class SceneFrames:
+    """Draws the frames of a scene to a screen, through a DirtyRenderer.
+
+    Other layers (e.g. a back button) can be added to the renderer, but the layer names
+    'water', 'water_edge', 'flood', 'year' and 'caption0', 'caption1', ... are used by this
+    class.
+
+    Instance Attributes:
+        - scene: the scene drawn
+        - renderer: the renderer drawing the scene to the screen
+
+    Representation Invariants:
+        - self.scene.water_rows is not None
+    """
+    scene: Scene
+    renderer: DirtyRenderer
+
+    # Private Instance Attributes:
+    #   - _water: the water image, or None if the scene has none
+    #   - _edges: the images of the top edge of the water between two pixels
+    #   - _flood: the flooded cells, or None if the scene has no flood layer
+    #   - _captions: each caption of the scene and its image
+    #   - _label_font: the font of the year label
+    #   - _text_cache: the cache the year labels are rendered through
+    _water: Optional[pygame.Surface]
+    _edges: List[Optional[pygame.Surface]]
+    _flood: Optional[FloodOverlay]
+    _captions: List[Tuple]
+    _label_font: pygame.font.Font
+    _text_cache: TextCache
+
+    def __init__(self, screen: pygame.Surface, scene: Scene, images: Dict[str, pygame.Surface],
+                 text_cache: TextCache, fonts: Dict[str, pygame.font.Font],
+                 curve: Tuple[np.ndarray, np.ndarray],
+                 edges: Optional[Dict[str, List[Optional[pygame.Surface]]]] = None,
+                 overlays: Optional[Dict[str, FloodOverlay]] = None) -> None:
+        """Initialize a new scene drawing with the images of the scene (see
+        AssetManager.enter_scene) and the curve of the global mean sea level.
+
+        The water line table of the scene is calculated if it has not been yet. The edges of
+        each water image are kept in edges, and the flooded cells of each scene in overlays,
+        if they are given, so other scenes and later visits can use them.
+        """
+        self.scene = scene
+        self.renderer = DirtyRenderer.composite(
+            screen, [(images[layer.name()], layer.position) for layer in scene.background],
+            FILL_COLOR)
+        if scene.water_rows is None:
+            scene.set_curve(curve[0], curve[1], FIRST_YEAR, LAST_YEAR)
+
+        self._water = None
+        self._edges = []
+        if scene.water is not None:
+            self._water = images[scene.water.name()]
+            edges = {} if edges is None else edges
+            if scene.water.name() not in edges:
+                edges[scene.water.name()] = edge_strips(self._water, SUBPIXELS)
+            self._edges = edges[scene.water.name()]
+
+        self._flood = None
+        if scene.flood is not None:
+            overlays = {} if overlays is None else overlays
+            if scene.name not in overlays:
+                overlays[scene.name] = FloodOverlay(flood_levels(scene.flood), scene.flood.color,
+                                                    scene.flood.alpha)
+            self._flood = overlays[scene.name]
+
+        self._captions = [(caption, text_cache.render(fonts[caption.font], caption.text,
+                                                      TEXT_COLOR))
+                          for caption in scene.captions]
+        self._label_font = fonts['label']
+        self._text_cache = text_cache
+
+    def show(self, time: float) -> None:
+        """Set the layers of the renderer to show the scene at the given time (as a decimal
+        year). Nothing is drawn until the renderer renders.
+        """
+        renderer = self.renderer
+        year = int(time)
+
+        # The water, between two pixels if it is not on a whole one
+        if self._water is not None:
+            x = self.scene.water.position[0]
+            row, subpixel = self.scene.smooth_water_line(time)
+            if subpixel == 0:
+                renderer.set_layer('water', self._water, (x, row))
+                renderer.remove_layer('water_edge')
+            else:
+                renderer.set_layer('water', self._water, (x, row + 1))
+                renderer.set_layer('water_edge', self._edges[subpixel], (x, row))
+
+        # The flooded cells, drawing again only the area where cells changed
+        if self._flood is not None:
+            position = self.scene.flood.position
+            changed = self._flood.set_level(self.scene.sea_level(time))
+            if changed is not None:
+                renderer.invalidate(changed.move(position))
+            renderer.set_layer('flood', self._flood.surface, position)
+
+        # The year
+        label = self._text_cache.render(self._label_font, year_label(year), TEXT_COLOR,
+                                        LABEL_BACKGROUND)
+        renderer.set_layer('year', label, label.get_rect(center=LABEL_CENTER).topleft)
+
+        # The captions shown in this year
+        for i in range(len(self._captions)):
+            caption, image = self._captions[i]
+            if caption.shown_in(year):
+                renderer.set_layer('caption' + str(i), image,
+                                   image.get_rect(center=caption.center).topleft)
+            else:
+                renderer.remove_layer('caption' + str(i))
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['os', 'numpy', 'pygame', 'Dict', 'List', 'Optional', 'Sequence',
+                          'Tuple', 'assets', 'cache', 'computations', 'inundation', 'projection',
+                          'rendering', 'scenes'],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })
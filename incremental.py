@@ -0,0 +1,271 @@
+"""
+This file handles keeping the annual means of a dataset up to date as new rows are appended
+to it.
+
+An IncrementalAggregator saves the running per-year sums and counts of a dataset, and the
+position in the file up to which they have been calculated. Each update then only reads
+the rows appended since the last update, so the cost of an update depends on the number of
+new rows rather than on the size of the whole dataset. If the dataset was truncated, or its
+start or the rows before the saved position were changed, it is read again from the start.
+Edits elsewhere in rows already read are not detected; delete the state file after making
+them. The aggregator also keeps the sums needed to fit the trend and acceleration of the
+samples (see fitting.py), so the fit is updated with each update too.
+
+A ProjectionCache keeps the projections calculated from the annual means, and only
+recalculates those that depend on a year changed by an update.
+
+This file is Copyright (c) 2020 Yousuf Hassan, Aaditya Mandal, Faraz Hossein, and Dinkar Verma.
+"""
+
+import hashlib
+import json
+import os
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from cache import CACHE_FOLDER
+from computations import predict_2021_2080, predict_2081_2100
+from fitting import TrendStatistics
+from ingest import PARSER_VERSION, parse_rows, read_header, samples_from_table
+from projection import RateSchedule
+from series import SeaLevelSeries
+from streaming import CHUNK_SIZE, AnnualAccumulator, iter_row_blocks
+
+# The number of bytes at the start of the dataset and before the saved position whose hash
+# is saved, to check that the part of the dataset already read has not changed.
+FINGERPRINT_SIZE = 4096
+
+
+class IncrementalAggregator:
+    """The annual means of an uncompressed dataset, updated by reading only appended rows.
+
+    Instance Attributes:
+        - filename: the filename of the dataset
+        - state_file: the filename the state of the aggregator is saved to
+        - accumulator: the per-year sums and counts of the rows read so far
+        - trend: the sums needed to fit the trend of the rows read so far
+        - offset: the position in the dataset after the last row read so far
+        - fingerprint: the hash of the first FINGERPRINT_SIZE bytes of the dataset and the
+          FINGERPRINT_SIZE bytes before offset
+        - header: the header of the dataset (see ingest.read_header)
+        - columns: the column names of the dataset
+
+    Representation Invariants:
+        - self.offset >= 0
+    """
+    filename: str
+    state_file: str
+    accumulator: AnnualAccumulator
+    trend: TrendStatistics
+    offset: int
+    fingerprint: str
+    header: Dict[str, str]
+    columns: List[str]
+
+    def __init__(self, filename: str, state_file: Optional[str] = None) -> None:
+        """Initialize a new aggregator for the dataset with the given filename that has not
+        read any rows yet.
+
+        By default, its state is saved in the cache folder next to the dataset.
+        """
+        self.filename = filename
+        if state_file is None:
+            folder = os.path.join(os.path.dirname(os.path.abspath(filename)), CACHE_FOLDER)
+            state_file = os.path.join(folder, os.path.basename(filename) + '.incremental.json')
+        self.state_file = state_file
+        self.accumulator = AnnualAccumulator()
+        self.trend = TrendStatistics()
+        self.offset = 0
+        self.fingerprint = ''
+        self.header = {}
+        self.columns = []
+
+    @classmethod
+    def load(cls, filename: str, state_file: Optional[str] = None) -> 'IncrementalAggregator':
+        """Return the aggregator of the dataset with the given filename, with the state it
+        was last saved with, if any.
+        """
+        aggregator = cls(filename, state_file)
+        try:
+            with open(aggregator.state_file) as file:
+                state = json.load(file)
+        except (OSError, ValueError):
+            return aggregator
+
+        # A state saved before the trend was kept is read again from the start.
+        if state.get('parser_version') == PARSER_VERSION and 'trend' in state:
+            aggregator.accumulator = AnnualAccumulator(state['first_year'], state['sums'],
+                                                       state['counts'])
+            aggregator.trend = TrendStatistics(state['trend']['reference'])
+            aggregator.trend.moments[:] = state['trend']['moments']
+            aggregator.trend.products[:] = state['trend']['products']
+            aggregator.offset = state['offset']
+            aggregator.fingerprint = state['fingerprint']
+            aggregator.header = state['header']
+            aggregator.columns = state['columns']
+        return aggregator
+
+    def save(self) -> None:
+        """Save the state of this aggregator to its state file."""
+        state = {'parser_version': PARSER_VERSION,
+                 'first_year': self.accumulator.first_year,
+                 'sums': self.accumulator.sums.tolist(),
+                 'counts': self.accumulator.counts.tolist(),
+                 'trend': {'reference': self.trend.reference,
+                           'moments': self.trend.moments.tolist(),
+                           'products': self.trend.products.tolist()},
+                 'offset': self.offset,
+                 'fingerprint': self.fingerprint,
+                 'header': self.header,
+                 'columns': self.columns}
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.state_file)), exist_ok=True)
+        temporary = self.state_file + '.tmp{}'.format(os.getpid())
+        with open(temporary, 'w') as file:
+            json.dump(state, file)
+        os.replace(temporary, self.state_file)
+
+    def update(self, chunk_size: int = CHUNK_SIZE) -> np.ndarray:
+        """Read the rows appended to the dataset since the last update, and return the sorted
+        array of the years whose annual means changed.
+
+        A last row that does not end with a newline yet is left for the next update. If the
+        rows read by earlier updates have changed, the whole dataset is read again and every
+        year of it is returned.
+        """
+        with open(self.filename, 'rb') as file:
+            changed = []
+            if not self._unchanged(file):
+                changed.extend(self.accumulator.means().years)
+                self.accumulator = AnnualAccumulator()
+                self.trend = TrendStatistics()
+                file.seek(0)
+                header, self.columns = read_header(file)
+                self.header = header
+                self.offset = file.tell()
+            else:
+                file.seek(self.offset)
+
+            for block in iter_row_blocks(file, chunk_size, partial_last_row=False):
+                table = parse_rows(block, len(self.columns))
+                samples = samples_from_table(table, tuple(self.columns[1:]), self.header)
+                changed.extend(self.accumulator.add_samples(samples))
+                self.trend.add(samples.times, samples.values)
+                self.offset += len(block)
+
+            self.fingerprint = _fingerprint(file, self.offset)
+
+        return np.unique(np.array(changed, dtype=np.int64))
+
+    def means(self) -> SeaLevelSeries:
+        """Return the average global mean sea level of each year of the rows read so far."""
+        return self.accumulator.means()
+
+    def fitted_schedule(self, degree: int = 2) -> RateSchedule:
+        """Return a rate schedule continuing the fit of the given degree (1 for the trend, 2
+        for the trend and acceleration) to the samples of the rows read so far.
+        """
+        return self.trend.schedule(degree)
+
+    def _unchanged(self, file) -> bool:
+        """Return whether the part of the open dataset read by earlier updates is unchanged."""
+        if self.offset == 0 or os.fstat(file.fileno()).st_size < self.offset:
+            return False
+        return _fingerprint(file, self.offset) == self.fingerprint
+
+
+class ProjectionCache:
+    """Projections calculated from the annual means of a dataset, each recalculated only when
+    one of the years it depends on has changed.
+
+    Instance Attributes:
+        - dependencies: a dictionary mapping the name of each projection to the years of the
+          annual means it depends on
+        - functions: a dictionary mapping the name of each projection to the function that
+          calculates it from the annual means and the projections it depends on
+        - results: a dictionary mapping the name of each projection that is up to date to
+          its value
+
+    Representation Invariants:
+        - self.dependencies.keys() == self.functions.keys()
+        - all(name in self.functions for name in self.results)
+    """
+    dependencies: Dict[str, Tuple[int, ...]]
+    functions: Dict[str, Callable[[SeaLevelSeries, Dict[str, SeaLevelSeries]], SeaLevelSeries]]
+    results: Dict[str, SeaLevelSeries]
+
+    def __init__(self) -> None:
+        """Initialize a new projection cache without any projections."""
+        self.dependencies = {}
+        self.functions = {}
+        self.results = {}
+
+    def register(self, name: str, years: Iterable[int],
+                 function: Callable[[SeaLevelSeries, Dict[str, SeaLevelSeries]],
+                                    SeaLevelSeries]) -> None:
+        """Add a projection with the given name, that depends on the given years of the
+        annual means and is calculated by function.
+
+        The function is called with the annual means and a dictionary of the projections
+        registered before it.
+        """
+        self.dependencies[name] = tuple(years)
+        self.functions[name] = function
+        self.results.pop(name, None)
+
+    def invalidate(self, changed_years: Iterable[int]) -> List[str]:
+        """Forget the projections that depend on any of the changed years, and return their
+        names. Projections registered after a forgotten one are forgotten too, since they may
+        depend on it.
+        """
+        changed_years = set(int(year) for year in changed_years)
+        forgotten = []
+        for name in self.functions:
+            if forgotten or changed_years.intersection(self.dependencies[name]):
+                forgotten.append(name)
+                self.results.pop(name, None)
+        return forgotten
+
+    def get(self, name: str, annual: SeaLevelSeries) -> SeaLevelSeries:
+        """Return the projection with the given name, calculating it (and the projections
+        registered before it) from the annual means only if it is not up to date.
+        """
+        for other in self.functions:
+            if other not in self.results:
+                self.results[other] = self.functions[other](annual, self.results)
+            if other == name:
+                break
+        return self.results[name]
+
+
+def default_projections(base_year: int = 2020) -> ProjectionCache:
+    """Return a projection cache with the projections of the program, which depend only on
+    the annual mean of base_year.
+    """
+    projections = ProjectionCache()
+    projections.register('predict_2021_2080', [base_year],
+                         lambda annual, _: predict_2021_2080(annual[base_year]))
+    projections.register('predict_2081_2100', [base_year],
+                         lambda _, results: predict_2081_2100(
+                             results['predict_2021_2080'][2080]))
+    return projections
+
+
+def _fingerprint(file, offset: int) -> str:
+    """Return the hash of the first FINGERPRINT_SIZE bytes of the open file and the
+    FINGERPRINT_SIZE bytes before offset.
+    """
+    digest = hashlib.sha256()
+    file.seek(0)
+    digest.update(file.read(min(offset, FINGERPRINT_SIZE)))
+    start = max(offset - FINGERPRINT_SIZE, 0)
+    file.seek(start)
+    digest.update(file.read(offset - start))
+    return digest.hexdigest()
+
+
+if __name__ == '__main__':
+    aggregator = IncrementalAggregator.load(os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'Datasets', 'global_mean_sea_level.csv'))
+    print('Years changed:', aggregator.update().tolist())
+    print('Fitted schedule:', aggregator.fitted_schedule())
+    aggregator.save()
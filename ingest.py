@@ -0,0 +1,293 @@
+"""
+This file handles reading the NOAA satellite altimetry datasets.
+
+A dataset starts with comment lines of the form '#name = value', followed by a line with
+the column names (the time column, then one column per mission) and one row per sample.
+Each sample is measured by one or more missions, and the other mission columns are empty.
+
+Instead of going through the rows one at a time, the rows are parsed in bulk into a numpy
+array, and the value of each sample is picked from the highest priority mission that
+measured it with a single vectorized operation.
+
+The dataset is read CHUNK_SIZE bytes at a time and parsed PIECE_SIZE bytes at a time, so
+the text of the dataset is never in memory all at once: reading it takes about twice the
+size of its samples (17 bytes each, while the samples of the chunks are joined) plus a few
+times CHUNK_SIZE. To use less, read it a chunk at a time with streaming.iter_chunks.
+
+Parsing is limited by numpy's conversion of text to numbers, about 150 ns for each field
+that is not empty. For the NOAA datasets, with two numbers per row, that is about 30 MB of
+text per second (about 0.8 s per million rows): far below the speed of a disk.
+
+This file is Copyright (c) 2020 Yousuf Hassan, Aaditya Mandal, Faraz Hossein, and Dinkar Verma.
+"""
+
+import gzip
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Increase this whenever a change to this file changes the parsed samples, so that anything
+# derived from previously parsed samples (e.g. cached data) is rebuilt.
+PARSER_VERSION = 1
+
+# The missions in order of priority: when more than one mission measured a sample, the value
+# from the most recent mission is used.
+MISSION_PRIORITY = ('Jason-3', 'Jason-2', 'Jason-1', 'TOPEX/Poseidon')
+
+# The first two bytes of every gzip compressed file.
+GZIP_MAGIC = b'\x1f\x8b'
+
+# The number of bytes read from a dataset at once.
+CHUNK_SIZE = 1 << 24
+
+# The number of bytes of rows parsed at once.
+PIECE_SIZE = 1 << 20
+
+
+class AltimetrySamples:
+    """The samples of a satellite altimetry dataset.
+
+    Instance Attributes:
+        - times: the decimal year of each sample
+        - values: the global mean sea level (in mm) of each sample
+        - missions: the index (in mission_names) of the mission each value was taken from
+        - mission_names: the names of the missions in the dataset, in column order
+        - header: a dictionary mapping the names of the comment lines to their values
+
+    Representation Invariants:
+        - self.times.shape == self.values.shape == self.missions.shape
+        - all(0 <= m < len(self.mission_names) for m in self.missions)
+    """
+    times: np.ndarray
+    values: np.ndarray
+    missions: np.ndarray
+    mission_names: Tuple[str, ...]
+    header: Dict[str, str]
+
+    def __init__(self, times: np.ndarray, values: np.ndarray, missions: np.ndarray,
+                 mission_names: Tuple[str, ...], header: Dict[str, str]) -> None:
+        """Initialize a new set of samples."""
+        self.times = times
+        self.values = values
+        self.missions = missions
+        self.mission_names = mission_names
+        self.header = header
+
+    def mission_of(self, index: int) -> str:
+        """Return the name of the mission the sample at the given index was taken from."""
+        return self.mission_names[self.missions[index]]
+
+    def __len__(self) -> int:
+        """Return the number of samples."""
+        return len(self.times)
+
+
+def open_dataset(filename: str) -> BinaryIO:
+    """Open the dataset with the given filename for reading bytes.
+
+    Gzip compressed datasets are detected from their contents and decompressed as they
+    are read.
+    """
+    with open(filename, 'rb') as file:
+        compressed = file.read(2) == GZIP_MAGIC
+
+    return gzip.open(filename, 'rb') if compressed else open(filename, 'rb')
+
+
+def read_header(file: BinaryIO) -> Tuple[Dict[str, str], List[str]]:
+    """Read the comment lines and the column names from the start of an open dataset.
+
+    Return a dictionary mapping the name of each '#name = value' comment line to its value,
+    and the list of column names. The file is left positioned at the first row of samples.
+    """
+    header = {}
+    line = file.readline()
+    while line.startswith(b'#') or line.strip() == b'':
+        if line == b'':
+            raise ValueError('the dataset has no column names')
+        name, _, value = line[1:].decode().partition('=')
+        if name.strip() != '':
+            header[name.strip()] = value.strip()
+        line = file.readline()
+
+    return header, [column.strip() for column in line.decode().split(',')]
+
+
+def parse_rows(block: bytes, num_columns: int) -> np.ndarray:
+    """Parse a block of complete comma separated rows and return them as a 2-D array with
+    num_columns columns. Empty fields are parsed as nan.
+
+    Raise a ValueError if a row does not have num_columns fields or a field is not a number.
+    """
+    block = block.replace(b'\r', b'').strip(b'\n')
+    while b'\n\n' in block:
+        block = block.replace(b'\n\n', b'\n')
+    if block == b'':
+        return np.empty((0, num_columns))
+
+    # Parse the block in pieces of whole rows so the temporary arrays stay small.
+    pieces = []
+    start = 0
+    while start < len(block):
+        end = block.find(b'\n', start + PIECE_SIZE)
+        end = len(block) if end == -1 else end
+        pieces.append(_parse_piece(block[start:end] + b'\n', num_columns))
+        start = end + 1
+
+    return np.concatenate(pieces) if len(pieces) > 1 else pieces[0]
+
+
+def _parse_piece(piece: bytes, num_columns: int) -> np.ndarray:
+    """Parse rows that each end with a newline and return them as a 2-D array.
+
+    Most fields of a dataset are empty, since only one or two missions measure each sample.
+    The separators are found with vectorized comparisons, and only the fields that are not
+    empty are converted to numbers (see _parse_fields).
+    """
+    chars = np.frombuffer(piece, dtype=np.uint8)
+    is_newline = chars == ord('\n')
+    separators = np.flatnonzero(is_newline | (chars == ord(',')))
+
+    newlines = np.flatnonzero(is_newline[separators])
+    if not np.array_equal(newlines, np.arange(num_columns - 1, len(separators), num_columns)):
+        raise ValueError('every row of the dataset must have {} fields'.format(num_columns))
+
+    starts = np.empty_like(separators)
+    starts[0] = 0
+    starts[1:] = separators[:-1] + 1
+    lengths = separators - starts
+    filled = lengths > 0
+
+    table = np.full(len(separators), np.nan)
+    if np.any(filled):
+        table[filled] = _parse_fields(chars, starts[filled], lengths[filled])
+
+    return table.reshape(-1, num_columns)
+
+
+def _parse_fields(chars: np.ndarray, starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Return the numbers written in the fields of chars with the given starts and lengths.
+
+    The text of each field is copied into a row of a byte array as wide as the longest
+    field, padded with zero bytes, so numpy can convert every field at once as a
+    fixed-width string. Raise a ValueError if a field is not a number.
+
+    Preconditions:
+        - len(starts) == len(lengths) > 0
+        - all(length > 0 for length in lengths)
+    """
+    if np.any(chars == 0):
+        raise ValueError('the dataset contains a field that is not a number')
+    width = int(lengths.max())
+    padded = np.concatenate([chars, np.zeros(width, dtype=np.uint8)])
+    fields = sliding_window_view(padded, width)[starts]
+    fields[np.arange(width) >= lengths[:, np.newaxis]] = 0
+
+    try:
+        return fields.view('S{}'.format(width)).ravel().astype(np.float64)
+    except ValueError:
+        raise ValueError('the dataset contains a field that is not a number') from None
+
+
+def iter_row_blocks(file: BinaryIO, chunk_size: int = CHUNK_SIZE,
+                    partial_last_row: bool = True) -> Iterator[bytes]:
+    """Read the rest of an open dataset and yield it in blocks of about chunk_size bytes of
+    whole rows, each ending with a newline.
+
+    If the last row does not end with a newline, it is yielded on its own at the end if
+    partial_last_row is True, and left unread otherwise (e.g. when it may still be written).
+    """
+    remainder = b''
+    block = file.read(chunk_size)
+    while block != b'':
+        block = remainder + block
+        end = block.rfind(b'\n') + 1
+        remainder = block[end:]
+        if end > 0:
+            yield block[:end]
+        block = file.read(chunk_size)
+
+    if partial_last_row and remainder.strip() != b'':
+        yield remainder
+
+
+def mission_priority(mission_names: Tuple[str, ...],
+                     priority: Optional[Tuple[str, ...]] = None) -> np.ndarray:
+    """Return the indices of the given missions, from highest to lowest priority.
+
+    Missions missing from priority (MISSION_PRIORITY by default) are ranked below all the
+    listed missions, with later columns ranked above earlier ones.
+    """
+    if priority is None:
+        priority = MISSION_PRIORITY
+    listed = [mission_names.index(name) for name in priority if name in mission_names]
+    unlisted = [i for i in reversed(range(len(mission_names))) if i not in listed]
+
+    return np.array(listed + unlisted, dtype=np.int64)
+
+
+def coalesce_missions(table: np.ndarray, order: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the value of each row of table taken from the first measured column in the given
+    order, and the index of that column.
+
+    Rows where no column was measured get the value nan and the column index -1.
+    """
+    ranked = table[:, order]
+    measured = ~np.isnan(ranked)
+    first = np.argmax(measured, axis=1)
+    rows = np.arange(len(table))
+
+    values = ranked[rows, first]
+    columns = np.where(measured[rows, first], order[first], -1)
+
+    return values, columns.astype(np.int8)
+
+
+def samples_from_table(table: np.ndarray, mission_names: Tuple[str, ...],
+                       header: Dict[str, str],
+                       priority: Optional[Tuple[str, ...]] = None) -> AltimetrySamples:
+    """Return the samples in a table of parsed rows, where the 0th column is the time and the
+    other columns are the missions.
+
+    Rows without a time or without a value from any mission are skipped.
+    """
+    values, missions = coalesce_missions(table[:, 1:], mission_priority(mission_names, priority))
+    keep = (missions >= 0) & ~np.isnan(table[:, 0])
+
+    return AltimetrySamples(table[keep, 0], values[keep], missions[keep], mission_names, header)
+
+
+def read_altimetry(filename: str,
+                   priority: Optional[Tuple[str, ...]] = None) -> AltimetrySamples:
+    """Read the dataset with the given filename and return its samples.
+
+    When more than one mission measured a sample, the value is taken from the first of them
+    in priority (MISSION_PRIORITY by default). The dataset may be gzip compressed. It is read
+    and parsed a block of rows at a time, so its text is never in memory all at once.
+    """
+    with open_dataset(filename) as file:
+        header, columns = read_header(file)
+        mission_names = tuple(columns[1:])
+        blocks = [samples_from_table(parse_rows(block, len(columns)), mission_names, header,
+                                     priority)
+                  for block in iter_row_blocks(file)]
+    if not blocks:
+        return samples_from_table(np.empty((0, len(columns))), mission_names, header,
+                                  priority)
+
+    return AltimetrySamples(np.concatenate([samples.times for samples in blocks]),
+                            np.concatenate([samples.values for samples in blocks]),
+                            np.concatenate([samples.missions for samples in blocks]),
+                            mission_names, header)
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['gzip', 'numpy', 'numpy.lib.stride_tricks', 'BinaryIO', 'Dict',
+                          'Iterator', 'List', 'Optional', 'Tuple'],
+        'allowed-io': ['open_dataset', 'read_altimetry'],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })
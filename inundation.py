@@ -0,0 +1,407 @@
+"""
+This file calculates which cells of an elevation raster of a city are flooded at a given
+global mean sea level.
+
+A raster is a 2-D .npy file of the elevation of each cell, in metres above the same datum
+as the global mean sea level data, with nan for the cells of the sea. A cell is flooded when
+the sea level is at or above its flood level: the lowest level at which water from the sea
+can reach it, i.e. the lowest possible highest elevation along a path of neighbouring cells
+from the sea to it. Cells behind a dike stay dry until the sea is higher than the dike, even
+if they are below the sea level.
+
+The flood level of every cell is calculated once with a priority-flood, and saved in a flood
+index next to the raster, so the flooded cells of any year are a single comparison of the
+index with the sea level of the year, and going through the years costs nothing.
+
+The raster is processed in square tiles, so rasters larger than the memory work: the raster
+and the index are memory mapped, and only one tile per worker process is in memory at a time.
+    1. Each tile is flooded on its own by one of the worker processes, from the sea and from
+       every cell of its perimeter, and every cell is labelled with the perimeter cell (or the
+       sea) its water came from. The lowest level at which the water of each pair of labels
+       meets is kept: inside the tile, and between the perimeter cells of neighbouring tiles.
+    2. The labels and the levels at which they meet form a small graph, flooded from the sea
+       to find the level at which the water of the sea reaches each label.
+    3. The flood level of each cell is the higher of its level within its tile and the level
+       at which the sea reaches its label.
+This is the parallel priority-flood of Barnes (2016).
+
+Within a tile, the flood goes through the cells one at a time in order of level, so it is
+limited by the speed of Python rather than numpy: about 170 000 cells per second for each
+worker process (about 6 seconds per million cells), e.g. about 25 minutes for a 16 000 by
+16 000 raster with one worker, or under 2 minutes with 16. main prints the cells per second
+of each build.
+
+Usage:
+    python inundation.py Rasters/venice.npy Rasters/new_york.npy --tile-size 2048 --workers 4
+
+This file is Copyright (c) 2020 Yousuf Hassan, Aaditya Mandal, Faraz Hossein, and Dinkar Verma.
+"""
+
+import argparse
+import heapq
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+from series import SeaLevelSeries
+
+# The number of rows and columns of the tiles the raster is processed in.
+TILE_SIZE = 1024
+
+# The label of the sea.
+SEA = 0
+
+# The number of mm of sea level per unit of elevation of the rasters (metres).
+MM_PER_UNIT = 1000.0
+
+# The first year of the cells that are never flooded (see FloodIndex.first_flooded_years).
+NEVER = np.iinfo(np.int32).max
+
+# The offsets of the neighbours of a cell, for each connectivity.
+NEIGHBOURS = {4: ((-1, 0), (0, -1), (0, 1), (1, 0)),
+              8: ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))}
+
+
+class FloodIndex:
+    """The flood level of every cell of an elevation raster (see build_flood_index).
+
+    Instance Attributes:
+        - levels: the flood level of each cell, in the units of the raster; -inf for the sea
+          and inf for cells the sea never reaches
+        - mm_per_unit: the number of mm of sea level per unit of the raster
+
+    Representation Invariants:
+        - self.levels.ndim == 2
+        - self.mm_per_unit > 0
+    """
+    levels: np.ndarray
+    mm_per_unit: float
+
+    def __init__(self, levels: np.ndarray, mm_per_unit: float = MM_PER_UNIT) -> None:
+        """Initialize a new flood index with the given flood levels."""
+        self.levels = levels
+        self.mm_per_unit = mm_per_unit
+
+    @classmethod
+    def load(cls, filename: str, mm_per_unit: float = MM_PER_UNIT) -> 'FloodIndex':
+        """Return the flood index saved in the file with the given filename, memory mapped."""
+        return cls(np.load(filename, mmap_mode='r'), mm_per_unit)
+
+    def flooded(self, sea_level: float,
+                window: Optional[Tuple[slice, slice]] = None) -> np.ndarray:
+        """Return whether each cell (of window, if it is given) is flooded when the global
+        mean sea level is sea_level mm.
+        """
+        levels = self.levels if window is None else self.levels[window]
+        return levels <= sea_level / self.mm_per_unit
+
+    def first_flooded_years(self, series: SeaLevelSeries,
+                            window: Optional[Tuple[slice, slice]] = None) -> np.ndarray:
+        """Return the first year of the annual series of global mean sea levels in which each
+        cell (of window, if it is given) is flooded, or NEVER if it is never flooded.
+
+        The cells flooded in a year are then those whose first year is at or before it.
+
+        Preconditions:
+            - series.times is None
+            - the years of series are in increasing order
+        """
+        levels = self.levels if window is None else self.levels[window]
+        highest = np.maximum.accumulate(series.values / self.mm_per_unit)
+        index = np.searchsorted(highest, levels, side='left')
+        years = np.append(series.years, NEVER).astype(np.int32)
+        return years[index]
+
+    def flooded_fraction(self, sea_level: float) -> float:
+        """Return the fraction of the cells that are not the sea flooded when the global mean
+        sea level is sea_level mm, one tile at a time.
+        """
+        flooded = land = 0
+        for window in iter_tiles(self.levels.shape, TILE_SIZE):
+            levels = np.asarray(self.levels[window])
+            on_land = levels > -np.inf
+            land += np.count_nonzero(on_land)
+            flooded += np.count_nonzero(on_land & (levels <= sea_level / self.mm_per_unit))
+        return flooded / land if land else 0.0
+
+
+def index_filename(raster_file: str) -> str:
+    """Return the filename of the flood index of the raster with the given filename."""
+    return os.path.splitext(raster_file)[0] + '.flood.npy'
+
+
+def load_flood_index(raster_file: str, tile_size: int = TILE_SIZE, connectivity: int = 8,
+                     border_is_sea: bool = False) -> FloodIndex:
+    """Return the flood index of the raster with the given filename, building it first if it
+    does not exist or is older than the raster.
+    """
+    index_file = index_filename(raster_file)
+    if not os.path.exists(index_file) or \
+            os.path.getmtime(index_file) < os.path.getmtime(raster_file):
+        build_flood_index(raster_file, index_file, tile_size, connectivity, border_is_sea)
+    return FloodIndex.load(index_file)
+
+
+def build_flood_index(raster_file: str, index_file: str, tile_size: int = TILE_SIZE,
+                      connectivity: int = 8, border_is_sea: bool = False,
+                      workers: Optional[int] = 1) -> FloodIndex:
+    """Calculate the flood level of every cell of the raster with the given filename, save
+    them to index_file and return the index.
+
+    Water flows between cells sharing an edge, or also a corner if connectivity is 8. If
+    border_is_sea is True, the water of the sea can also enter from every cell on the border
+    of the raster, e.g. if the raster is cut out of a coast.
+
+    The tiles are flooded by the given number of worker processes (None for one per CPU).
+    If the build fails, no index file or temporary file is left behind.
+
+    Preconditions:
+        - connectivity in NEIGHBOURS
+        - tile_size >= 2
+    """
+    elevation = np.load(raster_file, mmap_mode='r')
+    if elevation.ndim != 2:
+        raise ValueError('an elevation raster must be a 2-D array')
+    windows = iter_tiles(elevation.shape, tile_size)
+    first_labels = np.cumsum([SEA + 1] + [_perimeter_size(window) for window in windows])
+    label_type = np.int32 if first_labels[-1] < np.iinfo(np.int32).max else np.int64
+
+    part_file, labels_file = index_file + '.part', index_file + '.labels'
+    try:
+        levels = np.lib.format.open_memmap(part_file, mode='w+', dtype=np.float32,
+                                           shape=elevation.shape)
+        labels = np.lib.format.open_memmap(labels_file, mode='w+', dtype=label_type,
+                                           shape=elevation.shape)
+        del levels, labels
+
+        # 1. Flood each tile on its own.
+        tasks = [(raster_file, index_file, window, first_label, connectivity, border_is_sea)
+                 for window, first_label in zip(windows, first_labels.tolist())]
+        if workers == 1 or len(tasks) <= 1:
+            edges = [_flood_window(task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                edges = list(executor.map(_flood_window, tasks))
+
+        # Find where the labels of neighbouring tiles meet: along the first column of each
+        # tile and the column before it, and along the first row of each row of tiles and
+        # the row above it.
+        levels = np.load(part_file, mmap_mode='r+')
+        labels = np.load(labels_file, mmap_mode='r')
+        for row_window, column_window in windows:
+            column = column_window.start
+            if column > 0:
+                edges.append(_meeting_levels(
+                    (levels[row_window, column - 1], labels[row_window, column - 1]),
+                    (levels[row_window, column], labels[row_window, column]), connectivity))
+            row = row_window.start
+            if row > 0 and column == 0:
+                edges.append(_meeting_levels((levels[row - 1], labels[row - 1]),
+                                             (levels[row], labels[row]), connectivity))
+
+        # 2. Find the level at which the sea reaches each label.
+        sea_levels = _flood_labels(int(first_labels[-1]), np.concatenate(edges))
+
+        # 3. The flood level of each cell is the higher of its level within its tile and the
+        # level at which the sea reaches its label.
+        for window in windows:
+            levels[window] = np.maximum(levels[window], sea_levels[labels[window]])
+        levels.flush()
+        del levels, labels
+        os.replace(part_file, index_file)
+    finally:
+        for temporary in (part_file, labels_file):
+            if os.path.exists(temporary):
+                os.remove(temporary)
+
+    return FloodIndex.load(index_file)
+
+
+def _flood_window(task: Tuple) -> np.ndarray:
+    """Flood one tile of a raster (see _flood_tile), write the levels and labels of its cells
+    to the temporary files of the index, and return the levels at which its labels meet.
+    """
+    raster_file, index_file, window, first_label, connectivity, border_is_sea = task
+    elevation = np.load(raster_file, mmap_mode='r')
+    rows, columns = elevation.shape
+    row_window, column_window = window
+
+    tile = np.array(elevation[window], dtype=np.float32)
+    border = None
+    if border_is_sea:
+        border = np.zeros(tile.shape, dtype=bool)
+        border[0, :] |= row_window.start == 0
+        border[-1, :] |= row_window.stop == rows
+        border[:, 0] |= column_window.start == 0
+        border[:, -1] |= column_window.stop == columns
+    tile_levels, tile_labels, tile_edges = _flood_tile(tile, first_label, border, connectivity)
+
+    levels = np.load(index_file + '.part', mmap_mode='r+')
+    labels = np.load(index_file + '.labels', mmap_mode='r+')
+    levels[window] = tile_levels
+    labels[window] = tile_labels
+    levels.flush()
+    labels.flush()
+    return tile_edges
+
+
+def iter_tiles(shape: Tuple[int, int], tile_size: int) -> List[Tuple[slice, slice]]:
+    """Return the rows and columns of each tile of a raster with the given shape, one row of
+    tiles after the other.
+    """
+    return [(slice(row, min(row + tile_size, shape[0])),
+             slice(column, min(column + tile_size, shape[1])))
+            for row in range(0, shape[0], tile_size)
+            for column in range(0, shape[1], tile_size)]
+
+
+def _perimeter_size(window: Tuple[slice, slice]) -> int:
+    """Return the number of cells on the perimeter of a tile."""
+    rows = window[0].stop - window[0].start
+    columns = window[1].stop - window[1].start
+    return rows * columns if rows <= 2 or columns <= 2 else 2 * (rows + columns) - 4
+
+
+def _flood_tile(tile: np.ndarray, first_label: int, border: Optional[np.ndarray],
+                connectivity: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Flood a tile of elevations from the sea (its nan cells and the cells of border, if it
+    is given) and from its perimeter cells, labelled first_label, first_label + 1, ... in
+    order.
+
+    Return the level each cell is flooded at from where its water came from, the label of
+    where its water came from, and the lowest level at which each pair of labels meet, as
+    rows of an array of (label, label, level).
+    """
+    rows, columns = tile.shape
+    heights = tile.ravel().tolist()
+    levels = [np.inf] * len(heights)
+    labels = [-1] * len(heights)
+
+    queue = []
+    sea = np.isnan(tile) if border is None else np.isnan(tile) | border
+    for cell in np.flatnonzero(sea).tolist():
+        levels[cell] = -np.inf if heights[cell] != heights[cell] else heights[cell]
+        labels[cell] = SEA
+        queue.append((levels[cell], cell))
+    perimeter = np.flatnonzero(_perimeter_mask(rows, columns)).tolist()
+    for label, cell in enumerate(perimeter, first_label):
+        if labels[cell] == -1:
+            levels[cell] = heights[cell]
+            labels[cell] = label
+            queue.append((levels[cell], cell))
+    heapq.heapify(queue)
+
+    meetings = {}
+    offsets = NEIGHBOURS[connectivity]
+    while queue:
+        level, cell = heapq.heappop(queue)
+        label = labels[cell]
+        row, column = divmod(cell, columns)
+        for row_offset, column_offset in offsets:
+            neighbour_row = row + row_offset
+            neighbour_column = column + column_offset
+            if not (0 <= neighbour_row < rows and 0 <= neighbour_column < columns):
+                continue
+            neighbour = neighbour_row * columns + neighbour_column
+            neighbour_label = labels[neighbour]
+            if neighbour_label == -1:
+                height = heights[neighbour]
+                levels[neighbour] = height if height > level else level
+                labels[neighbour] = label
+                heapq.heappush(queue, (levels[neighbour], neighbour))
+            elif neighbour_label != label:
+                pair = (label, neighbour_label) if label < neighbour_label \
+                    else (neighbour_label, label)
+                meeting = level if level > levels[neighbour] else levels[neighbour]
+                if meeting < meetings.get(pair, np.inf):
+                    meetings[pair] = meeting
+
+    edges = np.array([(pair[0], pair[1], meeting) for pair, meeting in meetings.items()],
+                     dtype=np.float64).reshape(-1, 3)
+    return (np.array(levels, dtype=np.float32).reshape(rows, columns),
+            np.array(labels).reshape(rows, columns), edges)
+
+
+def _perimeter_mask(rows: int, columns: int) -> np.ndarray:
+    """Return whether each cell of a tile with the given size is on its perimeter."""
+    mask = np.zeros((rows, columns), dtype=bool)
+    mask[[0, -1], :] = True
+    mask[:, [0, -1]] = True
+    return mask
+
+
+def _meeting_levels(first: Tuple[np.ndarray, np.ndarray], second: Tuple[np.ndarray, np.ndarray],
+                    connectivity: int) -> np.ndarray:
+    """Return the levels at which the labels of two neighbouring lines of cells meet, as rows
+    of an array of (label, label, level). Each line is given as its levels and labels, and
+    cell i of the first line touches cell i of the second, and cells i - 1 and i + 1 too if
+    connectivity is 8.
+    """
+    first_levels, first_labels = first
+    second_levels, second_labels = second
+    shifts = (0, -1, 1) if connectivity == 8 else (0,)
+    edges = []
+    for shift in shifts:
+        start, stop = max(0, -shift), len(first_levels) - max(0, shift)
+        a = slice(start, stop)
+        b = slice(start + shift, stop + shift)
+        edges.append(np.column_stack([
+            first_labels[a], second_labels[b],
+            np.maximum(first_levels[a], second_levels[b])]).astype(np.float64))
+    edges = np.concatenate(edges)
+    return edges[edges[:, 0] != edges[:, 1]]
+
+
+def _flood_labels(num_labels: int, edges: np.ndarray) -> np.ndarray:
+    """Return the level at which the sea reaches each label, given the levels at which pairs
+    of labels meet, as rows of an array of (label, label, level).
+    """
+    sources = np.concatenate([edges[:, 0], edges[:, 1]]).astype(np.int64)
+    targets = np.concatenate([edges[:, 1], edges[:, 0]]).astype(np.int64)
+    meetings = np.concatenate([edges[:, 2], edges[:, 2]])
+    order = np.argsort(sources, kind='stable')
+    starts = np.searchsorted(sources[order], np.arange(num_labels + 1)).tolist()
+    targets = targets[order].tolist()
+    meetings = meetings[order].tolist()
+
+    reached = [np.inf] * num_labels
+    reached[SEA] = -np.inf
+    queue = [(-np.inf, SEA)]
+    while queue:
+        level, label = heapq.heappop(queue)
+        if level > reached[label]:
+            continue
+        for k in range(starts[label], starts[label + 1]):
+            target = targets[k]
+            meeting = meetings[k] if meetings[k] > level else level
+            if meeting < reached[target]:
+                reached[target] = meeting
+                heapq.heappush(queue, (meeting, target))
+    return np.array(reached, dtype=np.float32)
+
+
+def main(arguments: Optional[Sequence[str]] = None) -> None:
+    """Build the flood index of every raster given by the command line arguments."""
+    parser = argparse.ArgumentParser(description='Build the flood index of elevation rasters.')
+    parser.add_argument('rasters', nargs='+', help='the .npy elevation rasters')
+    parser.add_argument('--tile-size', type=int, default=TILE_SIZE)
+    parser.add_argument('--connectivity', type=int, choices=sorted(NEIGHBOURS), default=8)
+    parser.add_argument('--border-is-sea', action='store_true',
+                        help='let the sea enter from every cell on the border of the raster')
+    parser.add_argument('--workers', type=int, help='the number of worker processes')
+    options = parser.parse_args(arguments)
+
+    for raster in options.rasters:
+        start = time.perf_counter()
+        index = build_flood_index(raster, index_filename(raster), options.tile_size,
+                                  options.connectivity, options.border_is_sea, options.workers)
+        seconds = time.perf_counter() - start
+        print('{}: {} cells in {:.1f} s ({:.0f} cells/s), {:.1%} reached by the sea at +1 m'
+              .format(index_filename(raster), index.levels.size, seconds,
+                      index.levels.size / seconds, index.flooded_fraction(1000)))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
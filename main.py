@@ -13,25 +13,40 @@ The final output contains two parts:
 
     2. A window opens where the Pygame simulation is running.
 
+The options of the simulation can be given on the command line (see
+simulation.parse_arguments), e.g.
+    python main.py --hud --trace frames.json
+times every frame, shows the frame rate and writes the frame times to frames.json, and
+    python main.py --fit quadratic
+projects the sea level in both parts with the trend and acceleration fitted to the samples
+of the dataset instead of the published rates.
+
 This file is Copyright (c) 2020 Yousuf Hassan, Aaditya Mandal, Faraz Hossein, and Dinkar Verma.
 """
 
 if __name__ == '__main__':
+    import cache
     import computations
     import simulation
     from pprint import pprint
 
-    # Perform all the computations.
-    data = computations.read_csv('Datasets/global_mean_sea_level.csv')
-    data_1993_2020 = computations.mean_sea_level_change(data)
-    data_2021_2080 = computations.predict_2021_2080(data_1993_2020['2020'])
-    data_2081_2100 = computations.predict_2081_2100(data_2021_2080['2080'])
+    options = simulation.parse_arguments()
+
+    # Perform all the computations. The annual means are only calculated from the dataset when
+    # it has changed since the last run; otherwise they are loaded from the cache.
+    dataset = cache.load_dataset('Datasets/global_mean_sea_level.csv')
+    data_1993_2020 = dataset.annual
+    schedule = None
+    if options.fit is not None:
+        schedule = computations.fitted_rates(dataset.sample_series(), options.fit)
+    data_2021_2080 = computations.predict_2021_2080(data_1993_2020[2020], schedule)
+    data_2081_2100 = computations.predict_2081_2100(data_2021_2080[2080], schedule)
 
-    # The variable below is the dictionary of the total data.
+    # The variable below is the series of the total data.
     combined_data = computations.combine_data(data_1993_2020, data_2021_2080, data_2081_2100)
 
     # Print the contributions from each factor to the console.
-    pprint(computations.factor_contribution(combined_data))
+    pprint(computations.factor_contribution(combined_data).to_dict())
 
-    # Code for running the simulation.
-    simulation.run_simulation()
+    # Code for running the simulation. pygame is only loaded once the window is opened.
+    simulation.run_simulation(options.scene_file, options.trace, options.hud, options.fit)
@@ -0,0 +1,194 @@
+"""
+This file handles combining the samples of several datasets, e.g. one per mission or one per
+reprocessing of a mission, into one series of global mean sea levels.
+
+Every source is a dataset in the NOAA format (see ingest.py) whose rows are sorted by time.
+Instead of reading every source and sorting all of their samples together, the sources are
+merged as they are read: each source keeps a buffer of at most a couple of chunks of its
+rows, and every sample older than the newest sample buffered by the source that is furthest
+behind can no longer be matched by a sample still to be read, so it is combined and passed
+on straight away.
+
+Samples of different sources at the same time are combined by a policy:
+    'priority'  the value of the first of the sources (in the order they are given) is used,
+                like the missions of a single dataset (see ingest.MISSION_PRIORITY)
+    'blend'     the average of the values, weighted by the weight of each source
+
+With the 'priority' policy, merging the columns of a dataset saved as separate files gives
+the same samples as reading the dataset itself.
+
+This file is Copyright (c) 2020 Yousuf Hassan, Aaditya Mandal, Faraz Hossein, and Dinkar Verma.
+"""
+
+from typing import Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+from series import SeaLevelSeries
+from streaming import AnnualAccumulator, iter_chunks
+
+# The ways samples of different sources at the same time can be combined.
+POLICIES = ('priority', 'blend')
+
+# The number of bytes read from a source at once.
+CHUNK_SIZE = 1 << 20
+
+
+class SourceBuffer:
+    """The samples of a source that have been read but not yet merged.
+
+    Instance Attributes:
+        - filename: the filename of the source
+        - times: the time of each buffered sample, as a decimal year
+        - values: the global mean sea level of each buffered sample
+        - finished: whether every sample of the source has been read
+
+    Representation Invariants:
+        - self.times.shape == self.values.shape
+        - all(self.times[i] <= self.times[i + 1] for i in range(len(self.times) - 1))
+    """
+    filename: str
+    times: np.ndarray
+    values: np.ndarray
+    finished: bool
+
+    # Private Instance Attributes:
+    #   - _chunks: the chunks of samples of the source not yet read
+    #   - _last_time: the time of the last sample read, or -inf before the first one
+    _chunks: Iterator
+    _last_time: float
+
+    def __init__(self, filename: str, chunk_size: int = CHUNK_SIZE,
+                 priority: Optional[Tuple[str, ...]] = None) -> None:
+        """Initialize a new buffer of the source with the given filename, read chunk_size bytes
+        at a time. Within the source, missions are ranked by priority (see iter_chunks).
+        """
+        self.filename = filename
+        self.times = np.zeros(0)
+        self.values = np.zeros(0)
+        self.finished = False
+        self._chunks = iter_chunks(filename, chunk_size, priority)
+        self._last_time = -np.inf
+
+    def horizon(self) -> float:
+        """Return the time up to which every sample of the source has been read: the time of
+        the newest buffered sample, or inf once the whole source has been read.
+        """
+        if self.finished:
+            return np.inf
+        return float(self.times[-1]) if len(self.times) > 0 else self._last_time
+
+    def read(self) -> None:
+        """Read the next chunk of samples of the source that has any, and add them to the end
+        of the buffer.
+
+        Raise a ValueError if the samples are not sorted by time.
+        """
+        for samples in self._chunks:
+            if len(samples.times) == 0:
+                continue
+            if samples.times[0] < self._last_time or np.any(np.diff(samples.times) < 0):
+                raise ValueError('the samples of {} are not sorted by time'.format(
+                    self.filename))
+            self._last_time = float(samples.times[-1])
+            self.times = np.concatenate([self.times, samples.times])
+            self.values = np.concatenate([self.values, samples.values])
+            return
+        self.finished = True
+
+    def take(self, horizon: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Remove the buffered samples older than horizon, and return their times and values.
+        """
+        end = np.searchsorted(self.times, horizon, side='left')
+        times, values = self.times[:end], self.values[:end]
+        self.times, self.values = self.times[end:], self.values[end:]
+        return times, values
+
+
+def combine(times: np.ndarray, values: np.ndarray, sources: np.ndarray,
+            policy: str = 'priority',
+            weights: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the times and values of the samples left after combining the samples at the same
+    time with the given policy, sorted by time. sources is the index of the source of each
+    sample; a lower index has a higher priority, and weights gives the weight of each source.
+
+    Preconditions:
+        - policy in POLICIES
+        - policy != 'blend' or weights is not None
+    """
+    order = np.lexsort((sources, times))
+    times, values, sources = times[order], values[order], sources[order]
+    starts = np.flatnonzero(np.diff(times, prepend=-np.inf) > 0)
+
+    if policy == 'priority':
+        return times[starts], values[starts]
+    sample_weights = weights[sources]
+    return times[starts], (np.add.reduceat(values * sample_weights, starts)
+                           / np.add.reduceat(sample_weights, starts))
+
+
+def iter_merged(filenames: Sequence[str], policy: str = 'priority',
+                weights: Optional[Sequence[float]] = None, chunk_size: int = CHUNK_SIZE,
+                priority: Optional[Tuple[str, ...]] = None
+                ) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """Merge the sources with the given filenames, each sorted by time, and yield the times and
+    values of the merged samples in blocks, in order of time. The sources may be gzip
+    compressed.
+
+    Samples at the same time are combined with the given policy, where the sources are in
+    order of priority and weights gives the weight of each source (1 by default). Within each
+    source, missions are ranked by priority (see ingest.mission_priority).
+
+    Raise a ValueError if a source is not sorted by time.
+
+    Preconditions:
+        - policy in POLICIES
+        - weights is None or len(weights) == len(filenames)
+    """
+    weights = np.ones(len(filenames)) if weights is None else np.asarray(weights, np.float64)
+    buffers = [SourceBuffer(filename, chunk_size, priority) for filename in filenames]
+    for buffer in buffers:
+        buffer.read()
+
+    while not all(buffer.finished and len(buffer.times) == 0 for buffer in buffers):
+        horizon = min(buffer.horizon() for buffer in buffers)
+        taken = [buffer.take(horizon) for buffer in buffers]
+        times = np.concatenate([times for times, _ in taken])
+        if len(times) > 0:
+            values = np.concatenate([values for _, values in taken])
+            sources = np.repeat(np.arange(len(buffers)), [len(times) for times, _ in taken])
+            yield combine(times, values, sources, policy, weights)
+
+        # The sources furthest behind may still have samples at the horizon.
+        for buffer in _behind(buffers, horizon):
+            buffer.read()
+
+
+def _behind(buffers: List[SourceBuffer], horizon: float) -> List[SourceBuffer]:
+    """Return the buffers of the sources not read past horizon."""
+    return [buffer for buffer in buffers if not buffer.finished and buffer.horizon() <= horizon]
+
+
+def merge_annual_means(filenames: Sequence[str], policy: str = 'priority',
+                       weights: Optional[Sequence[float]] = None,
+                       chunk_size: int = CHUNK_SIZE,
+                       priority: Optional[Tuple[str, ...]] = None) -> SeaLevelSeries:
+    """Return the average global mean sea level of each year of the merged samples of the
+    sources with the given filenames (see iter_merged), aggregated as they are merged.
+
+    With one source, the result is the same as mean_sea_level_change(read_csv(filename)).
+    """
+    accumulator = AnnualAccumulator()
+    for times, values in iter_merged(filenames, policy, weights, chunk_size, priority):
+        accumulator.add(np.floor(times), values)
+
+    return accumulator.means()
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['numpy', 'Iterator', 'List', 'Optional', 'Sequence', 'Tuple',
+                          'series', 'streaming'],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })
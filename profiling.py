@@ -0,0 +1,212 @@
+"""
+This file measures where the time of each frame of the pygame simulation goes.
+
+A FrameProfiler times the phases of every frame: polling events, laying out the frame (moving
+the year and choosing the images shown), drawing the background, the water and the text, and
+sending the frame to the display. The times are kept for every scene, so the 50th, 95th and
+99th percentiles of each phase can be reported per scene, and the frames can be written to a
+json trace that chrome://tracing and https://ui.perfetto.dev can open.
+
+Profiling is off unless the simulation is started with a trace file or the overlay (see
+simulation.main: the --trace and --hud options, or the SLR_TRACE and SLR_HUD environment
+variables), so the simulation does not pay for it otherwise.
+
+This file is Copyright (c) 2020 Yousuf Hassan, Aaditya Mandal, Faraz Hossein, and Dinkar Verma.
+"""
+
+import json
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+import numpy as np
+
+# The phases of a frame, in the order they happen.
+PHASES = ('events', 'layout', 'background', 'water', 'text', 'update', 'hud')
+
+# The percentiles reported for each phase.
+PERCENTILES = (50, 95, 99)
+
+# The number of frames of each scene kept: ten minutes at 60 frames per second.
+MAX_FRAMES = 36000
+
+# The number of seconds between updates of the overlay.
+HUD_INTERVAL = 0.5
+
+
+def layer_phase(name: str) -> str:
+    """Return the phase drawing the renderer layer with the given name counts towards (see
+    frames.SceneFrames and rendering.DirtyRenderer.render).
+    """
+    if name in ('background', 'update', 'hud'):
+        return name
+    elif name.startswith(('water', 'flood')):
+        return 'water'
+    else:
+        return 'text'
+
+
+class FrameProfiler:
+    """The times of the phases of the frames of the simulation, by scene.
+
+    Instance Attributes:
+        - max_frames: the number of frames of each scene kept; older frames are dropped
+        - hud: whether the frames are kept for the overlay text (see hud_text)
+        - scene: the scene of the frame being timed, or None between frames
+
+    Representation Invariants:
+        - self.max_frames > 0
+    """
+    max_frames: int
+    hud: bool
+    scene: Optional[str]
+
+    # Private Instance Attributes:
+    #   - _frames: a dictionary mapping each scene to its frames, oldest first; each frame is
+    #     its start time and the seconds spent in each phase
+    #   - _current: the seconds spent in each phase of the frame being timed
+    #   - _start: the time the frame being timed started
+    #   - _origin: the time the profiler was created, the zero of the trace
+    #   - _recent: the start time and phase times of the frames since the overlay text was
+    #     last updated, if hud is True
+    _frames: Dict[str, Deque[Tuple[float, Dict[str, float]]]]
+    _current: Dict[str, float]
+    _start: float
+    _origin: float
+    _recent: List[Tuple[float, Dict[str, float]]]
+
+    def __init__(self, max_frames: int = MAX_FRAMES, hud: bool = False) -> None:
+        """Initialize a new profiler with no frames."""
+        self.max_frames = max_frames
+        self.hud = hud
+        self.scene = None
+        self._frames = {}
+        self._current = {}
+        self._start = 0.0
+        self._origin = time.perf_counter()
+        self._recent = []
+
+    def start_frame(self, scene: str) -> None:
+        """Start timing a frame of the given scene, ending the frame being timed if there is
+        one.
+        """
+        if self.scene is not None:
+            self.end_frame()
+        self.scene = scene
+        self._current = {}
+        self._start = time.perf_counter()
+
+    def end_frame(self) -> None:
+        """Stop timing the frame being timed and keep its times."""
+        if self.scene is None:
+            return
+        frame = (self._start, self._current)
+        if self.scene not in self._frames:
+            self._frames[self.scene] = deque(maxlen=self.max_frames)
+        self._frames[self.scene].append(frame)
+        if self.hud:
+            self._recent.append(frame)
+        self.scene = None
+
+    def add(self, phase: str, seconds: float) -> None:
+        """Add the given number of seconds to a phase of the frame being timed."""
+        self._current[phase] = self._current.get(phase, 0.0) + seconds
+
+    def add_render(self, timings: Dict[str, float]) -> None:
+        """Add the times of a DirtyRenderer.render to the phases of the frame being timed."""
+        for name, seconds in timings.items():
+            self.add(layer_phase(name), seconds)
+
+    @contextmanager
+    def measure(self, phase: str) -> Iterator[None]:
+        """Add the time spent in the body of a with statement to the given phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(phase, time.perf_counter() - start)
+
+    def hud_text(self) -> Optional[str]:
+        """Return the new text of the overlay, or None if it was updated less than
+        HUD_INTERVAL seconds ago: the frames per second, and the phase with the highest mean
+        time, since the last update.
+
+        Preconditions:
+            - self.hud
+        """
+        if len(self._recent) < 2 or time.perf_counter() - self._recent[0][0] < HUD_INTERVAL:
+            return None
+        recent, self._recent = self._recent, []
+
+        frames_per_second = (len(recent) - 1) / (recent[-1][0] - recent[0][0])
+        totals = {}
+        for _, phases in recent:
+            for phase, seconds in phases.items():
+                totals[phase] = totals.get(phase, 0.0) + seconds
+        if not totals:
+            return '{:.1f} FPS'.format(frames_per_second)
+        slowest = max(totals, key=totals.get)
+        return '{:.1f} FPS, slowest: {} {:.2f} ms'.format(
+            frames_per_second, slowest, 1000 * totals[slowest] / len(recent))
+
+    def summary(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """Return a dictionary mapping each scene to a dictionary mapping each phase, and
+        'total', to its percentiles in milliseconds (as 'p50', 'p95' and 'p99'), its mean and
+        its number of frames.
+        """
+        summary = {}
+        for scene, frames in self._frames.items():
+            times = np.array([[phases.get(phase, 0.0) for phase in PHASES]
+                              for _, phases in frames]) * 1000
+            columns = {phase: times[:, i] for i, phase in enumerate(PHASES)}
+            columns['total'] = times.sum(axis=1)
+            summary[scene] = {
+                phase: {**{'p{}'.format(p): float(np.percentile(column, p))
+                           for p in PERCENTILES},
+                        'mean': float(column.mean()), 'frames': len(column)}
+                for phase, column in columns.items()}
+        return summary
+
+    def report(self) -> str:
+        """Return a table of the percentiles of each phase of each scene, in milliseconds."""
+        lines = []
+        header = ''.join('{:>9}'.format('p' + str(p)) for p in PERCENTILES)
+        for scene, phases in self.summary().items():
+            lines.append('{} ({} frames)'.format(scene, phases['total']['frames']))
+            lines.append('    {:<12}{}'.format('phase', header))
+            for phase, stats in phases.items():
+                lines.append('    {:<12}{}'.format(phase, ''.join(
+                    '{:>9.3f}'.format(stats['p' + str(p)]) for p in PERCENTILES)))
+        return '\n'.join(lines)
+
+    def dump(self, filename: str) -> None:
+        """Write the frames to a json trace file in the Trace Event Format, with one event per
+        frame of each scene and the phase times (in milliseconds) as its arguments, followed
+        by the summary.
+        """
+        self.end_frame()
+        events = []
+        for scene, frames in self._frames.items():
+            for start, phases in frames:
+                events.append({
+                    'name': scene, 'cat': 'frame', 'ph': 'X', 'pid': 0, 'tid': 0,
+                    'ts': (start - self._origin) * 1e6,
+                    'dur': sum(phases.values()) * 1e6,
+                    'args': {phase: seconds * 1000 for phase, seconds in phases.items()}})
+        events.sort(key=lambda event: event['ts'])
+
+        with open(filename, 'w') as file:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms',
+                       'summary': self.summary()}, file)
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['json', 'time', 'collections', 'contextlib', 'numpy', 'Deque', 'Dict',
+                          'Iterator', 'List', 'Optional', 'Tuple'],
+        'allowed-io': ['dump'],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })
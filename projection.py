@@ -0,0 +1,187 @@
+"""
+This file handles projecting the global mean sea level into the future.
+
+A projection starts from the global mean sea level of a base year and follows a rate
+schedule: a list of pieces, each starting at a given year with its own rate of change
+(in mm per year) and, optionally, acceleration (in mm per year per year).
+
+The level of every year of every schedule is calculated at once, as a cumulative sum of the
+yearly changes, and only rounded at the end. Many schedules can be projected together, in
+which case the result has one row per schedule and one column per year.
+
+This file is Copyright (c) 2020 Yousuf Hassan, Aaditya Mandal, Faraz Hossein, and Dinkar Verma.
+"""
+
+from typing import Optional, Sequence, Tuple, Union
+import numpy as np
+from series import SeaLevelSeries
+
+
+class RateSchedule:
+    """A piecewise rate of change of the global mean sea level.
+
+    Piece i applies to the years after start_years[i], up to and including start_years[i + 1].
+    The first piece also applies to any year before its start. Within a piece, the level
+    changes by rates[i] mm per year, plus accelerations[i] mm per year for every year since
+    the piece started.
+
+    Instance Attributes:
+        - start_years: the year each piece starts
+        - rates: the rate of change of each piece, in mm per year
+        - accelerations: the acceleration of each piece, in mm per year per year
+
+    Representation Invariants:
+        - len(self.start_years) == len(self.rates) == len(self.accelerations) > 0
+        - all(self.start_years[i] < self.start_years[i + 1]
+              for i in range(len(self.start_years) - 1))
+    """
+    start_years: np.ndarray
+    rates: np.ndarray
+    accelerations: np.ndarray
+
+    def __init__(self, start_years: Sequence[int], rates: Sequence[float],
+                 accelerations: Optional[Sequence[float]] = None) -> None:
+        """Initialize a new rate schedule. Without accelerations, every rate is constant.
+
+        Preconditions:
+            - len(start_years) == len(rates) > 0
+            - accelerations is None or len(accelerations) == len(rates)
+            - start_years is sorted in strictly increasing order
+        """
+        self.start_years = np.asarray(start_years, dtype=np.int64)
+        self.rates = np.asarray(rates, dtype=np.float64)
+        if accelerations is None:
+            self.accelerations = np.zeros(len(self.rates))
+        else:
+            self.accelerations = np.asarray(accelerations, dtype=np.float64)
+
+    def __repr__(self) -> str:
+        """Return a string representation of this schedule."""
+        return 'RateSchedule({}, {}, {})'.format(self.start_years.tolist(), self.rates.tolist(),
+                                                 self.accelerations.tolist())
+
+
+# The rates used by the program: 3.3mm per year from 2020 (NASA), then 12mm per year from
+# 2080 (Church et al).
+DEFAULT_SCHEDULE = RateSchedule([2020, 2080], [3.3, 12.0])
+
+
+def yearly_changes(schedules: Sequence[RateSchedule], years: np.ndarray) -> np.ndarray:
+    """Return the change in global mean sea level from the year before each of the given years
+    to that year, for each schedule, as an array with one row per schedule.
+    """
+    num_pieces = max(len(schedule.rates) for schedule in schedules)
+
+    # Pad every schedule to the same number of pieces with pieces that never start.
+    start_years = np.full((len(schedules), num_pieces), np.iinfo(np.int64).max)
+    rates = np.zeros((len(schedules), num_pieces))
+    accelerations = np.zeros((len(schedules), num_pieces))
+    for i, schedule in enumerate(schedules):
+        start_years[i, :len(schedule.rates)] = schedule.start_years
+        rates[i, :len(schedule.rates)] = schedule.rates
+        accelerations[i, :len(schedule.rates)] = schedule.accelerations
+
+    return piecewise_changes(start_years, rates, accelerations, years)
+
+
+def piecewise_changes(start_years: np.ndarray, rates: np.ndarray, accelerations: np.ndarray,
+                      years: np.ndarray) -> np.ndarray:
+    """Return the yearly changes of the given years for schedules given as arrays with one
+    row per schedule and one column per piece (see RateSchedule).
+
+    Any of the arrays may have a single row shared by every schedule, e.g. when all the
+    schedules start their pieces in the same years.
+    """
+    # The piece each year belongs to, for each schedule.
+    pieces = np.sum(start_years[:, np.newaxis, :] < years[np.newaxis, :, np.newaxis], axis=2)
+    pieces = np.maximum(pieces - 1, 0)
+
+    piece_starts = np.take_along_axis(start_years, pieces, axis=1)
+    piece_rates = np.take_along_axis(rates, pieces, axis=1)
+    piece_accelerations = np.take_along_axis(accelerations, pieces, axis=1)
+
+    # The average rate over the year, since the rate grows continuously within a piece.
+    return piece_rates + piece_accelerations * (years - piece_starts - 0.5)
+
+
+def accumulate(changes: np.ndarray, base_level: Union[float, np.ndarray],
+               decimals: Optional[int] = 2) -> np.ndarray:
+    """Return the levels reached from base_level by the yearly changes of each row of changes,
+    starting with base_level itself, rounded to the given number of decimals unless it is None.
+    """
+    levels = np.empty((len(changes), changes.shape[1] + 1))
+    levels[:, 0] = base_level
+    np.cumsum(changes, axis=1, out=levels[:, 1:])
+    levels[:, 1:] += levels[:, :1]
+
+    return levels if decimals is None else np.round(levels, decimals)
+
+
+def project(schedules: Sequence[RateSchedule], base_level: Union[float, np.ndarray],
+            base_year: int, end_year: int, decimals: Optional[int] = 2) -> np.ndarray:
+    """Project the global mean sea level from base_year to end_year for each schedule, and
+    return an array with one row per schedule and one column per year, starting with
+    base_year.
+
+    base_level is the level of base_year, either the same for every schedule or one per
+    schedule. The levels are rounded to the given number of decimals, unless it is None.
+
+    Preconditions:
+        - len(schedules) > 0
+        - base_year <= end_year
+    """
+    changes = yearly_changes(schedules, np.arange(base_year + 1, end_year + 1))
+    return accumulate(changes, base_level, decimals)
+
+
+def project_series(schedule: RateSchedule, base_level: float, base_year: int,
+                   end_year: int) -> SeaLevelSeries:
+    """Return an annual series of the global mean sea level projected from base_year to
+    end_year with the given schedule, starting with base_year.
+    """
+    levels = project([schedule], base_level, base_year, end_year)[0]
+    return SeaLevelSeries(np.arange(base_year, end_year + 1), levels)
+
+
+def extend_series(observed: SeaLevelSeries, end_year: int,
+                  schedule: RateSchedule = DEFAULT_SCHEDULE) -> SeaLevelSeries:
+    """Return the annual series observed followed by its projection up to end_year with the
+    given schedule, starting from the last observed year.
+    """
+    base_year = int(observed.years[-1])
+    projected = project([schedule], observed.values[-1], base_year, end_year)[0]
+
+    return SeaLevelSeries(np.concatenate([observed.years, np.arange(base_year + 1, end_year + 1)]),
+                          np.concatenate([observed.values, projected[1:]]))
+
+
+def level_curve(samples: SeaLevelSeries, projected: SeaLevelSeries,
+                anchor: float = 0.5) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the times (as decimal years) and global mean sea levels of a curve through the
+    raw samples of the dataset, followed by the projected annual levels after the last
+    sample.
+
+    The raw samples keep their own times. An annual level is placed anchor of the way through
+    its year: by default at the middle, since it is the average over the year, and at the
+    start (anchor 0) to show the level of year N at time N. The levels between two points of
+    the curve can be found with np.interp.
+
+    Preconditions:
+        - 0 <= anchor < 1
+    """
+    order = np.argsort(samples.times, kind='stable')
+    times, values = samples.times[order], samples.values[order]
+    after = projected.years + anchor > times[-1]
+
+    return (np.concatenate([times, projected.years[after] + anchor]),
+            np.concatenate([values, projected.values[after]]))
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['numpy', 'Optional', 'Sequence', 'Tuple', 'Union', 'series'],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })
@@ -0,0 +1,325 @@
+"""
+This file handles drawing the scenes of the pygame simulation without redrawing the whole
+window every frame.
+
+The parts of a scene that never change (e.g. its background image) are drawn once onto a
+background surface. Everything else is a layer: an image drawn at a position on top of the
+background. Each frame, only the areas of the window where a layer moved, changed or was
+removed are drawn again, and only those areas are sent to the display, so a frame where
+nothing changed costs almost nothing.
+
+Images that cover a large area but change a few pixels at a time, like the flooded cells of
+a city, are a FloodOverlay: one image drawn on in place, so only the pixels that changed are
+written and only the area around them is drawn again.
+
+Rendering text with a font is one of the slowest things a frame can do, so text is rendered
+through a TextCache, which keeps the images of the most recently used text and can render
+text that will be needed (e.g. the label of every year) before the first frame.
+
+This file is Copyright (c) 2020 Yousuf Hassan, Aaditya Mandal, Faraz Hossein, and Dinkar Verma.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+import pygame
+
+# The number of text images a TextCache keeps by default.
+MAX_TEXTS = 512
+
+
+class DirtyRenderer:
+    """Draws a static background and a set of layers to a window, redrawing only the areas
+    that changed since the last frame.
+
+    The layers are drawn in the order they were first set, so later layers are drawn on top
+    of earlier ones.
+
+    Instance Attributes:
+        - screen: the surface of the window
+        - background: the static parts of the scene, the same size as the screen
+
+    Representation Invariants:
+        - self.background.get_size() == self.screen.get_size()
+    """
+    screen: pygame.Surface
+    background: pygame.Surface
+
+    # Private Instance Attributes:
+    #   - _layers: a dictionary mapping the name of each layer to its image and position
+    #   - _dirty: the areas of the screen to draw again in the next frame
+    _layers: Dict[str, Tuple[pygame.Surface, Tuple[int, int]]]
+    _dirty: List[pygame.Rect]
+
+    def __init__(self, screen: pygame.Surface, background: pygame.Surface) -> None:
+        """Initialize a new renderer with no layers. The whole screen is drawn in the first
+        frame.
+        """
+        self.screen = screen
+        self.background = background
+        self._layers = {}
+        self._dirty = [screen.get_rect()]
+
+    @classmethod
+    def composite(cls, screen: pygame.Surface,
+                  layers: List[Tuple[pygame.Surface, Tuple[int, int]]],
+                  fill: Optional[Tuple[int, int, int]] = None) -> 'DirtyRenderer':
+        """Return a renderer whose background is the given images drawn at their positions,
+        in order, on top of the given fill colour.
+        """
+        background = pygame.Surface(screen.get_size()).convert()
+        if fill is not None:
+            background.fill(fill)
+        for surface, position in layers:
+            background.blit(surface, position)
+        return cls(screen, background)
+
+    def set_layer(self, name: str, surface: pygame.Surface, position: Tuple[int, int]) -> None:
+        """Draw the given image at the given position as the layer with the given name, from
+        the next frame on.
+
+        Nothing is redrawn if the layer already has the same image at the same position.
+        """
+        position = (int(position[0]), int(position[1]))
+        old = self._layers.get(name)
+        if old is not None and old[0] is surface and old[1] == position:
+            return
+
+        if old is not None:
+            self._dirty.append(old[0].get_rect(topleft=old[1]))
+        self._dirty.append(surface.get_rect(topleft=position))
+        self._layers[name] = (surface, position)
+
+    def remove_layer(self, name: str) -> None:
+        """Stop drawing the layer with the given name, if there is one."""
+        old = self._layers.pop(name, None)
+        if old is not None:
+            self._dirty.append(old[0].get_rect(topleft=old[1]))
+
+    def invalidate(self, area: Optional[pygame.Rect] = None) -> None:
+        """Draw the given area of the screen again in the next frame, or the whole screen if
+        it is None, e.g. after the image of a layer was drawn on.
+        """
+        self._dirty.append(self.screen.get_rect() if area is None else pygame.Rect(area))
+
+    def render(self, timings: Optional[Dict[str, float]] = None) -> List[pygame.Rect]:
+        """Draw the areas of the screen that changed since the last frame, send them to the
+        display and return them.
+
+        If timings is given, the seconds spent drawing the background and each layer are added
+        to it under 'background' and the name of the layer, and the seconds spent sending the
+        areas to the display under 'update' (see profiling.FrameProfiler).
+        """
+        if timings is not None:
+            return self._timed_render(timings)
+        dirty = _merge(self._dirty, self.screen.get_rect())
+        self._dirty = []
+
+        for area in dirty:
+            self.screen.set_clip(area)
+            self.screen.blit(self.background, area, area)
+            for surface, position in self._layers.values():
+                if area.colliderect(surface.get_rect(topleft=position)):
+                    self.screen.blit(surface, position)
+        self.screen.set_clip(None)
+
+        if dirty:
+            pygame.display.update(dirty)
+        return dirty
+
+    def _timed_render(self, timings: Dict[str, float]) -> List[pygame.Rect]:
+        """Do the same as render, adding the time of each part to timings."""
+        dirty = _merge(self._dirty, self.screen.get_rect())
+        self._dirty = []
+
+        for area in dirty:
+            self.screen.set_clip(area)
+            start = time.perf_counter()
+            self.screen.blit(self.background, area, area)
+            end = time.perf_counter()
+            timings['background'] = timings.get('background', 0.0) + end - start
+            for name, (surface, position) in self._layers.items():
+                if area.colliderect(surface.get_rect(topleft=position)):
+                    start = end
+                    self.screen.blit(surface, position)
+                    end = time.perf_counter()
+                    timings[name] = timings.get(name, 0.0) + end - start
+        self.screen.set_clip(None)
+
+        if dirty:
+            start = time.perf_counter()
+            pygame.display.update(dirty)
+            timings['update'] = timings.get('update', 0.0) + time.perf_counter() - start
+        return dirty
+
+
+class TextCache:
+    """The images of recently rendered text, so the same text is only rendered once.
+
+    Instance Attributes:
+        - max_texts: the number of text images kept
+        - hits: the number of times an image was found in the cache
+        - misses: the number of times text had to be rendered
+
+    Representation Invariants:
+        - self.max_texts > 0
+    """
+    max_texts: int
+    hits: int
+    misses: int
+
+    # Private Instance Attributes:
+    #   - _images: a dictionary mapping the font, text and colours of each text image to the
+    #     image, from the least to the most recently used
+    _images: OrderedDict
+
+    def __init__(self, max_texts: int = MAX_TEXTS) -> None:
+        """Initialize a new, empty text cache."""
+        self.max_texts = max_texts
+        self.hits = 0
+        self.misses = 0
+        self._images = OrderedDict()
+
+    def render(self, font: pygame.font.Font, text: str, color: Tuple[int, int, int],
+               background: Optional[Tuple[int, int, int]] = None) -> pygame.Surface:
+        """Return an image of text in the given font and colour, on the given background
+        colour or on a transparent background if it is None.
+
+        The same image is returned every time the same text is rendered, as long as it is
+        kept in the cache, so it must not be drawn on.
+        """
+        key = (font, text, color, background)
+        image = self._images.get(key)
+        if image is not None:
+            self.hits += 1
+            self._images.move_to_end(key)
+            return image
+
+        self.misses += 1
+        image = font.render(text, True, color, background)
+        image = image.convert() if background is not None else image.convert_alpha()
+        self._images[key] = image
+        if len(self._images) > self.max_texts:
+            self._images.popitem(last=False)
+        return image
+
+    def prerender(self, font: pygame.font.Font, texts: Iterable[str],
+                  color: Tuple[int, int, int],
+                  background: Optional[Tuple[int, int, int]] = None) -> None:
+        """Render every text in texts, so that rendering it later only needs the cache."""
+        for text in texts:
+            self.render(font, text, color, background)
+
+    def __len__(self) -> int:
+        """Return the number of text images in the cache."""
+        return len(self._images)
+
+
+class FloodOverlay:
+    """An image of the cells of a raster that are flooded at a sea level, drawn in the colour
+    of water, that is drawn on in place when the sea level changes.
+
+    The cells are sorted by their flood level once, so the cells flooded at a sea level are
+    the first cells in that order, and the cells that change when the sea level changes are
+    the cells between the old and the new number of flooded cells. Only those are drawn, by
+    setting their opacity through a view of the alpha channel of the image
+    (pygame.surfarray.pixels_alpha), so changing the sea level allocates no new image.
+
+    Instance Attributes:
+        - surface: the image; cell (row, column) of the raster is its pixel (column, row)
+        - alpha: the opacity of the flooded cells
+
+    Representation Invariants:
+        - 0 <= self.alpha <= 255
+    """
+    surface: pygame.Surface
+    alpha: int
+
+    # Private Instance Attributes:
+    #   - _levels: the flood level of every cell, from lowest to highest
+    #   - _rows: the row of every cell, in the same order
+    #   - _columns: the column of every cell, in the same order
+    #   - _flooded: the number of cells drawn flooded
+    _levels: np.ndarray
+    _rows: np.ndarray
+    _columns: np.ndarray
+    _flooded: int
+
+    def __init__(self, levels: np.ndarray, color: Tuple[int, int, int], alpha: int) -> None:
+        """Initialize a new overlay of the cells with the given 2-D array of flood levels,
+        with no cell flooded.
+        """
+        self.surface = pygame.Surface((levels.shape[1], levels.shape[0]),
+                                      pygame.SRCALPHA).convert_alpha()
+        self.surface.fill((color[0], color[1], color[2], 0))
+        self.alpha = alpha
+
+        order = np.argsort(levels, axis=None, kind='stable')
+        self._levels = levels.ravel()[order]
+        self._rows, self._columns = np.divmod(order.astype(np.int32), np.int32(levels.shape[1]))
+        self._flooded = 0
+
+    def set_level(self, sea_level: float) -> Optional[pygame.Rect]:
+        """Show the cells flooded at the given sea level, and return the area of the image
+        that changed, or None if none did.
+        """
+        flooded = int(np.searchsorted(self._levels, sea_level, side='right'))
+        if flooded == self._flooded:
+            return None
+
+        start, end = min(flooded, self._flooded), max(flooded, self._flooded)
+        rows, columns = self._rows[start:end], self._columns[start:end]
+        alpha = pygame.surfarray.pixels_alpha(self.surface)
+        alpha[columns, rows] = self.alpha if flooded > self._flooded else 0
+        del alpha  # The surface is locked, and cannot be drawn, until the view is deleted.
+        self._flooded = flooded
+
+        left, top = int(columns.min()), int(rows.min())
+        return pygame.Rect(left, top, int(columns.max()) - left + 1, int(rows.max()) - top + 1)
+
+
+def edge_strips(surface: pygame.Surface, count: int) -> List[Optional[pygame.Surface]]:
+    """Return the images used to draw surface at count positions between two whole pixels.
+
+    To draw surface k / count of a pixel below the whole pixel y, draw it at y + 1 and strip k
+    at y: strip k is the top row of surface with only 1 - k / count of its opacity, so the top
+    edge of surface appears to be between the two pixels. Strip 0 is None, since drawing
+    surface at y needs no strip.
+    """
+    top = surface.subsurface((0, 0, surface.get_width(), 1)).convert_alpha()
+    strips = [None]
+    for k in range(1, count):
+        strip = top.copy()
+        strip.fill((255, 255, 255, round(255 * (1 - k / count))),
+                   special_flags=pygame.BLEND_RGBA_MULT)
+        strips.append(strip)
+    return strips
+
+
+def _merge(rects: List[pygame.Rect], bounds: pygame.Rect) -> List[pygame.Rect]:
+    """Return the given rectangles clipped to bounds, with overlapping rectangles replaced by
+    the smallest rectangle containing both, so no area is drawn twice.
+    """
+    merged = []
+    for rect in rects:
+        rect = rect.clip(bounds)
+        if rect.width == 0 or rect.height == 0:
+            continue
+        index = rect.collidelist(merged)
+        while index != -1:
+            rect.union_ip(merged.pop(index))
+            index = rect.collidelist(merged)
+        merged.append(rect)
+    return merged
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['time', 'collections', 'numpy', 'pygame', 'Dict', 'Iterable',
+                          'List', 'Optional', 'Tuple'],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })
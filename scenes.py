@@ -0,0 +1,363 @@
+"""
+This file contains the scenes of the pygame simulation.
+
+Every scene is described by data instead of code: the images drawn behind the water, the
+water image, the height of the water line, how many mm of sea level rise one pixel stands
+for, and the captions drawn on top. The built-in scenes are in DEFAULT_SCENES; more scenes
+can be added in a json file with a list of descriptions of the same form:
+
+    {"name": "venice", "title": "Venice Simulation", "button": [450, 400],
+     "background": [{"path": "Images/venice2.jpeg", "area": [200, 0, 600, 565]}],
+     "water": {"path": "Images/realocean.jpg", "size": [600, 178]},
+     "water_height": 535, "scale": 13,
+     "captions": [{"text": "...", "center": [300, 50], "font": "caption", "years": [2100]}]}
+
+"button" (the centre of the scene's button on the home screen), "background", "captions",
+and the "size", "area" and "position" of each image are optional.
+
+A scene with an elevation raster of its city can show the exact cells flooded at the sea
+level shown instead of the water image (see inundation.py):
+
+    "flood": {"raster": "Rasters/venice.npy", "position": [0, 0], "size": [600, 600],
+              "color": [40, 110, 190], "alpha": 170}
+
+Only "raster" is required; "water", "water_height" and "scale" are then optional.
+
+So that the water rises smoothly, each scene calculates a table of its water line
+STEPS_PER_YEAR times a year, in fractions of a pixel, from the raw samples of the dataset and
+the projections (see projection.level_curve), along with the sea level of each step. Drawing
+a frame then only has to look up the water line (or the sea level the city is flooded to) of
+the time shown. The table is calculated the first time the scene is shown and
+kept for later visits.
+
+This file is Copyright (c) 2020 Yousuf Hassan, Aaditya Mandal, Faraz Hossein, and Dinkar Verma.
+"""
+
+import json
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from assets import AssetSpec
+
+# The folder the image paths of the built-in scenes are relative to.
+FOLDER = os.path.dirname(os.path.abspath(__file__))
+
+# The built-in scenes of the simulation.
+DEFAULT_SCENES = [
+    {'name': 'human', 'title': 'Human Simulation', 'button': [150, 300],
+     'background': [{'path': 'Images/sky.jpg', 'size': [600, 600]},
+                    {'path': 'Images/male.png', 'position': [100, 28]},
+                    {'path': 'Images/female.png', 'size': [600, 550], 'position': [100, 70]}],
+     'water': {'path': 'Images/ocean.png'},
+     'water_height': 600, 'scale': 3,
+     'captions': [{'text': "5'9", 'center': [196, 14], 'font': 'label'},
+                  {'text': "5'3", 'center': [400, 76], 'font': 'label'}]},
+    {'name': 'venice', 'title': 'Venice Simulation', 'button': [450, 400],
+     'background': [{'path': 'Images/venice2.jpeg', 'area': [200, 0, 600, 565]}],
+     'water': {'path': 'Images/realocean.jpg', 'size': [600, 178]},
+     'water_height': 535, 'scale': 13},
+    {'name': 'new_york', 'title': 'New York Simulation', 'button': [450, 300],
+     'background': [{'path': 'Images/newyork.jpg', 'size': [600, 600]}],
+     'water': {'path': 'Images/realocean.jpg', 'size': [600, 178]},
+     'water_height': 532, 'scale': 60,
+     'captions': [
+         {'text': 'This may not look like a significant change compared to the size',
+          'center': [300, 50], 'font': 'caption', 'years': [2100]},
+         {'text': 'of the Statue of Liberty Island, but throughout time, as the water rises,',
+          'center': [300, 70], 'font': 'caption', 'years': [2100]},
+         {'text': 'the water will begin to seep into the concrete foundation and break it '
+                  'down, causing structural damage',
+          'center': [300, 90], 'font': 'caption', 'years': [2100]}]},
+    {'name': 'amsterdam', 'title': 'Amsterdam Simulation', 'button': [150, 400],
+     'background': [{'path': 'Images/Amsterdam.png', 'size': [600, 600]}],
+     'water': {'path': 'Images/realocean.jpg', 'size': [600, 178]},
+     'water_height': 525, 'scale': 20}
+]
+
+# The number of water lines per year of the smooth water line table of a scene.
+STEPS_PER_YEAR = 60
+
+# The number of positions between two whole pixels the water can be drawn at.
+SUBPIXELS = 4
+
+# The default colour and opacity of the flooded cells of a scene.
+FLOOD_COLOR = (40, 110, 190)
+FLOOD_ALPHA = 170
+
+# The image behind the buttons of the home screen.
+HOME_BACKGROUND = AssetSpec(os.path.join(FOLDER, 'Images', 'homescreenimage.jpg'), (600, 600))
+
+
+class ImageLayer:
+    """An image drawn at a fixed position in a scene.
+
+    Instance Attributes:
+        - spec: how the image is loaded and prepared
+        - position: the position of the top left corner of the image
+    """
+    spec: AssetSpec
+    position: Tuple[int, int]
+
+    def __init__(self, spec: AssetSpec, position: Tuple[int, int] = (0, 0)) -> None:
+        """Initialize a new image layer."""
+        self.spec = spec
+        self.position = position
+
+    @classmethod
+    def from_dict(cls, description: Dict, folder: str = '') -> 'ImageLayer':
+        """Return the image layer described by a dictionary of a scene description, where a
+        relative path is relative to folder.
+        """
+        size, area = description.get('size'), description.get('area')
+        spec = AssetSpec(os.path.join(folder, description['path']),
+                         None if size is None else tuple(size),
+                         None if area is None else tuple(area))
+        return cls(spec, tuple(description.get('position', (0, 0))))
+
+    def name(self) -> str:
+        """Return the name of the prepared image, the same for every layer drawing the same
+        image with the same size, so scenes share it.
+        """
+        return '{}:{}:{}'.format(self.spec.path, self.spec.size, self.spec.area)
+
+
+class FloodLayer:
+    """The cells of an elevation raster flooded at the sea level shown, drawn in the colour of
+    water on top of a scene (see inundation.py).
+
+    Instance Attributes:
+        - raster: the filename of the elevation raster
+        - position: the position of the top left corner of the flooded cells
+        - size: the size the cells are drawn at, or None to draw each cell as one pixel
+        - color: the colour of the water
+        - alpha: the opacity of the water, from 0 to 255
+    """
+    raster: str
+    position: Tuple[int, int]
+    size: Optional[Tuple[int, int]]
+    color: Tuple[int, int, int]
+    alpha: int
+
+    def __init__(self, raster: str, position: Tuple[int, int] = (0, 0),
+                 size: Optional[Tuple[int, int]] = None,
+                 color: Tuple[int, int, int] = FLOOD_COLOR, alpha: int = FLOOD_ALPHA) -> None:
+        """Initialize a new flood layer."""
+        self.raster = raster
+        self.position = position
+        self.size = size
+        self.color = color
+        self.alpha = alpha
+
+    @classmethod
+    def from_dict(cls, description: Dict) -> 'FloodLayer':
+        """Return the flood layer described by a dictionary of a scene description."""
+        size = description.get('size')
+        return cls(description['raster'], tuple(description.get('position', (0, 0))),
+                   None if size is None else tuple(size),
+                   tuple(description.get('color', FLOOD_COLOR)),
+                   description.get('alpha', FLOOD_ALPHA))
+
+
+class Caption:
+    """A line of text drawn on top of a scene.
+
+    Instance Attributes:
+        - text: the text drawn
+        - center: the position of the centre of the text
+        - font: the name of the font of the text (see simulation.run_simulation)
+        - years: the years the caption is shown, or None if it is always shown
+    """
+    text: str
+    center: Tuple[int, int]
+    font: str
+    years: Optional[frozenset]
+
+    def __init__(self, text: str, center: Tuple[int, int], font: str = 'label',
+                 years: Optional[Sequence[int]] = None) -> None:
+        """Initialize a new caption."""
+        self.text = text
+        self.center = center
+        self.font = font
+        self.years = None if years is None else frozenset(years)
+
+    def shown_in(self, year: int) -> bool:
+        """Return whether the caption is shown in the given year."""
+        return self.years is None or year in self.years
+
+
+class Scene:
+    """A scene of the simulation: images with the water drawn in front of them at a height
+    that follows the global mean sea level of the year shown.
+
+    Instance Attributes:
+        - name: the name of the scene
+        - title: the text of the scene's button on the home screen
+        - button: the centre of the scene's button on the home screen, or None to place it
+          automatically
+        - background: the images drawn behind the water, in order
+        - water: the water image; its position gives its x coordinate. None if the scene
+          only shows its flooded cells
+        - water_height: the y coordinate of the top of the water when the sea level is 0
+        - scale: the number of mm of sea level rise the water moves up by per pixel
+        - captions: the text drawn on top of the scene
+        - flood: the flooded cells drawn on top of the background, or None if there are none
+        - water_rows: the whole pixel the top of the water is in at each step of the smooth
+          water line table, or None if it has not been calculated (see set_curve)
+        - water_subpixels: the position of the top of the water within that pixel at each
+          step, from 0 to SUBPIXELS - 1 (see rendering.edge_strips)
+        - sea_levels: the global mean sea level at each step, in mm
+
+    Representation Invariants:
+        - self.scale > 0
+        - self.water is not None or self.flood is not None
+    """
+    name: str
+    title: str
+    button: Optional[Tuple[int, int]]
+    background: List[ImageLayer]
+    water: Optional[ImageLayer]
+    water_height: int
+    scale: float
+    captions: List[Caption]
+    flood: Optional[FloodLayer]
+    water_rows: Optional[np.ndarray]
+    water_subpixels: Optional[np.ndarray]
+    sea_levels: Optional[np.ndarray]
+
+    # Private Instance Attributes:
+    #   - _curve_start: the time of the first step of the smooth water line table
+    _curve_start: float
+
+    def __init__(self, name: str, title: str, background: List[ImageLayer],
+                 water: Optional[ImageLayer], water_height: int, scale: float,
+                 captions: Optional[List[Caption]] = None,
+                 button: Optional[Tuple[int, int]] = None,
+                 flood: Optional[FloodLayer] = None) -> None:
+        """Initialize a new scene. Its water line is not known until set_curve is called."""
+        self.name = name
+        self.title = title
+        self.button = button
+        self.background = background
+        self.water = water
+        self.water_height = water_height
+        self.scale = scale
+        self.captions = [] if captions is None else captions
+        self.flood = flood
+        self.water_rows = None
+        self.water_subpixels = None
+        self.sea_levels = None
+        self._curve_start = 0.0
+
+    @classmethod
+    def from_dict(cls, description: Dict, folder: str = '') -> 'Scene':
+        """Return the scene described by a dictionary (see DEFAULT_SCENES), where relative
+        image paths are relative to folder.
+        """
+        captions = [Caption(caption['text'], tuple(caption['center']),
+                            caption.get('font', 'label'), caption.get('years'))
+                    for caption in description.get('captions', [])]
+        button = description.get('button')
+        water = description.get('water')
+        flood = description.get('flood')
+        return cls(description['name'], description['title'],
+                   [ImageLayer.from_dict(layer, folder)
+                    for layer in description.get('background', [])],
+                   None if water is None else ImageLayer.from_dict(water, folder),
+                   description.get('water_height', 0), description.get('scale', 1), captions,
+                   None if button is None else tuple(button),
+                   None if flood is None else FloodLayer.from_dict(flood))
+
+    def images(self) -> Dict[str, AssetSpec]:
+        """Return a dictionary mapping the name of every image of the scene to its spec."""
+        layers = self.background if self.water is None else self.background + [self.water]
+        return {layer.name(): layer.spec for layer in layers}
+
+    def set_curve(self, times: np.ndarray, levels: np.ndarray, start: float,
+                  end: float) -> None:
+        """Calculate the smooth water line table from start to end (as decimal years) from the
+        curve of global mean sea levels through the given times.
+
+        Preconditions:
+            - times is sorted in increasing order
+            - start < end
+        """
+        steps = np.arange(round((end - start) * STEPS_PER_YEAR) + 1) / STEPS_PER_YEAR + start
+        self.sea_levels = np.interp(steps, times, levels)
+        tops = self.water_height - self.sea_levels / self.scale
+
+        # Round the top of the water to the nearest subpixel.
+        subpixels = np.round(tops * SUBPIXELS).astype(np.int64)
+        self.water_rows = subpixels // SUBPIXELS
+        self.water_subpixels = subpixels % SUBPIXELS
+        self._curve_start = start
+
+    def smooth_water_line(self, time: float) -> Tuple[int, int]:
+        """Return the whole pixel the top of the water is in at the given time, and its
+        position within that pixel (see set_curve).
+
+        Preconditions:
+            - self.water_rows is not None
+        """
+        step = self._step(time)
+        return self.water_rows[step], self.water_subpixels[step]
+
+    def sea_level(self, time: float) -> float:
+        """Return the global mean sea level at the given time, in mm, from the same table as
+        the water line (see set_curve).
+
+        Preconditions:
+            - self.sea_levels is not None
+        """
+        return float(self.sea_levels[self._step(time)])
+
+    def _step(self, time: float) -> int:
+        """Return the step of the smooth water line table closest to the given time."""
+        return min(max(round((time - self._curve_start) * STEPS_PER_YEAR), 0),
+                   len(self.sea_levels) - 1)
+
+
+def load_scenes(filename: Optional[str] = None) -> List[Scene]:
+    """Return the built-in scenes, followed by the scenes described by the json file with
+    the given filename, if there is one.
+
+    The image paths of the built-in scenes are relative to the folder of this file, so the
+    program can be run from any folder; those of the json file are relative to the current
+    folder.
+    """
+    scenes = [Scene.from_dict(description, FOLDER) for description in DEFAULT_SCENES]
+    if filename is not None:
+        with open(filename) as file:
+            scenes.extend(Scene.from_dict(description) for description in json.load(file))
+    return scenes
+
+
+def button_layout(scenes: List[Scene], size: Tuple[int, int],
+                  top: int = 250) -> List[Tuple[int, int, int, int]]:
+    """Return the centre, width and height of the home screen button of each scene.
+
+    If every scene has a button position, the buttons are 275 by 75 pixels at those
+    positions. Otherwise, all the buttons are placed in a grid below top, in two columns, or
+    three if there are more than 8 scenes.
+    """
+    if all(scene.button is not None for scene in scenes):
+        return [(scene.button[0], scene.button[1], 275, 75) for scene in scenes]
+
+    columns = 2 if len(scenes) <= 8 else 3
+    rows = -(-len(scenes) // columns)
+    column_width = size[0] // columns
+    row_height = (size[1] - top) // rows
+    return [(column_width * (i % columns) + column_width // 2,
+             top + row_height * (i // columns) + row_height // 2,
+             column_width - 25, min(75, row_height - 10)) for i in range(len(scenes))]
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['json', 'os', 'numpy', 'Dict', 'List', 'Optional', 'Sequence', 'Tuple',
+                          'assets'],
+        'allowed-io': ['load_scenes'],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })
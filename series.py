@@ -0,0 +1,154 @@
+"""
+This file contains the SeaLevelSeries class, the data type passed between all the
+computations of the program.
+
+A series stores its years and global mean sea level values in contiguous numpy arrays
+instead of a dictionary with string keys, so every computation can work on the whole
+series at once. The to_dict and from_dict methods convert to and from the dictionaries
+used by the original version of the program, and a series can also be indexed by their
+string keys (e.g. data['2020']).
+
+This file is Copyright (c) 2020 Yousuf Hassan, Aaditya Mandal, Faraz Hossein, and Dinkar Verma.
+"""
+
+from typing import Dict, List, Optional, Union
+import numpy as np
+
+
+class SeaLevelSeries:
+    """A sequence of global mean sea level values ordered by time.
+
+    A series either holds raw altimetry samples, in which case times holds the decimal year
+    of each sample, or one value per whole year, in which case times is None.
+
+    The values are either one global mean sea level per entry (a 1-D array), or a row of
+    values per entry (a 2-D array), e.g. the contribution of each factor for that year.
+
+    Instance Attributes:
+        - years: the whole year of each entry
+        - values: the global mean sea level (in mm) of each entry
+        - times: the decimal year of each entry, or None if the series is annual
+
+    Representation Invariants:
+        - self.years.ndim == 1
+        - len(self.values) == len(self.years)
+        - self.times is None or self.times.shape == self.years.shape
+    """
+    years: np.ndarray
+    values: np.ndarray
+    times: Optional[np.ndarray]
+
+    def __init__(self, years: np.ndarray, values: np.ndarray,
+                 times: Optional[np.ndarray] = None) -> None:
+        """Initialize a new series from the given arrays.
+
+        Preconditions:
+            - len(years) == len(values)
+            - times is None or len(times) == len(years)
+        """
+        self.years = np.asarray(years, dtype=np.int64)
+        self.values = np.asarray(values, dtype=np.float64)
+        self.times = None if times is None else np.asarray(times, dtype=np.float64)
+
+    @classmethod
+    def from_samples(cls, times: np.ndarray, values: np.ndarray) -> 'SeaLevelSeries':
+        """Return a series of raw samples taken at the given decimal years."""
+        times = np.asarray(times, dtype=np.float64)
+        return cls(np.floor(times), values, times)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Union[float, List[float]]]) -> 'SeaLevelSeries':
+        """Return a series containing the same data as a dictionary mapping years to values.
+
+        If every key is a whole year (e.g. '2020'), the series is annual. Otherwise the keys
+        are treated as the decimal years of raw samples (e.g. '2020.0417').
+        """
+        keys = list(data)
+        values = [data[key] for key in keys]
+        if all('.' not in key for key in keys):
+            return cls(np.array([int(key) for key in keys], dtype=np.int64), values)
+        else:
+            return cls.from_samples(np.array([float(key) for key in keys]), values)
+
+    def to_dict(self) -> Dict[str, Union[float, List[float]]]:
+        """Return a dictionary mapping each year (as a string) to its value.
+
+        Raw samples are keyed by their decimal year with 4 decimal places, the same format
+        as the dataset.
+        """
+        if self.times is None:
+            keys = [str(year) for year in self.years.tolist()]
+        else:
+            keys = ['{:.4f}'.format(time) for time in self.times.tolist()]
+        return dict(zip(keys, self.values.tolist()))
+
+    def value_at(self, year: int) -> Union[float, np.ndarray]:
+        """Return the value of the given whole year.
+
+        If the series holds more than one entry for the year, the last one is returned.
+        Raise a KeyError if the year is not in the series.
+        """
+        matches = np.flatnonzero(self.years == year)
+        if len(matches) == 0:
+            raise KeyError(year)
+        return self.values[matches[-1]]
+
+    def __getitem__(self, key: Union[int, str]) -> Union[float, np.ndarray]:
+        """Return the value of the given whole year, or of the given key of self.to_dict().
+
+        A whole year (e.g. 2020) is the same as self.value_at(year). A string key is looked up
+        like in the dictionaries of the original version of the program: '2020' is the year
+        2020, and for raw samples, '2020.0417' is the sample at that decimal year. Raise a
+        KeyError if there is no such entry.
+        """
+        if not isinstance(key, str):
+            return self.value_at(key)
+        index = self._index(key)
+        if index is None:
+            raise KeyError(key)
+        return self.values[index]
+
+    def __contains__(self, key: Union[int, str]) -> bool:
+        """Return whether the given whole year or key of self.to_dict() is in this series (see
+        __getitem__).
+        """
+        if not isinstance(key, str):
+            return bool(np.any(self.years == key))
+        return self._index(key) is not None
+
+    def _index(self, key: str) -> Optional[int]:
+        """Return the index of the last entry with the given key of self.to_dict(), or None if
+        there is none.
+        """
+        try:
+            number = float(key)
+        except ValueError:
+            return None
+        if '.' not in key:
+            matches = np.flatnonzero(self.years == number)
+        elif self.times is not None:
+            matches = np.flatnonzero(np.round(self.times, 4) == np.round(number, 4))
+        else:
+            return None
+        return int(matches[-1]) if len(matches) > 0 else None
+
+    def __len__(self) -> int:
+        """Return the number of entries in this series."""
+        return len(self.years)
+
+    def __repr__(self) -> str:
+        """Return a string representation of this series."""
+        if len(self) == 0:
+            return 'SeaLevelSeries([])'
+        return 'SeaLevelSeries({} entries, {}-{})'.format(len(self), self.years[0],
+                                                          self.years[-1])
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['numpy', 'Dict', 'List', 'Optional', 'Union'],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })
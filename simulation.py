@@ -4,25 +4,49 @@ This file is responsible for the pygame simulation component of the program.
 This file is Copyright (c) 2020 Aaditya Mandal, Faraz Hossein, Dinkar Verma, and Yousuf Hassan.
 """
 
-import pygame
+import argparse
+import os
 import sys
-import time
-from computations import read_csv, mean_sea_level_change, predict_2021_2080, predict_2081_2100,\
-    combine_data
-from typing import Tuple
-import python_ta
+from typing import Dict, Optional, Sequence, Tuple
 
+# The environment variables that turn on the frame timing when the program is started (see
+# main): the trace file, and whether to show the overlay ('1') or not ('0' or unset).
+TRACE_VARIABLE = 'SLR_TRACE'
+HUD_VARIABLE = 'SLR_HUD'
 
-def run_simulation() -> None:
+
+def run_simulation(scene_file: Optional[str] = None, trace_file: Optional[str] = None,
+                   hud: bool = False, fit: Optional[str] = None) -> None:
     """This function runs the pygame simulation component of the program.
+
+    The scenes are the built-in scenes of scenes.py, followed by those described by the json
+    file scene_file, if it is given. The sea level is projected with the published rates, or
+    with the rates of the given fit ('linear' or 'quadratic') to the samples of the dataset
+    (see frames.load_levels).
+
+    If trace_file is given or hud is True, the phases of every frame are timed (see
+    profiling.py): the percentiles of each phase of each scene are printed when the window is
+    closed, and written with every frame to trace_file if it is given. If hud is True, the
+    frames per second and the slowest phase are shown in the bottom left corner.
+
+    pygame is only imported here, when the window is opened, so the other modules of the
+    program can import this one without loading it.
     """
+    from contextlib import nullcontext
+    import pygame
+    from assets import AssetManager
+    from controls import YearController
+    from frames import SceneFrames, load_fonts, load_levels, prerender_labels, scene_assets
+    from profiling import FrameProfiler
+    from rendering import TextCache
+    from scenes import button_layout, load_scenes
+
     pygame.init()  # Initializing pygame
 
     # Setting variables for various RGB colours
     light_grey = (201, 201, 201)
     black = (0, 0, 0)
     light_blue = (151, 203, 255)
-    white = (255, 255, 255)
     # WATER = (51, 187, 255)
     # RED = (255, 0, 0)
 
@@ -33,50 +57,60 @@ def run_simulation() -> None:
     size = (screenwidth, screenheight)
     screen = pygame.display.set_mode(size)
 
-    # Loading in all images
-    image = pygame.image.load('Images/male.png')
-    female = pygame.image.load('Images/female.png')
-    venice = pygame.image.load('Images/venice2.jpeg')
-    new_york = pygame.image.load('Images/newyork.jpg')
-    amsterdam = pygame.image.load('Images/Amsterdam.png')
-    ocean = pygame.image.load('Images/realocean.jpg')
-    sky = pygame.image.load('Images/sky.jpg')
-    water = pygame.image.load('Images/ocean.png')
-    home_screen = pygame.image.load('Images/homescreenimage.jpg')
-
-    # Transforming various image sizes
-    real_ocean = pygame.transform.scale(ocean, (600, 178))
-    female1 = pygame.transform.scale(female, (600, 550))
-    sky_1 = pygame.transform.scale(sky, (600, 600))
-    home_screen1 = pygame.transform.scale(home_screen, (600, 600))
-    new_york1 = pygame.transform.scale(new_york, (600, 600))
-    amsterdam1 = pygame.transform.scale(amsterdam, (600, 600))
+    # The images are only loaded when the scene that draws them is first entered, already
+    # scaled and converted to the pixel format of the display.
+    scenes = load_scenes(scene_file)
+    assets = AssetManager(*scene_assets(scenes))
 
     # Setting up font and pygame display caption
-    font = pygame.font.SysFont('arial', 30)
-    font2 = pygame.font.SysFont('cambria', 50)
-    font3 = pygame.font.SysFont('arial', 15)
+    fonts = load_fonts()
+    font = fonts['label']
+    font2 = fonts['title']
     pygame.display.set_caption("Sea Level Rise Simulator")
 
-    # Organizing the yearly data
-    data = read_csv('Datasets/global_mean_sea_level.csv')
-    data_1993_2020 = mean_sea_level_change(data)
-    data_2021_2080 = predict_2021_2080(data_1993_2020['2020'])
-    data_2081_2100 = predict_2081_2100(data_2021_2080['2080'])
-    data = combine_data(data_1993_2020, data_2021_2080, data_2081_2100)
-    scale_human_data = {}
-    scale_venice_data = {}
-    scale_newyork_data = {}
-    scale_amsterdam_data = {}
-
-    # Scaling data to fit visual models
-    for i in data:
-        scale_human_data[i] = data[i] / 3
-        scale_venice_data[i] = data[i] / 13
-        scale_newyork_data[i] = data[i] / 60
-        scale_amsterdam_data[i] = data[i] / 20
-
-    current_year = 1993
+    # Every text is only rendered once. The label of every year is rendered now, so changing
+    # the year never has to render text.
+    text_cache = TextCache()
+    prerender_labels(text_cache, font)
+
+    # Organizing the data: for the water to rise smoothly between years, each scene calculates
+    # its water line along the curve through the raw samples and the projections, and sorts
+    # the cells it floods, when it is first shown.
+    curve_times, curve_levels = load_levels(fit=fit)
+    water_edges = {}
+    flood_overlays = {}
+
+    # The year shown moves according to the time each frame takes, so the loops never wait
+    # for it. Holding an arrow key moves it faster and faster; space starts auto-play.
+    year_control = YearController(1993, 2100)
+    frame_seconds = 0.0
+
+    # Timing the phases of every frame, if asked to
+    profiler = FrameProfiler(hud=hud) if trace_file is not None or hud else None
+    hud_font = fonts['caption']
+    hud_image = None
+
+    def measure(phase: str):
+        """Return a context manager timing its body as the given phase of the frame, if the
+        frames are timed."""
+        return nullcontext() if profiler is None else profiler.measure(phase)
+
+    def update_hud() -> None:
+        """Render the overlay again if its text changed."""
+        nonlocal hud_image
+        text = profiler.hud_text()
+        if text is not None:
+            hud_image = hud_font.render(text, True, (255, 255, 255), (0, 0, 0)).convert()
+
+    def quit_simulation() -> None:
+        """Close the window and end the program, reporting the frame times if they were
+        timed."""
+        if profiler is not None:
+            print(profiler.report())
+            if trace_file is not None:
+                profiler.dump(trace_file)
+        pygame.quit()
+        sys.exit()
 
     class Button:
         """A class representing a clickable button in the pygame display.
@@ -88,6 +122,7 @@ def run_simulation() -> None:
             - width: The width of the button
             - height: The height of the button
             - name: The name displayed on the button
+            - images: A dictionary mapping each colour the button has been drawn in to its image
 
         Representation Invariants:
             - len(self.color) == 3
@@ -103,6 +138,7 @@ def run_simulation() -> None:
         width: int
         height: int
         name = str
+        images: Dict[Tuple[int, int, int], pygame.Surface]
 
         def __init__(self, color: Tuple[int, int, int], x: float, y: float, width: int, height: int,
                      name: str) -> None:
@@ -122,16 +158,30 @@ def run_simulation() -> None:
             self.width = width
             self.height = height
             self.name = name
+            self.images = {}
 
         def draw(self, window) -> None:
             """method to draw the button on the screen"""
             pygame.draw.rect(window, self.color, (self.x, self.y, self.width, self.height), 0)
             if self.name != '':
-                text1 = font.render(self.name, True, (0, 0, 0))
+                text1 = text_cache.render(font, self.name, (0, 0, 0))
                 screen.blit(text1, (
                     self.x + (self.width / 2 - text1.get_width() / 2),
                     self.y + (self.height / 2 - text1.get_height() / 2)))
 
+        def image(self) -> pygame.Surface:
+            """Return an image of the button in its current colour, drawn the first time it
+            is needed in that colour."""
+            if self.color not in self.images:
+                self.images[self.color] = pygame.Surface((self.width, self.height)).convert()
+                self.images[self.color].fill(self.color)
+                if self.name != '':
+                    text1 = text_cache.render(font, self.name, (0, 0, 0))
+                    self.images[self.color].blit(text1, (
+                        self.width / 2 - text1.get_width() / 2,
+                        self.height / 2 - text1.get_height() / 2))
+            return self.images[self.color]
+
         def over_button(self, position) -> bool:
             """Determine whether position of mouse is over the button or not"""
             if self.x < position[0] < self.x + self.width:
@@ -140,414 +190,175 @@ def run_simulation() -> None:
 
             return False
 
-    # Setting main and homeScreen to True to begin pygame loops
-    main = True
-    home_screen = True
-    demo = False
-    simulation_venice = False
-    simulation_two = False
-    simulation_three = False
-    # simulationFour = False
-
     # The clock will be used to control how fast the screen updates
     clock = pygame.time.Clock()
 
-    # Creating four instances of button class which will appear on the home screen
-    button1 = Button(light_grey, screenwidth / 4, screenheight / 2, 275, 75, 'Human Simulation')
-    button2 = Button(light_grey, screenwidth * (3 / 4), 400, 275, 75, 'Venice Simulation')
-    button3 = Button(light_grey, screenwidth * (3 / 4), screenheight / 2, 275, 75,
-                     'New York Simulation')
-    button4 = Button(light_grey, screenwidth / 4, 400, 275, 75, 'Amsterdam Simulation')
+    # Creating a button for every scene on the home screen, and the back button of the scenes
+    buttons = [Button(light_grey, x, y, width, height, scene.title)
+               for scene, (x, y, width, height)
+               in zip(scenes, button_layout(scenes, (screenwidth, screenheight)))]
+    back_button = Button(light_grey, 50, 25, 100, 50, 'Back')
 
-    # Creating four instances of button class which are back buttons
-    demo_back_button = Button(light_grey, 50, 25, 100, 50, 'Back')
-    venice_back_button = Button(light_grey, 50, 25, 100, 50, 'Back')
-    newyork_back_button = Button(light_grey, 50, 25, 100, 50, 'Back')
-    amsterdam_back_button = Button(light_grey, 50, 25, 100, 50, 'Back')
+    # The scene shown, or None for the home screen
+    scene = None
 
     # Main pygame loop
-    while main is True:
-        for event in pygame.event.get():
-            # pos = pygame.mouse.get_pos()
-            if event.type == pygame.QUIT:
-                # Main = False
-                pygame.quit()
-                sys.exit()
-
+    while True:
         # Home screen loop
-        while home_screen is True:
-            display_surface.blit(home_screen1, (0, 0))
-            button1.draw(display_surface)
-            button2.draw(display_surface)
-            button3.draw(display_surface)
-            button4.draw(display_surface)
-            title_text = font2.render('Sea Level Rise Simulator', True, black)
-            title_text_rect = title_text.get_rect(center=(screenwidth / 2, 125))
-            screen.blit(title_text, title_text_rect)
+        images = assets.enter_scene('home')
+        while scene is None:
+            if profiler is not None:
+                profiler.start_frame('home')
+            with measure('background'):
+                display_surface.blit(images['home_screen'], (0, 0))
+            with measure('text'):
+                for button in buttons:
+                    button.draw(display_surface)
+                title_text = text_cache.render(font2, 'Sea Level Rise Simulator', black)
+                title_text_rect = title_text.get_rect(center=(screenwidth / 2, 125))
+                screen.blit(title_text, title_text_rect)
+            if hud:
+                with measure('hud'):
+                    update_hud()
+                    if hud_image is not None:
+                        screen.blit(hud_image, (5, screenheight - hud_image.get_height() - 5))
 
             # Main event loop
-            for event in pygame.event.get():  # User did something
+            with measure('events'):
+                events = pygame.event.get()
+            for event in events:  # User did something
                 pos = pygame.mouse.get_pos()
 
                 if event.type == pygame.QUIT:  # If user clicked close
-                    # homeScreen = False  # Flag that we are done so we exit this loop
-                    pygame.quit()
-                    sys.exit()
+                    quit_simulation()
 
                 # Switching screens based on which button the user clicks
                 if event.type == pygame.MOUSEBUTTONDOWN:
-                    if button1.over_button(pos) is True:
-                        home_screen = False
-                        demo = True
-                    if button2.over_button(pos) is True:
-                        home_screen = False
-                        simulation_venice = True
-                    if button3.over_button(pos) is True:
-                        home_screen = False
-                        simulation_two = True
-                    if button4.over_button(pos) is True:
-                        home_screen = False
-                        simulation_three = True
+                    for button, button_scene in zip(buttons, scenes):
+                        if button.over_button(pos) is True:
+                            scene = button_scene
 
                 # Highlighting the buttons to light blue if motion is detected over the buttons
                 if event.type == pygame.MOUSEMOTION:
-                    if button1.over_button(pos) is True:
-                        button1.color = light_blue
-                    elif button2.over_button(pos) is True:
-                        button2.color = light_blue
-                    elif button3.over_button(pos) is True:
-                        button3.color = light_blue
-                    elif button4.over_button(pos) is True:
-                        button4.color = light_blue
-                    else:
-                        button1.color = light_grey
-                        button2.color = light_grey
-                        button3.color = light_grey
-                        button4.color = light_grey
+                    for button in buttons:
+                        if button.over_button(pos) is True:
+                            button.color = light_blue
+                        else:
+                            button.color = light_grey
 
             # Updating the screen with everything drawn
-            pygame.display.flip()
+            with measure('update'):
+                pygame.display.flip()
 
             # Limit to 60 frames per second
-            clock.tick(60)
-
-        # Human Simulation loop
-        while demo is True:
-            display_surface.blit(sky_1, (0, 0))
-            demo_back_button.draw(display_surface)
-
-            # Main event loop
-            for event in pygame.event.get():  # User did something
-                pos = pygame.mouse.get_pos()
-
-                if event.type == pygame.QUIT:  # If user clicked close
-                    # Demo = False  # Flag that we are done so we exit this loop
-                    pygame.quit()
-                    sys.exit()
-
-                # Switching screens based on which button the user clicks
-                if event.type == pygame.MOUSEBUTTONDOWN:
-                    if demo_back_button.over_button(pos) is True:
-                        demo = False
-                        home_screen = True
-                        current_year = 1993
-
-                # Highlighting the buttons to light blue if motion is detected over the buttons
-                if event.type == pygame.MOUSEMOTION:
-                    if demo_back_button.over_button(pos) is True:
-                        demo_back_button.color = light_blue
-                    else:
-                        demo_back_button.color = light_grey
-
-            # Increasing and decreasing water levels
-            water_height = 600
-            keys = pygame.key.get_pressed()
-            if 1993 < current_year < 2100:
-                if keys[pygame.K_LEFT]:
-                    current_year += -1
-                    time.sleep(0.1)
-                if keys[pygame.K_RIGHT]:
-                    current_year += 1
-                    time.sleep(0.1)
-
-            if current_year == 2100:
-                if keys[pygame.K_LEFT]:
-                    current_year += -1
-                    time.sleep(0.1)
-
-            if current_year == 1993:
-                if keys[pygame.K_RIGHT]:
-                    current_year += 1
-                    time.sleep(0.1)
-
-            # Changing the year indicator
-            year_label = font.render(('Year: ' + str(current_year)), True, black, light_grey)
-            year_text_rect = year_label.get_rect()
-            year_text_rect.center = (540, 15)
-            display_surface.blit(year_label, year_text_rect)
-
-            # Displaying male and female model
-            display_surface.blit(image, (100, 28))
-            display_surface.blit(female1, (100, 70))
-
-            year_string = str(current_year)
-
-            # Increment the scale based on number of years
-            scale_factor = (water_height - int(scale_human_data[year_string]))
-
-            # Display correct position of water
-            display_surface.blit(water, (0, scale_factor))
-
-            # Line at bottom
-            pygame.draw.line(display_surface, black, (0, 800), (1000, 800), 3)
-
-            # Drawing human heights on screen
-            human_height_text = font.render('5\'9', True, black)
-            human_height_text_rect = human_height_text.get_rect(center=(196, 14))
-            female_height_text = font.render('5\'3', True, black)
-            female_height_text_rect = female_height_text.get_rect(center=(400, 76))
-            screen.blit(human_height_text, human_height_text_rect)
-            screen.blit(female_height_text, female_height_text_rect)
-
-            pygame.display.flip()
-
-            # Limit to 60 frames per second
-            clock.tick(15)
-
-        # Venice Simulation loop
-        while simulation_venice is True:
-            display_surface.fill(white)
-
-            # Main event loop
-            for event in pygame.event.get():  # User did something
-                pos = pygame.mouse.get_pos()
-
-                if event.type == pygame.QUIT:  # If user clicked close
-                    # simulationVenice = False  # Flag that we are done so we exit this loop
-                    pygame.quit()
-                    sys.exit()
-
-                # Switching screens based on which button the user clicks
-                if event.type == pygame.MOUSEBUTTONDOWN:
-                    if venice_back_button.over_button(pos) is True:
-                        simulation_venice = False
-                        home_screen = True
-                        current_year = 1993
-
-                # Highlighting the buttons to light blue if motion is detected over the buttons
-                if event.type == pygame.MOUSEMOTION:
-                    if venice_back_button.over_button(pos) is True:
-                        venice_back_button.color = light_blue
-                    else:
-                        venice_back_button.color = light_grey
-
-            water_height = 535
-            display_surface.blit(venice, (-200, 0))
-            newyork_back_button.draw(display_surface)
-            keys = pygame.key.get_pressed()
-
-            # Increasing year indicator
-            if 1993 < current_year < 2100:
-                if keys[pygame.K_LEFT]:
-                    current_year += -1
-                    time.sleep(0.1)
-                if keys[pygame.K_RIGHT]:
-                    current_year += 1
-                    time.sleep(0.1)
-
-            if current_year == 2100:
-                if keys[pygame.K_LEFT]:
-                    current_year += -1
-                    time.sleep(0.1)
-
-            if current_year == 1993:
-                if keys[pygame.K_RIGHT]:
-                    current_year += 1
-                    time.sleep(0.1)
+            frame_seconds = clock.tick(60) / 1000
 
-            # Code to change the years
-            year_label = font.render(('Year: ' + str(current_year)), True, black, light_grey)
-            year_text_rect = year_label.get_rect()
-            year_text_rect.center = (540, 15)
-            display_surface.blit(year_label, year_text_rect)
+        # Scene loop: the static images are drawn once, then only what changes is redrawn
+        frames = SceneFrames(display_surface, scene, assets.enter_scene(scene.name), text_cache,
+                             fonts, (curve_times, curve_levels), water_edges, flood_overlays)
+        back_button.color = light_grey
 
-            year_string = str(current_year)
-
-            # Increment the scale based on number of years
-            scale_factor = (water_height - int(scale_venice_data[year_string]))
-
-            # Display correct position of water
-            display_surface.blit(real_ocean, (0, scale_factor))
-
-            venice_back_button.draw(display_surface)
-
-            # Updating everything we have drawn
-            pygame.display.flip()
-
-            # Limit to 60 frames per second
-            clock.tick(60)
-
-        # New york simulation loop
-        while simulation_two is True:
-            display_surface.fill(white)
+        while scene is not None:
+            if profiler is not None:
+                profiler.start_frame(scene.name)
 
             # Main event loop
-            for event in pygame.event.get():  # User did something
+            with measure('events'):
+                events = pygame.event.get()
+            for event in events:  # User did something
                 pos = pygame.mouse.get_pos()
 
                 if event.type == pygame.QUIT:  # If user clicked close
-                    # simulationTwo = False  # Flag that we are done so we exit this loop
-                    pygame.quit()
-                    sys.exit()
+                    quit_simulation()
 
-                # Switching screens based on which button the user clicks
+                # Going back to the home screen if the user clicks the back button
                 if event.type == pygame.MOUSEBUTTONDOWN:
-                    if newyork_back_button.over_button(pos) is True:
-                        simulation_two = False
-                        home_screen = True
-                        current_year = 1993
+                    if back_button.over_button(pos) is True:
+                        scene = None
+                        year_control.reset()
 
                 # Highlighting the buttons to light blue if motion is detected over the buttons
                 if event.type == pygame.MOUSEMOTION:
-                    if newyork_back_button.over_button(pos) is True:
-                        newyork_back_button.color = light_blue
+                    if back_button.over_button(pos) is True:
+                        back_button.color = light_blue
                     else:
-                        newyork_back_button.color = light_grey
-
-            water_height = 532
-            display_surface.blit(new_york1, (0, 0))
-            newyork_back_button.draw(display_surface)
-            keys = pygame.key.get_pressed()
-
-            # Updating year indicator
-            if 1993 < current_year < 2100:
-                if keys[pygame.K_LEFT]:
-                    current_year += -1
-                    time.sleep(0.08)
-                if keys[pygame.K_RIGHT]:
-                    current_year += 1
-                    time.sleep(0.08)
-
-            if current_year == 2100:
-                if keys[pygame.K_LEFT]:
-                    current_year += -1
-                    time.sleep(0.08)
-
-            if current_year == 1993:
-                if keys[pygame.K_RIGHT]:
-                    current_year += 1
-                    time.sleep(0.08)
-
-            # Code to change the years
-            year_label = font.render(('Year: ' + str(current_year)), True, black, light_grey)
-            year_text_rect = year_label.get_rect()
-            year_text_rect.center = (540, 15)
-            display_surface.blit(year_label, year_text_rect)
-
-            year_string = str(current_year)
-
-            # Increment the scale based on number of years
-            scale_factor = (water_height - int(scale_newyork_data[year_string]))
-
-            # Display correct position of water
-            display_surface.blit(real_ocean, (0, scale_factor))
-
-            if current_year == 2100:
-                title_text = font3.render(
-                    'This may not look like a significant change compared to the size', True, black)
-                title_text_rect = title_text.get_rect(center=(screenwidth / 2, 50))
-                screen.blit(title_text, title_text_rect)
-                title_text2 = font3.render(
-                    'of the Statue of Liberty Island, but throughout time, as the water rises,',
-                    True, black)
-                title_text_rect2 = title_text2.get_rect(center=(screenwidth / 2, 70))
-                screen.blit(title_text2, title_text_rect2)
-                title_text3 = font3.render(
-                    'the water will begin to seep into the concrete foundation and '
-                    'break it down, causing structural damage', True, black)
-                title_text_rect3 = title_text3.get_rect(center=(screenwidth / 2, 90))
-                screen.blit(title_text3, title_text_rect3)
-
-            pygame.display.flip()
+                        back_button.color = light_grey
+
+                # Starting or stopping auto-play
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
+                    year_control.toggle_autoplay()
+
+            if scene is None:
+                break
+
+            with measure('layout'):
+                # Increasing and decreasing water levels
+                keys = pygame.key.get_pressed()
+                year_control.update(frame_seconds, keys[pygame.K_LEFT], keys[pygame.K_RIGHT])
+
+                # Display correct position of water, the year and the captions, and the back
+                # button
+                frames.show(year_control.time)
+                frames.renderer.set_layer('back', back_button.image(),
+                                          (back_button.x, back_button.y))
+            if hud:
+                with measure('hud'):
+                    update_hud()
+                    if hud_image is not None:
+                        frames.renderer.set_layer(
+                            'hud', hud_image, (5, screenheight - hud_image.get_height() - 5))
+
+            # Updating only the parts of the screen that changed
+            if profiler is None:
+                frames.renderer.render()
+            else:
+                timings = {}
+                frames.renderer.render(timings)
+                profiler.add_render(timings)
 
             # Limit to 60 frames per second
-            clock.tick(60)
-
-        # Amsterdam Simulation Loop
-        while simulation_three is True:
-            display_surface.fill(white)
+            frame_seconds = clock.tick(60) / 1000
 
-            # Main event loop
-            for event in pygame.event.get():  # User did something
-                pos = pygame.mouse.get_pos()
-
-                if event.type == pygame.QUIT:  # If user clicked close
-                    # simulationThree = False  # Flag that we are done so we exit this loop
-                    pygame.quit()
-                    sys.exit()
 
-                # Switching screens based on which button the user clicks
-                if event.type == pygame.MOUSEBUTTONDOWN:
-                    if amsterdam_back_button.over_button(pos) is True:
-                        simulation_three = False
-                        home_screen = True
-                        current_year = 1993
-
-                # Highlighting the buttons to light blue if motion is detected over the buttons
-                if event.type == pygame.MOUSEMOTION:
-                    if amsterdam_back_button.over_button(pos) is True:
-                        amsterdam_back_button.color = light_blue
-                    else:
-                        amsterdam_back_button.color = light_grey
-            water_height = 525
-            display_surface.blit(amsterdam1, (0, 0))
-            amsterdam_back_button.draw(display_surface)
-
-            keys = pygame.key.get_pressed()
-            if 1993 < current_year < 2100:
-                if keys[pygame.K_LEFT]:
-                    current_year += -1
-                    time.sleep(0.1)
-                if keys[pygame.K_RIGHT]:
-                    current_year += 1
-                    time.sleep(0.1)
-
-            if current_year == 2100:
-                if keys[pygame.K_LEFT]:
-                    current_year += -1
-                    time.sleep(0.1)
-
-            if current_year == 1993:
-                if keys[pygame.K_RIGHT]:
-                    current_year += 1
-                    time.sleep(0.1)
-
-            # Code to change the years
-            year_label = font.render(('Year: ' + str(current_year)), True, black, light_grey)
-            year_text_rect = year_label.get_rect()
-            year_text_rect.center = (540, 15)
-            display_surface.blit(year_label, year_text_rect)
-
-            year_string = str(current_year)
-
-            # Increment the scale based on number of years
-            scale_factor = (water_height - int(scale_amsterdam_data[year_string]))
-
-            # Display correct position of water
-            display_surface.blit(real_ocean, (0, scale_factor))
-
-            pygame.display.flip()
-
-            # --- Limit to 60 frames per second
-            clock.tick(60)
+def parse_arguments(arguments: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    """Return the options of the simulation given by the command line arguments, or by the
+    environment variables TRACE_VARIABLE and HUD_VARIABLE.
+    """
+    from fitting import DEGREES
+
+    parser = argparse.ArgumentParser(description='Run the sea level rise simulation.')
+    parser.add_argument('--scene-file', help='a json file describing more scenes')
+    parser.add_argument('--trace', default=os.environ.get(TRACE_VARIABLE) or None,
+                        help='time every frame and write the times to this json trace file')
+    parser.add_argument('--hud', action='store_true',
+                        default=os.environ.get(HUD_VARIABLE, '0') not in ('', '0'),
+                        help='show the frames per second and the slowest phase')
+    parser.add_argument('--fit', choices=list(DEGREES),
+                        help='project with the rates fitted to the samples instead of the '
+                             'published rates')
+    return parser.parse_args(arguments)
+
+
+def main(arguments: Optional[Sequence[str]] = None) -> None:
+    """Run the simulation with the options given by the command line arguments (see
+    parse_arguments).
+    """
+    options = parse_arguments(arguments)
+    run_simulation(options.scene_file, options.trace, options.hud, options.fit)
 
 
 if __name__ == '__main__':
-    run_simulation()
+    import python_ta
+
+    main()
 
     python_ta.check_all(config={
-        'extra-imports': ['csv', 'Dict', 'List', 'pprint'],  # the names (strs) of imported modules
-        'allowed-io': ['read_csv'],  # the names (strs) of functions that call print/open/input
+        # the names (strs) of imported modules
+        'extra-imports': ['argparse', 'os', 'sys', 'contextlib', 'pygame', 'Dict', 'Optional',
+                          'Sequence', 'Tuple', 'assets', 'controls', 'fitting', 'frames',
+                          'profiling', 'rendering', 'scenes'],
+        # the names (strs) of functions that call print/open/input
+        'allowed-io': ['quit_simulation'],
         'max-line-length': 100,
         'disable': ['R1705', 'C0200']
     })
@@ -0,0 +1,385 @@
+"""
+This file projects the local relative sea level of many tide-gauge stations at once, without
+opening the pygame simulation.
+
+Each station is a file of monthly mean sea levels in a folder, in the format of the PSMSL
+monthly records: one row per month with its time (as a decimal year) and its level (in mm),
+separated by semicolons or commas, optionally followed by more fields (e.g. the number of
+missing days) that are ignored. Months without a level are written as -99999. A file may
+start with comment lines of the form '#name = value', like the NOAA datasets (see ingest.py).
+
+Every station is corrected for its own vertical land motion, in mm per year (positive when
+the land rises), read from the 'vertical_land_motion' comment line of its file or from a
+metadata file. For each station:
+    1. the monthly levels are aggregated into annual means, keeping only the years with at
+       least MIN_MONTHS months, and the last of them is the base year of the station;
+    2. the climate part of the change since the base year (the change in level once the
+       land motion is taken out) is projected to the end year with a rate schedule (see
+       projection.py), and the land motion is added back to get the relative sea level;
+    3. the climate part is split into the change caused by each factor (see
+       decomposition.py).
+
+The stations are read by worker processes a chunk at a time. A station that cannot be read
+or has no complete year is reported and left out, and the other stations still run. The
+results of every station are written to one folder with one .npy file per column and one
+row per station and year, observed years first:
+
+    station      the number of the station (see stations.json in the same folder)
+    year         the year
+    observed     whether the level is an observed annual mean (True) or projected (False)
+    level        the relative sea level of the year at the station, in mm above its datum
+    land_motion  the change in relative sea level since the base year caused by the
+                 vertical land motion, in mm
+    factor_i     the change in sea level since the base year caused by factor i, in mm
+
+so that level == level of the base year + land_motion + the sum of the factor_i, up to
+rounding. stations.json also lists the stations that failed and why.
+
+Usage:
+    python stations.py gauges -o results
+    python stations.py gauges -o results --metadata gauges/metadata.json \\
+        --schedule 2020:3.3,2080:12 --end-year 2150 --pattern '*.rlrdata.gz'
+
+A metadata file is a json object mapping the name of each station (its file name up to the
+first '.') to an object with the key 'vertical_land_motion'.
+
+This file is Copyright (c) 2020 Yousuf Hassan, Aaditya Mandal, Faraz Hossein, and Dinkar Verma.
+"""
+
+import argparse
+import fnmatch
+import json
+import os
+import sys
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from computations import FACTOR_SHARES
+from decomposition import decompose
+from ingest import open_dataset, parse_rows
+from projection import DEFAULT_SCHEDULE, RateSchedule, accumulate, yearly_changes
+from series import SeaLevelSeries
+from streaming import AnnualAccumulator
+from sweep import create_columns, open_columns, parse_schedule
+
+# The file names of the stations found in a folder by default (PSMSL monthly records).
+PATTERN = '*.rlrdata'
+
+# The level of a month without a level in a station file.
+MISSING_LEVEL = -99999
+
+# The number of months a year must have for its annual mean to be kept (as PSMSL does).
+MIN_MONTHS = 11
+
+# The number of stations each task sent to a worker process runs.
+CHUNK_SIZE = 32
+
+
+class StationRecord:
+    """The annual mean sea levels of a tide-gauge station.
+
+    Instance Attributes:
+        - name: the name of the station, its file name up to the first '.'
+        - filename: the file the station was read from
+        - land_motion: the vertical land motion of the station, in mm per year (positive
+          when the land rises)
+        - annual: the relative sea level of each year with at least MIN_MONTHS months
+
+    Representation Invariants:
+        - len(self.annual.years) > 0
+    """
+    name: str
+    filename: str
+    land_motion: float
+    annual: SeaLevelSeries
+
+    def __init__(self, name: str, filename: str, land_motion: float,
+                 annual: SeaLevelSeries) -> None:
+        """Initialize a new station record."""
+        self.name = name
+        self.filename = filename
+        self.land_motion = land_motion
+        self.annual = annual
+
+    def base_year(self) -> int:
+        """Return the last year of this station with an annual mean."""
+        return int(self.annual.years[-1])
+
+
+def station_name(filename: str) -> str:
+    """Return the name of the station stored in the file with the given filename."""
+    return os.path.basename(filename).split('.')[0]
+
+
+def discover_stations(folder: str, pattern: str = PATTERN) -> List[str]:
+    """Return the sorted filenames of the station files in folder matching pattern."""
+    names = sorted(name for name in os.listdir(folder) if fnmatch.fnmatch(name, pattern))
+    return [os.path.join(folder, name) for name in names
+            if os.path.isfile(os.path.join(folder, name))]
+
+
+def load_metadata(filename: Optional[str]) -> Dict[str, float]:
+    """Return a dictionary mapping the name of each station of the metadata file with the given
+    filename to its vertical land motion, or an empty dictionary if filename is None.
+    """
+    if filename is None:
+        return {}
+    with open(filename) as file:
+        metadata = json.load(file)
+    return {name: float(station['vertical_land_motion']) for name, station in metadata.items()
+            if 'vertical_land_motion' in station}
+
+
+def read_station(filename: str, land_motion: Optional[float] = None,
+                 min_months: int = MIN_MONTHS) -> StationRecord:
+    """Read the station file with the given filename and return its annual means. The file
+    may be gzip compressed.
+
+    The vertical land motion is land_motion if it is given, otherwise the one in the file's
+    comment lines, otherwise 0.
+
+    Raise a ValueError if the file cannot be parsed, has fewer than two columns or has no year
+    with min_months months, and an OSError, EOFError or zlib.error if it cannot be read or
+    decompressed.
+    """
+    with open_dataset(filename) as file:
+        contents = file.read()
+
+    header = {}
+    rows = []
+    for line in contents.replace(b';', b',').splitlines():
+        if line.startswith(b'#'):
+            name, _, value = line[1:].decode().partition('=')
+            header[name.strip()] = value.strip()
+        elif line.strip() != b'':
+            rows.append(line)
+    if not rows:
+        raise ValueError('the station has no monthly levels')
+
+    num_columns = rows[0].count(b',') + 1
+    if num_columns < 2:
+        raise ValueError('the station has a single column, but needs a time and a level')
+    table = parse_rows(b'\n'.join(rows), num_columns)
+    times, levels = table[:, 0], table[:, 1]
+    present = ~np.isnan(times) & ~np.isnan(levels) & (levels != MISSING_LEVEL)
+
+    accumulator = AnnualAccumulator()
+    accumulator.add(np.floor(times[present]), levels[present])
+    annual = accumulator.means()
+    complete = accumulator.counts[annual.years - accumulator.first_year] >= min_months
+    if not np.any(complete):
+        raise ValueError('the station has no year with {} monthly levels'.format(min_months))
+
+    if land_motion is None:
+        land_motion = float(header.get('vertical_land_motion', 0.0))
+    return StationRecord(station_name(filename), filename, land_motion,
+                         SeaLevelSeries(annual.years[complete], annual.values[complete]))
+
+
+def run_stations(filenames: Sequence[str], output: str,
+                 schedule: RateSchedule = DEFAULT_SCHEDULE,
+                 shares: Sequence[float] = FACTOR_SHARES, end_year: int = 2100,
+                 land_motions: Optional[Dict[str, float]] = None,
+                 min_months: int = MIN_MONTHS, workers: Optional[int] = None,
+                 chunk_size: int = CHUNK_SIZE,
+                 progress: Optional[Callable[[int, int, int], None]] = None
+                 ) -> Tuple[int, Dict[str, str]]:
+    """Project every station of the given station files to end_year, write the results to
+    the folder output, and return the number of rows written and a dictionary mapping the
+    filename of each station that failed to why.
+
+    land_motions maps the names of stations to their vertical land motion, overriding their
+    files. After each chunk of stations is read, progress (if given) is called with the
+    number of stations read so far, the total number of stations and the number that failed.
+
+    The stations are run by the given number of worker processes (by default, one per CPU).
+    """
+    shares = np.asarray(shares, dtype=np.float64)
+    read_tasks = [([(filename, (land_motions or {}).get(station_name(filename)))
+                    for filename in filenames[start:start + chunk_size]], min_months)
+                  for start in range(0, len(filenames), chunk_size)]
+
+    if workers == 1 or len(read_tasks) <= 1:
+        return _run_tasks(map, read_tasks, output, schedule, shares, end_year, chunk_size,
+                          progress)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return _run_tasks(executor.map, read_tasks, output, schedule, shares, end_year,
+                          chunk_size, progress)
+
+
+def _run_tasks(map_tasks: Callable, read_tasks: List[Tuple], output: str,
+               schedule: RateSchedule, shares: np.ndarray, end_year: int, chunk_size: int,
+               progress: Optional[Callable[[int, int, int], None]]
+               ) -> Tuple[int, Dict[str, str]]:
+    """Read the stations of read_tasks, then project them and write the results to output.
+    Each task is run with map_tasks: map, or the map method of a ProcessPoolExecutor.
+    """
+    total = sum(len(stations) for stations, _ in read_tasks)
+    records, failures = [], {}
+    for chunk_records, chunk_failures in map_tasks(_read_chunk, read_tasks):
+        records.extend(chunk_records)
+        failures.update(chunk_failures)
+        if progress is not None:
+            progress(len(records) + len(failures), total, len(failures))
+
+    for record in records:
+        if record.base_year() >= end_year:
+            failures[record.filename] = 'the base year {} is not before the end year {}'.format(
+                record.base_year(), end_year)
+    records = [record for record in records if record.base_year() < end_year]
+
+    lengths = [len(record.annual.years) + end_year - record.base_year() for record in records]
+    offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+    create_columns(output, int(offsets[-1]), _column_types(len(shares)))
+    _write_stations(output, records, offsets, failures, schedule, shares, end_year)
+
+    write_tasks = [(records[start:start + chunk_size], start, offsets, output, schedule,
+                    shares, end_year) for start in range(0, len(records), chunk_size)]
+    for _ in map_tasks(_write_chunk, write_tasks):
+        pass
+
+    return int(offsets[-1]), failures
+
+
+def _read_chunk(task: Tuple) -> Tuple[List[StationRecord], Dict[str, str]]:
+    """Read the stations of a chunk, and return the records of the stations that were read and
+    a dictionary mapping the filename of each station that failed to why.
+    """
+    stations, min_months = task
+    records, failures = [], {}
+    for filename, land_motion in stations:
+        try:
+            records.append(read_station(filename, land_motion, min_months))
+        except (OSError, EOFError, ValueError, zlib.error) as error:
+            failures[filename] = '{}: {}'.format(_error_name(error), error)
+    return records, failures
+
+
+def _error_name(error: Exception) -> str:
+    """Return the name of the type of error, with its module unless it is built in (e.g.
+    'ValueError' or 'zlib.error').
+    """
+    error_type = type(error)
+    if error_type.__module__ == 'builtins':
+        return error_type.__name__
+    return error_type.__module__ + '.' + error_type.__name__
+
+
+def _write_chunk(task: Tuple) -> None:
+    """Project the stations of a chunk and write their rows to the columns of the output."""
+    records, first, offsets, output, schedule, shares, end_year = task
+    columns = open_columns(output, _column_types(len(shares)))
+
+    # The climate part of the projected change since a base year is the same for every
+    # station with that base year.
+    climates = {}
+    for base_year in set(record.base_year() for record in records):
+        changes = yearly_changes([schedule], np.arange(base_year + 1, end_year + 1))
+        climates[base_year] = accumulate(changes, 0.0, decimals=None)[0, 1:]
+
+    for i, record in enumerate(records, first):
+        observed, base_year = record.annual, record.base_year()
+        years = np.concatenate([observed.years, np.arange(base_year + 1, end_year + 1)])
+        land_motion = -record.land_motion * (years - base_year)
+        base_level = observed.values[-1]
+        climate = np.concatenate([observed.values - base_level - land_motion[:len(observed)],
+                                  climates[base_year]])
+        factors = decompose(climate, shares)
+
+        rows = slice(offsets[i], offsets[i + 1])
+        columns['station'][rows] = i
+        columns['year'][rows] = years
+        columns['observed'][rows] = np.arange(len(years)) < len(observed)
+        columns['level'][rows] = np.round(base_level + land_motion + climate, 2)
+        columns['land_motion'][rows] = np.round(land_motion, 2)
+        for factor in range(factors.shape[1]):
+            columns['factor_{}'.format(factor)][rows] = factors[:, factor]
+
+    for column in columns.values():
+        column.flush()
+
+
+def _column_types(num_factors: int) -> Dict[str, type]:
+    """Return a dictionary mapping the name of each output column to its type."""
+    types = {'station': np.int32, 'year': np.int16, 'observed': np.bool_, 'level': np.float64,
+             'land_motion': np.float64}
+    for factor in range(num_factors):
+        types['factor_{}'.format(factor)] = np.float64
+    return types
+
+
+def _write_stations(output: str, records: List[StationRecord], offsets: np.ndarray,
+                    failures: Dict[str, str], schedule: RateSchedule, shares: np.ndarray,
+                    end_year: int) -> None:
+    """Write the parameters of the run, the stations and their rows, and the stations that
+    failed to stations.json in the output folder.
+    """
+    stations = [{'name': record.name, 'file': record.filename,
+                 'vertical_land_motion': record.land_motion, 'base_year': record.base_year(),
+                 'rows': [int(offsets[i]), int(offsets[i + 1])]}
+                for i, record in enumerate(records)]
+    description = {'schedule': {'start_years': schedule.start_years.tolist(),
+                                'rates': schedule.rates.tolist(),
+                                'accelerations': schedule.accelerations.tolist()},
+                   'shares': shares.tolist(), 'end_year': end_year, 'stations': stations,
+                   'failures': [{'name': station_name(filename), 'file': filename, 'error': error}
+                                for filename, error in sorted(failures.items())]}
+    with open(os.path.join(output, 'stations.json'), 'w') as file:
+        json.dump(description, file)
+
+
+def _print_progress(done: int, total: int, failed: int) -> None:
+    """Print how many stations have been read so far to stderr."""
+    print('\rRead {} of {} stations ({} failed)'.format(done, total, failed), end='',
+          file=sys.stderr, flush=True)
+    if done == total:
+        print(file=sys.stderr)
+
+
+def main(arguments: Optional[Sequence[str]] = None) -> int:
+    """Project the stations described by the command line arguments, and return the exit
+    status.
+    """
+    parser = argparse.ArgumentParser(
+        description='Project the relative sea level of a folder of tide-gauge stations.')
+    parser.add_argument('folder', help='the folder of station files')
+    parser.add_argument('-o', '--output', required=True,
+                        help='the folder the results are written to')
+    parser.add_argument('--pattern', default=PATTERN,
+                        help='the pattern the names of the station files match')
+    parser.add_argument('--metadata', help='a json file with the land motion of each station')
+    parser.add_argument('--schedule', type=parse_schedule, default=DEFAULT_SCHEDULE,
+                        help="pieces of the form 'start_year:rate[:acceleration]', "
+                             "separated by commas")
+    parser.add_argument('--shares', help='factor shares separated by commas')
+    parser.add_argument('--end-year', type=int, default=2100)
+    parser.add_argument('--min-months', type=int, default=MIN_MONTHS,
+                        help='the number of months a year needs for its annual mean')
+    parser.add_argument('--workers', type=int, help='the number of worker processes')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--quiet', action='store_true', help='do not report progress')
+    options = parser.parse_args(arguments)
+
+    filenames = discover_stations(options.folder, options.pattern)
+    if not filenames:
+        parser.error('no files in {} match {}'.format(options.folder, options.pattern))
+    shares = FACTOR_SHARES if options.shares is None else [
+        float(share) for share in options.shares.split(',')]
+
+    start = time.perf_counter()
+    num_rows, failures = run_stations(filenames, options.output, options.schedule, shares,
+                                      options.end_year, load_metadata(options.metadata),
+                                      options.min_months, options.workers, options.chunk_size,
+                                      None if options.quiet else _print_progress)
+    for filename, error in sorted(failures.items()):
+        print('{}: {}'.format(filename, error), file=sys.stderr)
+    print('Wrote {} rows for {} stations ({} failed) to {} in {:.2f}s'.format(
+        num_rows, len(filenames) - len(failures), len(failures), options.output,
+        time.perf_counter() - start), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,135 @@
+"""
+This file handles calculating the annual means of datasets too large to be read at once.
+
+Instead of reading the whole dataset, it is read in chunks of rows, and each chunk is added
+to running per-year sums and counts before the next one is read. The memory used depends
+only on the chunk size and the number of years, not on the size of the dataset.
+
+The sums add the samples of each year in the same order as mean_sea_level_change, so the
+annual means are exactly the same as mean_sea_level_change(read_csv(filename)).
+
+This file is Copyright (c) 2020 Yousuf Hassan, Aaditya Mandal, Faraz Hossein, and Dinkar Verma.
+"""
+
+from typing import Iterator, Optional, Tuple
+import numpy as np
+from ingest import (CHUNK_SIZE, AltimetrySamples, iter_row_blocks, open_dataset, parse_rows,
+                    read_header, samples_from_table)
+from series import SeaLevelSeries
+
+
+class AnnualAccumulator:
+    """Running sums and counts of the global mean sea level samples of each year.
+
+    Instance Attributes:
+        - first_year: the year of the 0th entry of sums and counts
+        - sums: the sum of the samples of each year, starting at first_year
+        - counts: the number of samples of each year, starting at first_year
+
+    Representation Invariants:
+        - self.sums.shape == self.counts.shape
+        - all(count >= 0 for count in self.counts)
+    """
+    first_year: int
+    sums: np.ndarray
+    counts: np.ndarray
+
+    def __init__(self, first_year: int = 0, sums: Optional[np.ndarray] = None,
+                 counts: Optional[np.ndarray] = None) -> None:
+        """Initialize a new accumulator, empty unless the sums and counts are given."""
+        self.first_year = first_year
+        self.sums = np.zeros(0) if sums is None else np.array(sums, dtype=np.float64)
+        self.counts = np.zeros(0, np.int64) if counts is None else np.array(counts, np.int64)
+
+    def add(self, years: np.ndarray, values: np.ndarray) -> np.ndarray:
+        """Add samples with the given whole years and values, and return the sorted array of
+        the years that were changed.
+        """
+        years = np.asarray(years, dtype=np.int64)
+        if len(years) == 0:
+            return np.zeros(0, dtype=np.int64)
+        self._extend(int(years.min()), int(years.max()))
+
+        offsets = years - self.first_year
+        np.add.at(self.sums, offsets, values)
+        self.counts += np.bincount(offsets, minlength=len(self.counts))
+
+        return np.unique(years)
+
+    def add_samples(self, samples: AltimetrySamples) -> np.ndarray:
+        """Add the given samples, and return the sorted array of the years that were changed."""
+        return self.add(np.floor(samples.times), samples.values)
+
+    def merge(self, other: 'AnnualAccumulator') -> None:
+        """Add the sums and counts of other to this accumulator."""
+        if len(other.counts) == 0:
+            return
+        self._extend(other.first_year, other.first_year + len(other.counts) - 1)
+        start = other.first_year - self.first_year
+        self.sums[start:start + len(other.sums)] += other.sums
+        self.counts[start:start + len(other.counts)] += other.counts
+
+    def means(self) -> SeaLevelSeries:
+        """Return the average global mean sea level of each year with at least one sample,
+        rounded the same way as mean_sea_level_change.
+        """
+        present = self.counts > 0
+        years = np.flatnonzero(present) + self.first_year
+
+        return SeaLevelSeries(years, np.round(self.sums[present] / self.counts[present], 2))
+
+    def _extend(self, low: int, high: int) -> None:
+        """Grow the sums and counts so they include every year from low to high."""
+        if len(self.counts) == 0:
+            self.first_year = low
+            self.sums = np.zeros(high - low + 1)
+            self.counts = np.zeros(high - low + 1, dtype=np.int64)
+            return
+
+        last_year = self.first_year + len(self.counts) - 1
+        before = max(self.first_year - low, 0)
+        after = max(high - last_year, 0)
+        if before > 0 or after > 0:
+            self.sums = np.pad(self.sums, (before, after))
+            self.counts = np.pad(self.counts, (before, after))
+            self.first_year -= before
+
+
+def iter_chunks(filename: str, chunk_size: int = CHUNK_SIZE,
+                priority: Optional[Tuple[str, ...]] = None) -> Iterator[AltimetrySamples]:
+    """Read the dataset with the given filename a chunk of rows at a time, and yield the
+    samples of each chunk. The dataset may be gzip compressed.
+
+    Each chunk holds about chunk_size bytes of whole rows.
+    """
+    with open_dataset(filename) as file:
+        header, columns = read_header(file)
+        for block in iter_row_blocks(file, chunk_size):
+            table = parse_rows(block, len(columns))
+            yield samples_from_table(table, tuple(columns[1:]), header, priority)
+
+
+def stream_annual_means(filename: str, chunk_size: int = CHUNK_SIZE,
+                        priority: Optional[Tuple[str, ...]] = None) -> SeaLevelSeries:
+    """Return the average global mean sea level of each year of the dataset with the given
+    filename, reading it a chunk at a time. The dataset may be gzip compressed.
+
+    The result is the same as mean_sea_level_change(read_csv(filename)).
+    """
+    accumulator = AnnualAccumulator()
+    for samples in iter_chunks(filename, chunk_size, priority):
+        accumulator.add_samples(samples)
+
+    return accumulator.means()
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['numpy', 'Iterator', 'Optional', 'Tuple', 'ingest',
+                          'series'],
+        'allowed-io': ['iter_chunks'],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })
@@ -0,0 +1,279 @@
+"""
+This file runs the computations of the program for every combination of a grid of scenario
+parameters, without opening the pygame simulation.
+
+A scenario is a base year (the last observed year the projection starts from), a rate
+schedule (see projection.py), the share of the sea level rise caused by each factor (see
+computations.factor_contribution) and a horizon (the last projected year). The scenarios
+are split into chunks run by worker processes, and the results are written to a folder with
+one .npy file per column and one row per scenario and year:
+
+    scenario   the number of the scenario (see scenarios.json in the same folder)
+    year       the year
+    level      the global mean sea level of the year, in mm
+    factor_i   the change in global mean sea level caused by factor i, in mm
+
+Usage:
+    python sweep.py grid.json -o results
+    python sweep.py -o results --base-years 2018 2020 --schedule 2020:3.3,2080:12 \\
+        --schedule 2020:4 --fit quadratic --shares 0.41,0.35,0.24 --end-years 2100 2300
+
+--fit adds a schedule continuing the linear or quadratic fit to the samples of the dataset
+(see fitting.py).
+
+A grid file is a json object with the keys 'base_years', 'schedules' (a list of objects
+with the keys 'start_years', 'rates' and optionally 'accelerations', or with the key 'fit'
+set to 'linear' or 'quadratic'), 'shares' and 'end_years', and optionally 'dataset'.
+
+This file is Copyright (c) 2020 Yousuf Hassan, Aaditya Mandal, Faraz Hossein, and Dinkar Verma.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from cache import load_annual_means, load_dataset
+from computations import FACTOR_SHARES
+from decomposition import decompose
+from fitting import DEGREES, fitted_schedule
+from projection import DEFAULT_SCHEDULE, RateSchedule, project
+
+# The dataset of the program, wherever the sweep is run from.
+DATASET = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Datasets',
+                       'global_mean_sea_level.csv')
+
+# The number of scenarios each task sent to a worker process runs.
+CHUNK_SIZE = 2000
+
+
+class SweepGrid:
+    """The scenarios of a sweep: every combination of the given parameters.
+
+    Instance Attributes:
+        - base_years: the base years to try
+        - schedules: the rate schedules to try
+        - shares: the factor shares to try, one row per set of shares
+        - end_years: the horizons to try
+
+    Representation Invariants:
+        - all(base_year < end_year for base_year in self.base_years
+              for end_year in self.end_years)
+        - self.shares.ndim == 2
+    """
+    base_years: List[int]
+    schedules: List[RateSchedule]
+    shares: np.ndarray
+    end_years: List[int]
+
+    def __init__(self, base_years: Sequence[int], schedules: Sequence[RateSchedule],
+                 shares: Sequence[Sequence[float]], end_years: Sequence[int]) -> None:
+        """Initialize a new grid.
+
+        Preconditions:
+            - every set of shares has the same number of factors
+        """
+        self.base_years = list(base_years)
+        self.schedules = list(schedules)
+        self.shares = np.asarray(shares, dtype=np.float64).reshape(len(shares), -1)
+        self.end_years = list(end_years)
+
+    def scenarios(self) -> np.ndarray:
+        """Return the scenarios as an array with one row per scenario, containing its base
+        year, the index of its schedule, the index of its shares and its end year.
+        """
+        return np.array(list(itertools.product(
+            self.base_years, range(len(self.schedules)), range(len(self.shares)),
+            self.end_years)), dtype=np.int64).reshape(-1, 4)
+
+
+def load_grid(filename: str) -> Tuple[SweepGrid, str]:
+    """Return the grid described by the json file with the given filename, and the dataset
+    it should be run on.
+    """
+    with open(filename) as file:
+        description = json.load(file)
+
+    dataset = description.get('dataset', DATASET)
+    schedules = [fit_schedule(dataset, schedule['fit']) if 'fit' in schedule
+                 else RateSchedule(schedule['start_years'], schedule['rates'],
+                                   schedule.get('accelerations'))
+                 for schedule in description['schedules']]
+    grid = SweepGrid(description['base_years'], schedules, description['shares'],
+                     description['end_years'])
+    return grid, dataset
+
+
+def fit_schedule(dataset: str, fit: str) -> RateSchedule:
+    """Return a schedule continuing the given fit ('linear' or 'quadratic') to the samples of
+    the dataset.
+    """
+    samples = load_dataset(dataset).samples
+    return fitted_schedule(samples.times, samples.values, DEGREES[fit])
+
+
+def run_sweep(grid: SweepGrid, output: str, dataset: str = DATASET,
+              workers: Optional[int] = None, chunk_size: int = CHUNK_SIZE) -> int:
+    """Run every scenario of the grid on the annual means of the dataset, write the results
+    to the folder output and return the number of rows written.
+
+    The scenarios are run by the given number of worker processes (by default, one per CPU).
+    """
+    annual = load_annual_means(dataset)
+    missing = [year for year in grid.base_years if year not in set(annual.years.tolist())]
+    if missing:
+        raise ValueError('the dataset has no annual mean for the base years {}'.format(missing))
+    base_levels = {year: float(annual[year]) for year in grid.base_years}
+
+    scenarios = grid.scenarios()
+    lengths = scenarios[:, 3] - scenarios[:, 0] + 1
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    create_columns(output, int(offsets[-1]), _column_types(grid.shares.shape[1]))
+    _write_scenarios(output, grid, scenarios)
+
+    tasks = [(grid, base_levels, scenarios, offsets, output, start,
+              min(start + chunk_size, len(scenarios)))
+             for start in range(0, len(scenarios), chunk_size)]
+    if workers == 1 or len(tasks) <= 1:
+        for task in tasks:
+            _run_chunk(task)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for _ in executor.map(_run_chunk, tasks):
+                pass
+
+    return int(offsets[-1])
+
+
+def _run_chunk(task: Tuple) -> None:
+    """Run the scenarios of a chunk and write their rows to the columns of the output."""
+    grid, base_levels, scenarios, offsets, output, start, end = task
+    columns = open_columns(output, _column_types(grid.shares.shape[1]))
+
+    chunk = scenarios[start:end]
+    groups = chunk[:, 0] * 100000 + chunk[:, 3]
+    for group in np.unique(groups):
+        members = np.flatnonzero(groups == group) + start
+        base_year, end_year = int(scenarios[members[0], 0]), int(scenarios[members[0], 3])
+
+        schedules = [grid.schedules[i] for i in scenarios[members, 1]]
+        levels = project(schedules, base_levels[base_year], base_year, end_year)
+        factors = decompose(levels, grid.shares[scenarios[members, 2]][:, np.newaxis, :])
+
+        years = np.arange(base_year, end_year + 1)
+        for row, scenario in enumerate(members):
+            rows = slice(offsets[scenario], offsets[scenario + 1])
+            columns['scenario'][rows] = scenario
+            columns['year'][rows] = years
+            columns['level'][rows] = levels[row]
+            for factor in range(factors.shape[2]):
+                columns['factor_{}'.format(factor)][rows] = factors[row, :, factor]
+
+    for column in columns.values():
+        column.flush()
+
+
+def _column_types(num_factors: int) -> Dict[str, type]:
+    """Return a dictionary mapping the name of each output column to its type."""
+    types = {'scenario': np.int32, 'year': np.int16, 'level': np.float64}
+    for factor in range(num_factors):
+        types['factor_{}'.format(factor)] = np.float64
+    return types
+
+
+def create_columns(output: str, num_rows: int, types: Dict[str, type]) -> None:
+    """Create a column file in the output folder for each name and type in types, with room
+    for num_rows rows.
+    """
+    os.makedirs(output, exist_ok=True)
+    for name, dtype in types.items():
+        column = np.lib.format.open_memmap(os.path.join(output, name + '.npy'), mode='w+',
+                                           dtype=dtype, shape=(num_rows,))
+        del column
+
+
+def open_columns(output: str, names: Iterable[str]) -> Dict[str, np.ndarray]:
+    """Return the column files of the output folder with the given names, memory mapped for
+    writing.
+    """
+    return {name: np.load(os.path.join(output, name + '.npy'), mmap_mode='r+')
+            for name in names}
+
+
+def _write_scenarios(output: str, grid: SweepGrid, scenarios: np.ndarray) -> None:
+    """Write the parameters of every scenario to scenarios.json in the output folder."""
+    schedules = [{'start_years': schedule.start_years.tolist(),
+                  'rates': schedule.rates.tolist(),
+                  'accelerations': schedule.accelerations.tolist()}
+                 for schedule in grid.schedules]
+    description = {'schedules': schedules, 'shares': grid.shares.tolist(),
+                   'columns': ['base_year', 'schedule', 'shares', 'end_year'],
+                   'scenarios': scenarios.tolist()}
+    with open(os.path.join(output, 'scenarios.json'), 'w') as file:
+        json.dump(description, file)
+
+
+def parse_schedule(text: str) -> RateSchedule:
+    """Return the schedule described by text, a comma separated list of pieces of the form
+    'start_year:rate' or 'start_year:rate:acceleration'.
+    """
+    pieces = [piece.split(':') for piece in text.split(',')]
+    start_years = [int(piece[0]) for piece in pieces]
+    rates = [float(piece[1]) for piece in pieces]
+    accelerations = [float(piece[2]) if len(piece) > 2 else 0.0 for piece in pieces]
+    return RateSchedule(start_years, rates, accelerations)
+
+
+def main(arguments: Optional[Sequence[str]] = None) -> int:
+    """Run the sweep described by the command line arguments, and return the exit status."""
+    parser = argparse.ArgumentParser(description='Run a grid of sea level scenarios.')
+    parser.add_argument('grid', nargs='?', help='a json file describing the grid')
+    parser.add_argument('-o', '--output', required=True,
+                        help='the folder the results are written to')
+    parser.add_argument('--dataset', help='the dataset the annual means are read from')
+    parser.add_argument('--base-years', type=int, nargs='+', default=[2020])
+    parser.add_argument('--schedule', type=parse_schedule, action='append',
+                        help="pieces of the form 'start_year:rate[:acceleration]', "
+                             "separated by commas; may be given more than once")
+    parser.add_argument('--fit', choices=list(DEGREES), action='append',
+                        help='add a schedule fitted to the dataset; may be given more than '
+                             'once')
+    parser.add_argument('--shares', action='append',
+                        help='factor shares separated by commas; may be given more than once')
+    parser.add_argument('--end-years', type=int, nargs='+', default=[2100])
+    parser.add_argument('--workers', type=int, help='the number of worker processes')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    options = parser.parse_args(arguments)
+
+    if options.grid is not None:
+        grid, dataset = load_grid(options.grid)
+    else:
+        shares = [[float(share) for share in text.split(',')] for text in options.shares or []]
+        if len(set(len(factors) for factors in shares)) > 1:
+            parser.error('every --shares must have the same number of factors')
+        dataset = options.dataset or DATASET
+        schedules = (options.schedule or []) + [fit_schedule(dataset, fit)
+                                                for fit in options.fit or []]
+        grid = SweepGrid(options.base_years, schedules or [DEFAULT_SCHEDULE],
+                         shares or [FACTOR_SHARES], options.end_years)
+    bad_pairs = ['{} is not before {}'.format(base_year, end_year) for base_year in grid.base_years
+                 for end_year in grid.end_years if base_year >= end_year]
+    if bad_pairs:
+        parser.error('every base year must be before every end year, but '
+                     + ', '.join(bad_pairs))
+
+    start = time.perf_counter()
+    num_rows = run_sweep(grid, options.output, options.dataset or dataset, options.workers,
+                         options.chunk_size)
+    print('Wrote {} rows for {} scenarios to {} in {:.2f}s'.format(
+        num_rows, len(grid.scenarios()), options.output, time.perf_counter() - start),
+        file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,80 @@
+"""
+This file tests how stations.py handles station files that cannot be read.
+
+Run it with pytest:
+    python -m pytest test_stations.py
+
+This file is Copyright (c) 2020 Yousuf Hassan, Aaditya Mandal, Faraz Hossein, and Dinkar Verma.
+"""
+
+import gzip
+import os
+import zlib
+import numpy as np
+import pytest
+from stations import read_station, run_stations
+
+# Two complete years of monthly levels of a valid station.
+MONTHS = b'\n'.join('{:.4f};{};0;000'.format(2000 + (month + 0.5) / 12, 7000 + month).encode()
+                    for month in range(24))
+
+
+def write_station(folder: str, name: str, contents: bytes) -> str:
+    """Write a station file with the given name and contents to folder and return its
+    filename.
+    """
+    os.makedirs(folder, exist_ok=True)
+    filename = os.path.join(folder, name)
+    with open(filename, 'wb') as file:
+        file.write(contents)
+    return filename
+
+
+def corrupt_gzip() -> bytes:
+    """Return a gzip file whose header is valid but whose compressed data is not."""
+    compressed = gzip.compress(MONTHS * 100)
+    return compressed[:20] + bytes(64) + compressed[84:]
+
+
+def single_column() -> bytes:
+    """Return a station file with the times of the months but no levels."""
+    return b'\n'.join(line.split(b';')[0] for line in MONTHS.splitlines())
+
+
+def test_corrupt_gzip_raises_zlib_error(tmp_path) -> None:
+    """A corrupt gzip station raises the zlib.error the readers catch."""
+    with pytest.raises(zlib.error):
+        read_station(write_station(str(tmp_path), 'corrupt.rlrdata', corrupt_gzip()))
+
+
+def test_single_column_raises_value_error(tmp_path) -> None:
+    """A station with a single column raises a ValueError, not an IndexError."""
+    with pytest.raises(ValueError, match='single column'):
+        read_station(write_station(str(tmp_path), 'single.rlrdata', single_column()))
+
+
+def test_unreadable_stations_are_reported(tmp_path) -> None:
+    """Unreadable stations are reported as failed, and the valid stations are still written.
+    """
+    valid = write_station(str(tmp_path), 'valid.rlrdata', MONTHS)
+    corrupt = write_station(str(tmp_path), 'corrupt.rlrdata', corrupt_gzip())
+    single = write_station(str(tmp_path), 'single.rlrdata', single_column())
+    output = str(tmp_path / 'output')
+
+    num_rows, failures = run_stations([valid, corrupt, single], output, workers=1)
+
+    assert sorted(failures) == sorted([corrupt, single])
+    assert failures[corrupt].startswith('zlib.error: ')
+    assert failures[single].startswith('ValueError: ')
+    assert num_rows > 0
+    assert np.all(np.load(os.path.join(output, 'station.npy')) == 0)
+
+
+def test_failures_of_stations_with_the_same_name(tmp_path) -> None:
+    """Two failed files with the same station name are both reported."""
+    first = write_station(str(tmp_path / 'a'), 'same.rlrdata', single_column())
+    second = write_station(str(tmp_path / 'b'), 'same.rlrdata.gz', corrupt_gzip())
+
+    _, failures = run_stations([first, second], str(tmp_path / 'output'), workers=1)
+
+    assert sorted(failures) == sorted([first, second])